@@ -29,4 +29,8 @@ def create_app():
     except ImportError:
         print("TTS module not loaded.")
 
+    # Warm models up in the background (MODEL_PRELOAD=eager) or leave them to first use
+    from app.preload import start_preload
+    start_preload()
+
     return app
@@ -0,0 +1,122 @@
+import hashlib
+import io
+
+import cv2
+import numpy as np
+from docx import Document
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+from PIL import Image
+
+from config import Config
+
+_BLIP = qn("a:blip")             # DrawingML picture (inline or floating)
+_VML_IMAGE = "{urn:schemas-microsoft-com:vml}imagedata"   # Legacy VML picture
+_PARAGRAPH = qn("w:p")
+# Copy of DrawingML content for readers that don't support it (text boxes repeated as VML)
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+
+class DocxImage:
+    """An embedded image, stored encoded until it is OCR'd."""
+
+    def __init__(self, number, blob, size, name):
+        self.number = number   # 1-based, in order of first appearance
+        self.blob = blob
+        self.size = size       # (width, height) read from the image header
+        self.name = name
+
+    @property
+    def label(self):
+        return f"DOCX image {self.number}"
+
+
+# Vector formats PIL identifies but can only rasterize through a Windows-only loader
+_VECTOR_FORMATS = ("WMF", "EMF")
+
+
+def _image_size(blob):
+    """(width, height) from the image header without decoding it, or None if PIL can't decode it."""
+    try:
+        with Image.open(io.BytesIO(blob)) as img:
+            if img.format in _VECTOR_FORMATS:
+                return None
+            return img.size
+    except Exception:
+        return None
+
+
+def decode_image(blob):
+    """
+    Decodes an embedded image to a BGR ndarray. Transparent images are flattened onto white:
+    dropping the alpha channel would leave dark text on a black background.
+    """
+    img = Image.open(io.BytesIO(blob))
+    if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGBA", img.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(background, img)
+    return cv2.cvtColor(np.asarray(img.convert("RGB")), cv2.COLOR_RGB2BGR)
+
+
+def _paragraph_images(paragraph):
+    """rIds of the pictures in a w:p, excluding those of paragraphs nested in it (text boxes)."""
+    for el in paragraph.iter(_BLIP, _VML_IMAGE):
+        if next(el.iterancestors(_PARAGRAPH), None) is not paragraph:
+            continue
+        r_id = el.get(qn("r:embed")) if el.tag == _BLIP else el.get(qn("r:id"))
+        if r_id:
+            yield r_id
+
+
+def read_docx(file_path):
+    """
+    Reads a DOCX in one pass over its body, in document order. Paragraph text and pictures
+    come straight from the package python-docx already holds in memory: nothing is unpacked
+    to disk and no image is decoded here.
+
+    Identical images (same bytes) are kept once, at their first appearance. Images with a
+    side shorter than DOCX_MIN_IMAGE_SIDE pixels (bullets, icons, rules) and formats PIL
+    can't read (EMF/WMF drawings) are skipped.
+
+    Returns:
+        tuple: (blocks, images, paragraph_count). blocks is a list of ("text", paragraph_text)
+        and ("image", DocxImage) in document order; images lists the DocxImages alone.
+    """
+    doc = Document(file_path)
+    related_parts = doc.part.related_parts
+    blocks, images, paragraph_count = [], [], 0
+    seen = {}  # digest -> DocxImage, or None when skipped
+
+    # Every paragraph of the body, tables and text boxes included
+    for paragraph in doc.element.body.iter(_PARAGRAPH):
+        if next(paragraph.iterancestors(_MC_FALLBACK), None) is not None:
+            continue
+        text = Paragraph(paragraph, doc).text.strip()
+        if text:
+            blocks.append(("text", text))
+            paragraph_count += 1
+
+        for r_id in _paragraph_images(paragraph):
+            part = related_parts.get(r_id)
+            blob = getattr(part, "blob", None)
+            if not blob:
+                continue
+            digest = hashlib.blake2b(blob, digest_size=16).hexdigest()
+            if digest in seen:
+                continue
+            name = str(getattr(part, "partname", r_id))
+            size = _image_size(blob)
+            if size is None:
+                print(f"[WARN] Skipping DOCX image {name}: unsupported format.")
+                seen[digest] = None
+                continue
+            if min(size) < Config.DOCX_MIN_IMAGE_SIDE:
+                print(f"[DEBUG] Skipping DOCX image {name}: {size[0]}x{size[1]} is too small to hold text.")
+                seen[digest] = None
+                continue
+            image = seen[digest] = DocxImage(len(images) + 1, blob, size, name)
+            images.append(image)
+            blocks.append(("image", image))
+
+    return blocks, images, paragraph_count
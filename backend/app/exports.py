@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+
+EXPORT_FORMATS = ("pdf", "docx")
+
+# extracted_<digest>.pdf, translated_<digest>.docx, ...
+_EXPORT_NAME_RE = re.compile(r"^(extracted|translated)_([0-9a-f]{40})\.(pdf|docx)$")
+
+
+class ExportStore:
+    """
+    PDF/DOCX exports rendered on demand instead of eagerly for every job.
+
+    register() only stores the text, keyed by a hash of its content and language, and
+    returns the download URLs. The first /download of a format renders it on a small
+    background pool; concurrent requests for the same file wait on the same render, and
+    the result stays in the results folder, so identical texts (across jobs too) are
+    rendered once per format.
+    """
+
+    def __init__(self, result_folder, workers=2, render_timeout=120):
+        self.result_folder = result_folder
+        self.source_folder = os.path.join(result_folder, "sources")
+        self.render_timeout = render_timeout
+        os.makedirs(self.source_folder, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="export")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def content_digest(text, lang_code):
+        # The language picks the PDF font, so the same text in another language is another export
+        return hashlib.blake2b(f"{lang_code}\0{text}".encode("utf-8"), digest_size=20).hexdigest()
+
+    def _source_path(self, digest):
+        return os.path.join(self.source_folder, f"{digest}.json")
+
+    def register(self, kind, text, lang_code):
+        """
+        Stores `text` for later export and returns {"pdf": url, "docx": url}. `kind` is
+        "extracted" or "translated" and only names the downloaded file.
+        """
+        digest = self.content_digest(text, lang_code)
+        source_path = self._source_path(digest)
+        if not os.path.exists(source_path):
+            # Write-then-rename so a concurrent reader never sees a partial file
+            tmp_path = f"{source_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"text": text, "lang_code": lang_code}, f, ensure_ascii=False)
+            os.replace(tmp_path, source_path)
+        return {fmt: f"/download/{kind}_{digest}.{fmt}" for fmt in EXPORT_FORMATS}
+
+    def ensure(self, filename):
+        """
+        Returns the path of export `filename`, rendering it first if needed (blocking up to
+        render_timeout seconds). Returns None if `filename` is not a known export. Raises
+        concurrent.futures.TimeoutError if the render is still running after the timeout; it
+        keeps going and later calls wait on the same render.
+        """
+        match = _EXPORT_NAME_RE.match(filename)
+        if not match:
+            return None
+        path = os.path.join(self.result_folder, filename)
+        if os.path.exists(path):
+            return path
+        _, digest, fmt = match.groups()
+        if not os.path.exists(self._source_path(digest)):
+            return None
+
+        submitted = False
+        with self._lock:
+            future = self._in_flight.get(filename)
+            if future is None:
+                future = self._executor.submit(self._render, digest, fmt, path)
+                self._in_flight[filename] = future
+                submitted = True
+        if submitted:
+            # Outside the lock: a render that already finished runs the callback (and _forget) right here
+            future.add_done_callback(lambda _, name=filename: self._forget(name))
+        return future.result(timeout=self.render_timeout)
+
+    def _forget(self, filename):
+        with self._lock:
+            self._in_flight.pop(filename, None)
+
+    def _render(self, digest, fmt, path):
+        from app.ocr_engine import save_to_pdf, save_to_docx
+
+        with open(self._source_path(digest), encoding="utf-8") as f:
+            source = json.load(f)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            if fmt == "pdf":
+                save_to_pdf(source["text"], tmp_path, lang_code=source["lang_code"])
+            else:
+                save_to_docx(source["text"], tmp_path)
+            os.replace(tmp_path, path)
+        except Exception:
+            print(f"[ERROR] Rendering export {os.path.basename(path)} failed.")
+            traceback.print_exc()
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        print(f"[INFO] Rendered export {os.path.basename(path)}.")
+        return path
+
+
+_export_store = None
+_export_store_lock = threading.Lock()
+
+
+def get_export_store():
+    """Returns the process-wide export store, creating it from Config on first use."""
+    global _export_store
+    if _export_store is None:
+        with _export_store_lock:
+            if _export_store is None:
+                _export_store = ExportStore(
+                    Config.RESULT_FOLDER,
+                    workers=Config.EXPORT_WORKERS,
+                    render_timeout=Config.EXPORT_RENDER_TIMEOUT,
+                )
+    return _export_store
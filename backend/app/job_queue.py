@@ -0,0 +1,170 @@
+import threading
+import time
+import traceback
+from collections import deque
+
+from config import Config
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the pending queue is at capacity."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"OCR queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class OCRJobQueue:
+    """
+    Fixed-size pool of OCR worker threads fed by a bounded FIFO queue.
+
+    Only `num_workers` jobs run at once, so a burst of uploads waits its turn instead of
+    starting dozens of concurrent TrOCR/PaddleOCR/IndicTrans2 runs. Submissions beyond
+    `max_queue_size` pending jobs are rejected with QueueFullError.
+    """
+
+    def __init__(self, num_workers, max_queue_size, retry_after=30):
+        self.num_workers = max(1, int(num_workers))
+        self.max_queue_size = max(1, int(max_queue_size))
+        self.default_retry_after = retry_after
+
+        self._pending = deque()  # (job_id, fn, enqueued_at)
+        self._cond = threading.Condition()
+        self._workers = []
+        self._active = 0
+        self._started = False
+
+        # Metrics
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+        self._dequeued = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+        self._recent_waits = deque(maxlen=200)
+
+    def start(self):
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f"ocr-worker-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+        print(f"[INFO] OCR job queue started with {self.num_workers} workers (max queue size {self.max_queue_size}).")
+
+    def submit(self, job_id, fn):
+        """
+        Enqueues `fn` to run on a worker thread. Returns the 1-based queue position.
+        Raises QueueFullError when the pending queue is at capacity.
+        """
+        if not self._started:
+            self.start()
+        with self._cond:
+            if len(self._pending) >= self.max_queue_size:
+                self._rejected += 1
+                raise QueueFullError(self._estimate_retry_after())
+            self._pending.append((job_id, fn, time.monotonic()))
+            self._submitted += 1
+            position = len(self._pending)
+            self._cond.notify()
+        return position
+
+    def cancel(self, job_id):
+        """Removes a job that has not started yet. Returns True if it was still pending."""
+        with self._cond:
+            for entry in self._pending:
+                if entry[0] == job_id:
+                    self._pending.remove(entry)
+                    return True
+        return False
+
+    def position(self, job_id):
+        """Returns the 1-based position of a pending job, or None if it is not waiting."""
+        with self._cond:
+            for idx, entry in enumerate(self._pending):
+                if entry[0] == job_id:
+                    return idx + 1
+        return None
+
+    def stats(self):
+        with self._cond:
+            recent = sorted(self._recent_waits)
+            finished = self._completed + self._failed
+            return {
+                "workers": self.num_workers,
+                "active_jobs": self._active,
+                "queue_depth": len(self._pending),
+                "max_queue_size": self.max_queue_size,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_seconds": round(self._total_wait / self._dequeued, 3) if self._dequeued else 0.0,
+                "p95_wait_seconds": round(recent[int(0.95 * (len(recent) - 1))], 3) if recent else 0.0,
+                "max_wait_seconds": round(self._max_wait, 3),
+                "avg_run_seconds": round(self._total_run / finished, 3) if finished else 0.0,
+            }
+
+    def _estimate_retry_after(self):
+        # Caller holds self._cond. Rough drain time for the current backlog, based on the
+        # observed average job duration; falls back to the configured default.
+        finished = self._completed + self._failed
+        if not finished:
+            return self.default_retry_after
+        avg_run = self._total_run / finished
+        backlog = len(self._pending) + self._active
+        return max(1, int(round(avg_run * backlog / self.num_workers)))
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job_id, fn, enqueued_at = self._pending.popleft()
+                wait = time.monotonic() - enqueued_at
+                self._active += 1
+                self._dequeued += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+                self._recent_waits.append(wait)
+
+            print(f"[INFO] OCR job {job_id} dequeued after waiting {wait:.2f}s.")
+            started_at = time.monotonic()
+            ok = True
+            try:
+                fn()
+            except Exception as e:
+                ok = False
+                print(f"[ERROR] Unhandled error in OCR worker for job {job_id}: {e}")
+                traceback.print_exc()
+            finally:
+                with self._cond:
+                    self._active -= 1
+                    self._total_run += time.monotonic() - started_at
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Returns the process-wide OCR job queue, creating it from Config on first use."""
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = OCRJobQueue(
+                    num_workers=Config.OCR_WORKERS,
+                    max_queue_size=Config.OCR_QUEUE_SIZE,
+                    retry_after=Config.OCR_RETRY_AFTER,
+                )
+                _job_queue.start()
+    return _job_queue
@@ -0,0 +1,357 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from config import Config
+
+# Jobs in these states will never change again and are eligible for eviction
+FINISHED_STATUSES = ("done", "error", "cancelled")
+
+
+class JobStore(ABC):
+    """
+    Storage for OCR job state. Each job has a small status record (status, cancel flag,
+    timestamps and any extra fields) that is cheap to poll, and a separately stored result
+    payload holding the full extracted/translated text. Backends implement every abstract
+    method; wait_for_update has a polling default.
+    """
+
+    poll_interval = 0.5  # Seconds between reads in the default wait_for_update
+
+    @abstractmethod
+    def create(self, job_id, status="queued", **fields):
+        ...
+
+    @abstractmethod
+    def get(self, job_id):
+        """Returns the status record as a dict, or None if the job is unknown or evicted."""
+
+    @abstractmethod
+    def update(self, job_id, **fields):
+        """Merges `fields` into the status record. Returns False if the job is unknown."""
+
+    @abstractmethod
+    def transition(self, job_id, from_statuses, **fields):
+        """
+        Atomically applies `fields` only if the job's current status is in `from_statuses`.
+        Returns the record as it was before the update, or None if nothing was changed.
+        """
+
+    @abstractmethod
+    def set_result(self, job_id, result):
+        ...
+
+    @abstractmethod
+    def get_result(self, job_id):
+        ...
+
+    @abstractmethod
+    def add_page_result(self, job_id, page_no, page_result):
+        """Stores the partial result of one page (1-based) while the job is still running."""
+
+    @abstractmethod
+    def get_page_results(self, job_id, first=1, last=None):
+        """Returns the stored page results with first <= page <= last, ordered by page."""
+
+    @abstractmethod
+    def delete(self, job_id):
+        ...
+
+    def wait_for_update(self, job_id, since, timeout):
+        """
+        Blocks until the job's record has been updated after `since` (an `updated_at` value)
+        or `timeout` seconds pass. This default polls; backends may wake up sooner.
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            record = self.get(job_id)
+            if record is None or record["updated_at"] > since:
+                return
+            time.sleep(min(self.poll_interval, max(0.0, deadline - time.time())))
+
+
+class InMemoryJobStore(JobStore):
+    """
+    Process-local store. Finished jobs expire `ttl` seconds after their last update, and
+    once more than `max_jobs` are held the least recently used finished jobs are dropped.
+    Only suitable for a single worker process.
+    """
+
+    def __init__(self, ttl=3600, max_jobs=500, sweep_interval=30):
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.sweep_interval = sweep_interval
+        self._records = OrderedDict()  # job_id -> status record, in LRU order
+        self._results = {}
+        self._pages = {}  # job_id -> {page_no: page result}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)  # Notified on every record update
+        self._last_sweep = 0.0
+
+    def create(self, job_id, status="queued", **fields):
+        now = time.time()
+        with self._lock:
+            self._records[job_id] = {"status": status, "cancel": False, "created_at": now, "updated_at": now, **fields}
+            self._evict(now)
+
+    def get(self, job_id):
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is None:
+                return None
+            self._records.move_to_end(job_id)
+            return dict(record)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is None:
+                return False
+            record.update(fields, updated_at=time.time())
+            self._records.move_to_end(job_id)
+            self._changed.notify_all()
+            return True
+
+    def transition(self, job_id, from_statuses, **fields):
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is None or record["status"] not in from_statuses:
+                return None
+            previous = dict(record)
+            record.update(fields, updated_at=time.time())
+            self._records.move_to_end(job_id)
+            self._changed.notify_all()
+            return previous
+
+    def set_result(self, job_id, result):
+        with self._lock:
+            if job_id in self._records:
+                self._results[job_id] = result
+
+    def get_result(self, job_id):
+        with self._lock:
+            return self._results.get(job_id)
+
+    def add_page_result(self, job_id, page_no, page_result):
+        with self._lock:
+            if job_id in self._records:
+                self._pages.setdefault(job_id, {})[page_no] = page_result
+
+    def get_page_results(self, job_id, first=1, last=None):
+        with self._lock:
+            pages = self._pages.get(job_id, {})
+            return [pages[n] for n in sorted(pages) if n >= first and (last is None or n <= last)]
+
+    def delete(self, job_id):
+        with self._lock:
+            self._records.pop(job_id, None)
+            self._results.pop(job_id, None)
+            self._pages.pop(job_id, None)
+            self._changed.notify_all()
+
+    def wait_for_update(self, job_id, since, timeout):
+        with self._lock:
+            self._changed.wait_for(
+                lambda: job_id not in self._records or self._records[job_id]["updated_at"] > since,
+                timeout=timeout,
+            )
+
+    def _evict(self, now):
+        # Caller holds self._lock
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            expired = [job_id for job_id, record in self._records.items()
+                       if record["status"] in FINISHED_STATUSES and now - record["updated_at"] > self.ttl]
+            for job_id in expired:
+                del self._records[job_id]
+                self._results.pop(job_id, None)
+                self._pages.pop(job_id, None)
+
+        if len(self._records) > self.max_jobs:
+            # Walk from the least recently used end; active jobs are never evicted
+            overflow = len(self._records) - self.max_jobs
+            for job_id in [j for j, r in self._records.items() if r["status"] in FINISHED_STATUSES][:overflow]:
+                del self._records[job_id]
+                self._results.pop(job_id, None)
+                self._pages.pop(job_id, None)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Store backed by a SQLite database in WAL mode, so every worker process on the host
+    sees the same jobs. Results live in their own table to keep status polling cheap.
+    """
+
+    def __init__(self, path, ttl=3600, max_jobs=5000, sweep_interval=60):
+        self.path = path
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._last_sweep = 0.0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status_updated ON jobs (status, updated_at);
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT PRIMARY KEY,
+                result TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_pages (
+                job_id TEXT NOT NULL,
+                page_no INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (job_id, page_no)
+            );
+        """)
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared across threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_record(row):
+        status, data, created_at, updated_at = row
+        return {**json.loads(data), "status": status, "created_at": created_at, "updated_at": updated_at}
+
+    def create(self, job_id, status="queued", **fields):
+        now = time.time()
+        data = json.dumps({"cancel": False, **fields})
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, status, data, now, now),
+        )
+        self._evict(now)
+
+    def get(self, job_id):
+        row = self._conn().execute(
+            "SELECT status, data, created_at, updated_at FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return self._to_record(row) if row else None
+
+    def update(self, job_id, **fields):
+        return self._apply(job_id, None, fields) is not None
+
+    def transition(self, job_id, from_statuses, **fields):
+        return self._apply(job_id, from_statuses, fields)
+
+    def _apply(self, job_id, from_statuses, fields):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT status, data, created_at, updated_at FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+            previous = self._to_record(row)
+            if from_statuses is not None and previous["status"] not in from_statuses:
+                conn.execute("ROLLBACK")
+                return None
+
+            merged = {**previous, **fields}
+            status = merged.pop("status")
+            for key in ("created_at", "updated_at"):
+                merged.pop(key)
+            conn.execute(
+                "UPDATE jobs SET status = ?, data = ?, updated_at = ? WHERE job_id = ?",
+                (status, json.dumps(merged), time.time(), job_id),
+            )
+            conn.execute("COMMIT")
+            return previous
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def set_result(self, job_id, result):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO job_results (job_id, result) VALUES (?, ?)", (job_id, json.dumps(result))
+        )
+
+    def get_result(self, job_id):
+        row = self._conn().execute("SELECT result FROM job_results WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add_page_result(self, job_id, page_no, page_result):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO job_pages (job_id, page_no, result) VALUES (?, ?, ?)",
+            (job_id, page_no, json.dumps(page_result)),
+        )
+
+    def get_page_results(self, job_id, first=1, last=None):
+        rows = self._conn().execute(
+            "SELECT result FROM job_pages WHERE job_id = ? AND page_no >= ? AND page_no <= ? ORDER BY page_no",
+            (job_id, first, last if last is not None else 2 ** 31),
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def delete(self, job_id):
+        conn = self._conn()
+        conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+        conn.execute("DELETE FROM job_pages WHERE job_id = ?", (job_id,))
+
+    def _evict(self, now):
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        conn = self._conn()
+        try:
+            conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*FINISHED_STATUSES, now - self.ttl),
+            )
+            conn.execute(
+                f"""DELETE FROM jobs WHERE job_id IN (
+                        SELECT job_id FROM jobs WHERE status IN ({placeholders})
+                        ORDER BY updated_at DESC LIMIT -1 OFFSET ?)""",
+                (*FINISHED_STATUSES, self.max_jobs),
+            )
+            conn.execute("DELETE FROM job_results WHERE job_id NOT IN (SELECT job_id FROM jobs)")
+            conn.execute("DELETE FROM job_pages WHERE job_id NOT IN (SELECT job_id FROM jobs)")
+        except sqlite3.OperationalError as e:
+            # Another worker holds the write lock; the next sweep will catch up
+            print(f"[WARN] Job store eviction skipped: {e}")
+
+
+_job_store = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """Returns the process-wide job store selected by Config.JOB_STORE_BACKEND."""
+    global _job_store
+    if _job_store is None:
+        with _job_store_lock:
+            if _job_store is None:
+                backend = Config.JOB_STORE_BACKEND.lower()
+                if backend == "sqlite":
+                    _job_store = SQLiteJobStore(Config.JOB_STORE_PATH, ttl=Config.JOB_TTL_SECONDS,
+                                                max_jobs=Config.JOB_STORE_MAX_JOBS)
+                elif backend == "memory":
+                    _job_store = InMemoryJobStore(ttl=Config.JOB_TTL_SECONDS, max_jobs=Config.JOB_STORE_MAX_JOBS)
+                else:
+                    raise ValueError(f"Unknown JOB_STORE_BACKEND: {Config.JOB_STORE_BACKEND}")
+                print(f"[INFO] Using {backend} job store.")
+    return _job_store
@@ -0,0 +1,153 @@
+import atexit
+import queue
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+from app.preload import timed
+from config import Config
+
+
+class LanguageToolPool:
+    """
+    A fixed set of long-lived LanguageTool instances for one language, shared across threads.
+
+    Every LanguageTool instance runs its own JVM server, which takes seconds to start, so the
+    instances are started once and reused. At most `size` checks run at a time; callers
+    block in acquire() until an instance is free. An instance that has been idle for longer
+    than `health_check_interval` is pinged before being handed out and replaced if the
+    server has died.
+    """
+
+    def __init__(self, lang_code, size=2, health_check_interval=300):
+        self.lang_code = lang_code
+        self.size = max(1, size)
+        self.health_check_interval = health_check_interval
+        self._idle = queue.Queue()  # (tool, last_used)
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        self._restarts = 0
+
+    def _create_tool(self):
+        with timed("module", "language_tool_python"):
+            import language_tool_python
+        started_at = time.monotonic()
+        tool = language_tool_python.LanguageTool(self.lang_code)
+        print(f"[INFO] LanguageTool ({self.lang_code}) server started in {time.monotonic() - started_at:.1f}s.")
+        return tool
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            # All or nothing: a failed start must not leave servers queued for the next attempt
+            # to add another `size` to
+            tools = []
+            try:
+                for _ in range(self.size):
+                    tools.append(self._create_tool())
+            except Exception:
+                for tool in tools:
+                    try:
+                        tool.close()
+                    except Exception as e:
+                        print(f"[WARN] Failed to close LanguageTool ({self.lang_code}): {e}")
+                raise
+            now = time.monotonic()
+            for tool in tools:
+                self._idle.put((tool, now))
+            self._started = True
+
+    def _is_healthy(self, tool):
+        try:
+            tool.check("Health check.")
+            return True
+        except Exception as e:
+            print(f"[WARN] LanguageTool ({self.lang_code}) health check failed: {e}")
+            return False
+
+    def _replace(self, tool):
+        try:
+            tool.close()
+        except Exception:
+            pass
+        self._restarts += 1
+        return self._create_tool()
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """Checks out an instance for exclusive use; blocks while all of them are busy."""
+        if self._closed:
+            raise RuntimeError("LanguageTool pool has been shut down.")
+        self.start()
+        tool, last_used = self._idle.get(timeout=timeout)
+        try:
+            if time.monotonic() - last_used > self.health_check_interval and not self._is_healthy(tool):
+                tool = self._replace(tool)
+        except Exception:
+            # Creating the replacement failed; return the old instance so the pool keeps its size
+            self._idle.put((tool, time.monotonic()))
+            raise
+
+        healthy = True
+        try:
+            yield tool
+        except Exception:
+            healthy = self._is_healthy(tool)
+            raise
+        finally:
+            if not healthy:
+                try:
+                    tool = self._replace(tool)
+                except Exception:
+                    traceback.print_exc()
+            if self._closed:
+                tool.close()
+            else:
+                self._idle.put((tool, time.monotonic()))
+
+    def stats(self):
+        return {"lang": self.lang_code, "size": self.size, "idle": self._idle.qsize(),
+                "started": self._started, "restarts": self._restarts}
+
+    def shutdown(self):
+        self._closed = True
+        while True:
+            try:
+                tool, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                tool.close()
+            except Exception as e:
+                print(f"[WARN] Failed to close LanguageTool ({self.lang_code}): {e}")
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_languagetool_pool(lang_code):
+    """Returns the shared pool for `lang_code`, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(lang_code)
+        if pool is None:
+            pool = LanguageToolPool(lang_code, size=Config.LANGUAGETOOL_POOL_SIZE,
+                                    health_check_interval=Config.LANGUAGETOOL_HEALTH_CHECK_INTERVAL)
+            _pools[lang_code] = pool
+        return pool
+
+
+def shutdown_languagetool_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
+    if pools:
+        print(f"[INFO] Shut down {len(pools)} LanguageTool pool(s).")
+
+
+atexit.register(shutdown_languagetool_pools)
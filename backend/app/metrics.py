@@ -0,0 +1,197 @@
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+import prometheus_client
+from prometheus_client import CollectorRegistry, generate_latest
+
+from config import Config
+
+# Metric types and the text exposition come from prometheus_client. The wrappers below add
+# what it doesn't have: label defaults from labels() and capturing updates in PDF worker
+# processes, whose own registry is never scraped, to replay them in the app process.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+CONTENT_TYPE = prometheus_client.CONTENT_TYPE_LATEST
+
+# Only the series the app records; no *_created timestamps next to every counter and histogram
+prometheus_client.disable_created_metrics()
+
+REGISTRY = CollectorRegistry()
+_metrics = {}  # name -> wrapper, for replay()
+
+_local = threading.local()
+
+
+class _Metric:
+    prometheus_type = None
+
+    def __init__(self, name, documentation, labelnames=(), **kwargs):
+        self.name = name
+        self.labelnames = tuple(labelnames)
+        self._metric = self.prometheus_type(name, documentation, self.labelnames, registry=REGISTRY, **kwargs)
+        _metrics[name] = self
+
+    def _key(self, labels):
+        # Labels left out default to "", and labels from the current labels() context fill gaps
+        context = getattr(_local, "labels", {})
+        return tuple(str(labels.get(name, context.get(name, ""))) for name in self.labelnames)
+
+    def _child(self, key):
+        return self._metric.labels(*key) if self.labelnames else self._metric
+
+    def _record(self, method, key, value):
+        captured = getattr(_local, "captured", None)
+        if captured is not None:
+            captured.append((self.name, method, key, value))
+        else:
+            getattr(self, method)(key, value)
+
+
+class Counter(_Metric):
+    prometheus_type = prometheus_client.Counter
+
+    def inc(self, amount=1, **labels):
+        self._record("_apply_inc", self._key(labels), amount)
+
+    def _apply_inc(self, key, amount):
+        self._child(key).inc(amount)
+
+
+class Gauge(_Metric):
+    prometheus_type = prometheus_client.Gauge
+
+    def set(self, value, **labels):
+        self._record("_apply_set", self._key(labels), value)
+
+    def _apply_set(self, key, value):
+        self._child(key).set(value)
+
+    def set_function(self, function):
+        """Computes the (unlabeled) value at scrape time. A failing callback reports NaN instead of failing the scrape."""
+        def read():
+            try:
+                return function()
+            except Exception as e:
+                print(f"[WARN] Gauge {self.name} callback failed: {e}")
+                return float("nan")
+        self._metric.set_function(read)
+
+
+class Histogram(_Metric):
+    prometheus_type = prometheus_client.Histogram
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, buckets=buckets)
+
+    def observe(self, value, **labels):
+        self._record("_apply_observe", self._key(labels), value)
+
+    def _apply_observe(self, key, value):
+        self._child(key).observe(value)
+
+    @contextmanager
+    def time(self, **labels):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+
+def render():
+    """The registry in the Prometheus text exposition format."""
+    return generate_latest(REGISTRY)
+
+
+STAGE_SECONDS = Histogram(
+    "scriptsense_stage_duration_seconds", "Time spent in each pipeline stage.",
+    ["stage", "lang", "engine", "file_type"])
+JOBS = Counter(
+    "scriptsense_jobs_total", "OCR jobs by outcome (submitted, rejected, done, error, cancelled).", ["status"])
+PAGES = Counter(
+    "scriptsense_pages_total", "Pages (images, PDF pages, DOCX images) run through OCR.", ["file_type"])
+PDF_PAGES = Counter(
+    "scriptsense_pdf_pages_total", "PDF pages by where their text came from (text, ocr, text+ocr).", ["source"])
+ERRORS = Counter(
+    "scriptsense_errors_total", "Errors caught while processing, by stage.", ["stage", "file_type"])
+QUEUE_DEPTH = Gauge(
+    "scriptsense_queue_depth", "OCR jobs waiting for a worker.")
+ACTIVE_JOBS = Gauge(
+    "scriptsense_active_jobs", "OCR jobs currently being processed.")
+LOADED_MODELS = Gauge(
+    "scriptsense_loaded_models", "Models resident in the app process's model registry (PDF workers not included).")
+LOADED_MODEL_BYTES = Gauge(
+    "scriptsense_loaded_model_bytes", "Approximate memory held by models resident in the app process (PDF workers not included).")
+
+
+def _lang_label(lang):
+    """
+    The `lang` label value for a language code. Codes come from request fields, so anything
+    outside SUPPORTED_LANGUAGES is recorded as "other" to keep the number of series bounded.
+    """
+    return lang if lang in Config.SUPPORTED_LANGUAGES else "other"
+
+
+@contextmanager
+def labels(**values):
+    """Sets default labels (e.g. file_type, lang) for every metric recorded by this thread inside the block."""
+    previous = getattr(_local, "labels", {})
+    values = {k: v for k, v in values.items() if v is not None}
+    if "lang" in values:
+        values["lang"] = _lang_label(values["lang"])
+    _local.labels = {**previous, **values}
+    try:
+        yield
+    finally:
+        _local.labels = previous
+
+
+@contextmanager
+def capture():
+    """
+    Collects this thread's metric updates into a list instead of applying them. Used in PDF
+    worker processes, whose own registry is never scraped: the list goes back to the parent
+    with the page result and is applied there with replay().
+    """
+    previous = getattr(_local, "captured", None)
+    captured = _local.captured = []
+    try:
+        yield captured
+    finally:
+        _local.captured = previous
+
+
+def replay(captured):
+    for name, method, key, value in captured or ():
+        metric = _metrics.get(name)
+        if metric is not None:
+            getattr(metric, method)(key, value)
+
+
+def timed_stage(stage, engine="", lang_param=None):
+    """
+    Decorator recording the wrapped call's duration in STAGE_SECONDS. `lang_param` names the
+    argument holding the language code; file_type (and lang, if not given) come from labels().
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn) if lang_param else None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            stage_labels = {"stage": stage, "engine": engine}
+            if signature is not None:
+                bound = signature.bind_partial(*args, **kwargs)
+                bound.apply_defaults()
+                lang = bound.arguments.get(lang_param)
+                if lang:
+                    stage_labels["lang"] = _lang_label(lang)
+            started_at = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - started_at, **stage_labels)
+        return wrapper
+    return decorator
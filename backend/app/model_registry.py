@@ -0,0 +1,266 @@
+import gc
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from config import Config
+
+try:
+    import psutil
+except ImportError:  # Sizes then come from parameter counts only
+    psutil = None
+
+
+def _rss_bytes():
+    return psutil.Process().memory_info().rss if psutil else None
+
+
+def _tensor_bytes(value, seen):
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(item, seen) for item in value)
+    if not hasattr(value, "element_size"):
+        return 0
+    # Tied weights appear under several names; count each storage once
+    if value.data_ptr() in seen:
+        return 0
+    seen.add(value.data_ptr())
+    return value.numel() * value.element_size()
+
+
+def _torch_bytes(obj):
+    """
+    Bytes held by the state of any torch module in `obj` (a module or a tuple of objects).
+    Uses state_dict() rather than parameters() so int8 packed weights of dynamically
+    quantized layers are counted too.
+    """
+    items = obj if isinstance(obj, (tuple, list)) else (obj,)
+    total = 0
+    for item in items:
+        if hasattr(item, "state_dict") and hasattr(item, "parameters"):
+            seen = set()
+            try:
+                total += sum(_tensor_bytes(value, seen) for value in item.state_dict().values())
+            except Exception:
+                traceback.print_exc()
+    return total
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models with an approximate RAM budget. PDF worker processes
+    have registries of their own, so the budget is per process (see process_budgets).
+
+    Each model is loaded once through get(key, loader). Its size is taken from the bytes of
+    its torch parameters and buffers, or, for non-torch models like PaddleOCR, from the growth
+    in process RSS while it loaded. When a load would push the total over `budget_bytes`,
+    least-recently-used unpinned models are evicted first. Evicting only drops the registry's
+    reference: a thread still running an evicted model keeps it alive until it is done.
+    """
+
+    def __init__(self, budget_bytes, pinned=(), role="app", workers=0):
+        self.budget_bytes = budget_bytes
+        self.role = role        # "app" or "pdf-worker": each process has its own registry and budget
+        self.workers = workers  # PDF worker processes sharing MODEL_RAM_BUDGET_MB with the app process
+        self._entries = OrderedDict()  # key -> {"model", "size", "loaded_at", "last_used", "hits"}
+        self._pinned = set(pinned)
+        self._known_sizes = {}  # Size of models seen before, used to make room before reloading them
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+        # Metrics
+        self._loads = 0
+        self._load_failures = 0
+        self._evictions = 0
+        self._load_seconds = {}  # key -> list of load durations
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _used_bytes(self):
+        return sum(entry["size"] for entry in self._entries.values())
+
+    def _touch(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        entry["last_used"] = time.time()
+        entry["hits"] += 1
+        return entry["model"]
+
+    def get(self, key, loader):
+        """Returns the model for `key`, calling `loader()` to load it if it isn't resident."""
+        with self._lock:
+            if key in self._entries:
+                return self._touch(key)
+
+        # One loader per key; other keys keep loading in parallel
+        with self._key_lock(key):
+            with self._lock:
+                if key in self._entries:
+                    return self._touch(key)
+                evicted = self._make_room(self._known_sizes.get(key, 0), exclude=key)
+            if evicted:
+                self._release()
+
+            rss_before = _rss_bytes()
+            started_at = time.perf_counter()
+            try:
+                model = loader()
+            except Exception:
+                with self._lock:
+                    self._load_failures += 1
+                raise
+            elapsed = time.perf_counter() - started_at
+
+            size = _torch_bytes(model)
+            if not size and rss_before is not None:
+                size = max(0, _rss_bytes() - rss_before)
+
+            with self._lock:
+                self._loads += 1
+                self._load_seconds.setdefault(key, []).append(elapsed)
+                self._known_sizes[key] = size
+                self._entries[key] = {"model": model, "size": size, "loaded_at": time.time(),
+                                      "last_used": time.time(), "hits": 0}
+                evicted = self._make_room(0, exclude=key)
+            print(f"[INFO] Model '{key}' loaded in {elapsed:.1f}s (~{size / 2 ** 20:.0f} MB).")
+            if evicted:
+                self._release()
+            return model
+
+    def _make_room(self, incoming_bytes, exclude=None):
+        """Evicts LRU unpinned models until `incoming_bytes` more fit in the budget. Caller holds the lock."""
+        if not self.budget_bytes:
+            return []
+        evicted = []
+        for key in list(self._entries):
+            if self._used_bytes() + incoming_bytes <= self.budget_bytes:
+                break
+            if key == exclude or key in self._pinned:
+                continue
+            entry = self._entries.pop(key)
+            self._evictions += 1
+            evicted.append(key)
+            print(f"[INFO] Evicted model '{key}' (~{entry['size'] / 2 ** 20:.0f} MB) to stay within the "
+                  f"{self.budget_bytes / 2 ** 20:.0f} MB model budget.")
+        if self._used_bytes() + incoming_bytes > self.budget_bytes:
+            print(f"[WARN] Model budget exceeded: pinned or in-flight models need more than "
+                  f"{self.budget_bytes / 2 ** 20:.0f} MB.")
+        return evicted
+
+    def _release(self):
+        # Let Python and torch hand the evicted weights back
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            try:
+                torch.cuda.empty_cache()
+            except Exception:
+                traceback.print_exc()
+
+    def evict(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._evictions += 1
+        if entry is not None:
+            self._release()
+        return entry is not None
+
+    def pin(self, key):
+        """Pinned models are never evicted to make room for others."""
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key):
+        with self._lock:
+            self._pinned.discard(key)
+
+    def stats(self):
+        with self._lock:
+            models = {
+                key: {
+                    "size_mb": round(entry["size"] / 2 ** 20, 1),
+                    "pinned": key in self._pinned,
+                    "hits": entry["hits"],
+                    "idle_seconds": round(time.time() - entry["last_used"], 1),
+                }
+                for key, entry in reversed(self._entries.items())
+            }
+            load_seconds = {
+                key: {"count": len(durations), "avg": round(sum(durations) / len(durations), 3),
+                      "max": round(max(durations), 3)}
+                for key, durations in self._load_seconds.items()
+            }
+            return {
+                # Budget and usage are for this process only; PDF workers each have their own
+                "process": {"role": self.role, "pid": os.getpid()},
+                "budget_scope": "per process",
+                "budget_mb": round(self.budget_bytes / 2 ** 20, 1),
+                "total_budget_mb": Config.MODEL_RAM_BUDGET_MB,
+                "pdf_workers": self.workers,
+                "worker_budget_mb": round(process_budgets()[1] / 2 ** 20, 1) if self.workers else None,
+                "used_mb": round(self._used_bytes() / 2 ** 20, 1),
+                "models": models,
+                "loads": self._loads,
+                "load_failures": self._load_failures,
+                "evictions": self._evictions,
+                "load_seconds": load_seconds,
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def process_budgets():
+    """
+    Splits MODEL_RAM_BUDGET_MB between the app process and the PDF worker processes, each of
+    which holds its own registry. Returns (app_bytes, worker_bytes, workers). Workers get
+    MODEL_WORKER_RAM_BUDGET_MB each, or an equal share by default; the app process keeps the
+    rest, but never less than an equal share.
+    """
+    total = Config.MODEL_RAM_BUDGET_MB * 1024 * 1024
+    workers = Config.PDF_OCR_WORKERS if Config.PDF_OCR_WORKERS > 1 else 0  # 1 = OCR in-process, no pool
+    if not total or not workers:
+        return total, total, workers
+    equal_share = total // (workers + 1)
+    worker_bytes = Config.MODEL_WORKER_RAM_BUDGET_MB * 1024 * 1024 or equal_share
+    app_bytes = total - workers * worker_bytes
+    if app_bytes < equal_share:
+        print(f"[WARN] {workers} x MODEL_WORKER_RAM_BUDGET_MB leaves the app process less than an equal share of "
+              f"MODEL_RAM_BUDGET_MB; model RAM may exceed {Config.MODEL_RAM_BUDGET_MB} MB.")
+        app_bytes = equal_share
+    return app_bytes, worker_bytes, workers
+
+
+def _create_registry(role):
+    global _registry
+    app_bytes, worker_bytes, workers = process_budgets()
+    pinned = [key.strip() for key in Config.MODEL_PINNED.split(",") if key.strip()]
+    _registry = ModelRegistry(worker_bytes if role == "pdf-worker" else app_bytes, pinned=pinned,
+                              role=role, workers=workers)
+    return _registry
+
+
+def configure_model_registry(role):
+    """
+    Creates this process's registry with the budget of `role` ("app" or "pdf-worker"). PDF
+    workers call it from their initializer, before any model loads.
+    """
+    with _registry_lock:
+        return _create_registry(role)
+
+
+def get_model_registry():
+    """Returns this process's model registry, created for the app process on first use."""
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _create_registry("app")
+    return _registry
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import threading
+
+import numpy as np
+
+from app.tiered_cache import TieredCache
+from app.quantization import is_quantized
+from config import Config
+
+# Part of every cache key. Bump whenever preprocessing, routing or the OCR engines change
+# in a way that alters their output, so stale results are never served.
+OCR_ENGINE_VERSION = "3"
+
+
+class OCRResultCache(TieredCache):
+    """
+    Content-addressed cache of single-page OCR results.
+
+    Keys hash the decoded page pixels together with the OCR options, so re-uploaded documents
+    and repeated pages inside one PDF skip OCR entirely.
+    """
+
+    def __init__(self, path, memory_bytes, disk_bytes, sweep_interval=60):
+        super().__init__(path, "ocr_results", memory_bytes, disk_bytes, sweep_interval)
+
+    @staticmethod
+    def make_key(image, source_lang, enhance):
+        """Builds the cache key for a decoded page (ndarray) and the options it is OCR'd with."""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{image.shape}|{image.dtype}|".encode())
+        digest.update(np.ascontiguousarray(image).data)
+        # Int8 and ONNX TrOCR output can differ slightly from eager fp32, so they never share entries
+        version = OCR_ENGINE_VERSION
+        if Config.TROCR_BACKEND == "onnx":
+            version += "-onnx"
+        elif is_quantized("trocr"):
+            version += "-int8"
+        return f"{version}:{source_lang or 'auto'}:{int(bool(enhance))}:{digest.hexdigest()}"
+
+    def get(self, key):
+        """Returns the cached (text, word_conf, low_conf) for `key`, or None on a miss."""
+        payload = super().get(key)
+        if payload is None:
+            return None
+        data = json.loads(payload)
+        return data["text"], [tuple(wc) for wc in data["word_conf"]], [tuple(span) for span in data["low_conf"]]
+
+    def put(self, key, result):
+        text, word_conf, low_conf = result
+        super().put(key, json.dumps({"text": text, "word_conf": word_conf, "low_conf": low_conf}, ensure_ascii=False))
+
+
+_ocr_cache = None
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache():
+    """Returns the process-wide OCR result cache, or None when OCR_CACHE_ENABLED is off."""
+    global _ocr_cache
+    if not Config.OCR_CACHE_ENABLED:
+        return None
+    if _ocr_cache is None:
+        with _ocr_cache_lock:
+            if _ocr_cache is None:
+                _ocr_cache = OCRResultCache(
+                    Config.OCR_CACHE_PATH,
+                    memory_bytes=Config.OCR_CACHE_MEMORY_MB * 1024 * 1024,
+                    disk_bytes=Config.OCR_CACHE_DISK_MB * 1024 * 1024,
+                )
+    return _ocr_cache
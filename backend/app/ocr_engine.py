@@ -1,17 +1,11 @@
 import os
 import cv2
-import numpy as np
-import tempfile
-import uuid
-from pdf2image import convert_from_path
-from PIL import Image
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 from docx import Document
 from docx.shared import Pt
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import inch
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont # Import TTFont directly here
 import traceback # Import traceback for detailed error logging
 
 from app.translator import translate_text, normalize_lang
@@ -19,37 +13,85 @@ from app.utils import (
     detect_language,
     get_doc_stats,
     highlight_low_confidence_words,
-    LANGUAGE_MAP,
-    LANG_FONT_MAP,
+    append_with_spans,
+    strip_with_spans,
+    remap_spans,
     correct_spelling,
     grammar_correction,
     detect_handwritten_or_printed, # This is imported and will be used in preprocess_image
-    extract_images_from_docx
+    load_image,
+    compute_image_features
 )
 from app.ocr_router import extract_text_with_best_model
+from app.ocr_cache import get_ocr_cache
+from app.skew import deskew
+from app.exports import get_export_store
+from app.model_registry import configure_model_registry
+from app.pdf_layout import render_text_pdf
+from app.pdf_text import PagePlan, SOURCE_OCR, SOURCE_TEXT, SOURCE_MIXED, plan_page
+from app.rasterizer import PdfRasterizer, open_pdf
+from app.docx_media import read_docx, decode_image
+from app import metrics
+from config import Config
+
+# Shared process pool for page-parallel PDF OCR, created on first use
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+# Shared thread pool translating partial page results (translate_pages), created on first use
+_page_translation_pool = None
+_page_translation_pool_lock = threading.Lock()
+
+# ------------------- Progress Reporting -------------------
+
+def report_progress(progress, stage, **info):
+    """
+    Calls the optional `progress(stage, **info)` callback passed down the pipeline. A failing
+    callback must never break OCR, so errors are only logged.
+    """
+    if progress is None:
+        return
+    try:
+        progress(stage, **info)
+    except Exception as e:
+        print(f"[WARN] Progress callback failed for stage '{stage}': {e}")
+
+def report_page(on_page, page_no, result):
+    """
+    Hands a finished page's (text, word_conf, low_conf) to the optional `on_page(page_no, result)`
+    callback. Like progress callbacks, a failing callback is logged and otherwise ignored.
+    """
+    if on_page is None:
+        return
+    try:
+        on_page(page_no, result)
+    except Exception as e:
+        print(f"[WARN] Page callback failed for page {page_no}: {e}")
+        traceback.print_exc()
 
 # ------------------- Preprocessing -------------------
 
-def preprocess_image(image_path): # Removed is_handwritten flag from here
+@metrics.timed_stage("preprocess")
+def preprocess_array(image, features=None, label="<in-memory image>"):
     """
     Preprocesses an image by converting to grayscale, blurring, applying adaptive or OTSU thresholding
     based on whether the image is detected as handwritten or printed, and deskewing it.
     
     Args:
-        image_path (str): The path to the input image.
+        image (np.ndarray): BGR or grayscale page image.
+        features (dict): Optional output of compute_image_features for this image, reused
+            instead of recomputing grayscale, blur and handwriting detection.
+        label (str): Name used in log messages.
 
     Returns:
-        str: The path to the saved preprocessed image.
+        np.ndarray: The preprocessed (binarized, deskewed) image.
     """
-    image = cv2.imread(image_path)
-    if image is None:
-        raise ValueError(f"Could not read image at {image_path}")
-
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    if features is None:
+        features = compute_image_features(image)
+    blurred = features["blurred"]
 
     # Detect if the image is handwritten or printed to inform thresholding
-    is_handwritten_local = detect_handwritten_or_printed(image_path) 
+    is_handwritten_local = detect_handwritten_or_printed(image, features=features)
 
     # --- Adaptive Thresholding for Handwritten vs. Printed ---
     if is_handwritten_local:
@@ -58,34 +100,35 @@ def preprocess_image(image_path): # Removed is_handwritten flag from here
         thresh = cv2.adaptiveThreshold(blurred, 255, 
                                        cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
                                        cv2.THRESH_BINARY_INV, 11, 2)
-        print(f"[INFO] Applying adaptive thresholding for handwritten image: {os.path.basename(image_path)}")
+        print(f"[INFO] Applying adaptive thresholding for handwritten image: {label}")
     else:
         # For printed text, OTSU is usually very effective
         _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        print(f"[INFO] Applying OTSU thresholding for printed image: {os.path.basename(image_path)}")
+        print(f"[INFO] Applying OTSU thresholding for printed image: {label}")
 
     # --- Deskewing Logic ---
-    deskewed = thresh # Initialize in case coords is empty
+    deskewed = thresh
     try:
-        coords = np.column_stack(np.where(thresh < 128)) # Use a lower threshold for coordinates, looking for darker pixels
-        if coords.size == 0:
-            print(f"[WARN] No strong foreground pixels found for deskewing in {os.path.basename(image_path)}. Skipping deskew operation.")
-        else:
-            angle = cv2.minAreaRect(coords)[-1]
-            if angle < -45:
-                angle = -(90 + angle)
-            else:
-                angle = -angle
-            
-            (h, w) = thresh.shape
-            M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
-            deskewed = cv2.warpAffine(thresh, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-            print(f"[INFO] Deskewed image {os.path.basename(image_path)} by {angle:.2f} degrees.")
+        # Text is white on black after the inverted adaptive threshold but black on white after OTSU
+        foreground = thresh if is_handwritten_local else cv2.bitwise_not(thresh)
+        deskewed, _ = deskew(thresh, foreground, label=label)
     except Exception as e:
-        print(f"[ERROR] Deskewing failed for {os.path.basename(image_path)}: {e}")
+        print(f"[ERROR] Deskewing failed for {label}: {e}")
         traceback.print_exc()
         deskewed = thresh # Fallback to un-deskewed thresholded image
 
+    return deskewed
+
+def preprocess_image(image_path):
+    """
+    File-based wrapper around preprocess_array: reads `image_path`, preprocesses it and saves
+    the result next to it as `<name>_preprocessed<ext>`.
+
+    Returns:
+        str: The path to the saved preprocessed image.
+    """
+    deskewed = preprocess_array(load_image(image_path), label=os.path.basename(image_path))
+
     # --- Save Preprocessed Image ---
     base, ext = os.path.splitext(image_path)
     # Ensure a unique name for the preprocessed file
@@ -96,151 +139,387 @@ def preprocess_image(image_path): # Removed is_handwritten flag from here
 
 # ------------------- OCR Handlers -------------------
 
-def handle_image(file_path, enhance=True, source_lang='en'):
-    if enhance:
-        file_path = preprocess_image(file_path)
-    text, word_conf, low_conf = extract_text_with_best_model(file_path, source_lang=source_lang)
-    return text, word_conf, low_conf
-
-def handle_pdf(file_path, enhance=True, source_lang='en'):
-    images = convert_from_path(file_path)
-    all_text, word_conf, low_conf = "", [], []
+def ocr_page(image, enhance=True, source_lang='en', label="<in-memory image>", progress=None):
+    """
+    Runs the full single-page pipeline in memory: decode once, compute the shared features,
+    optionally preprocess, then route to the best OCR engine.
 
-    for idx, img in enumerate(images):
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
-            tmp_path = tmp.name
-        img.save(tmp_path, "PNG")
+    Args:
+        image: File path, PIL image or ndarray for one page.
 
+    Returns:
+        tuple: (text, word_conf, low_conf), where word_conf is a list of (word, confidence)
+        and low_conf a list of (word, start, end) character spans into `text`.
+    """
+    image = load_image(image)
+
+    # Identical pages (re-uploads, repeated pages within a PDF) are served from the result cache
+    cache = get_ocr_cache()
+    cache_key = cache.make_key(image, source_lang, enhance) if cache else None
+    if cache_key:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print(f"[INFO] OCR cache hit for {label}.")
+            return cached
+
+    features = compute_image_features(image)
+    if enhance:
+        report_progress(progress, "preprocess")
+        image = preprocess_array(image, features, label=label)
+    report_progress(progress, "ocr", page=1, total=1)
+    # Route on the features of the original page; the binarized output would always look "printed"
+    result = extract_text_with_best_model(image, source_lang=source_lang, is_handwritten=features["is_handwritten"])
+
+    # Engines return empty text on failure; don't let a transient error stick in the cache
+    if cache_key and result[0].strip():
+        cache.put(cache_key, result)
+    return result
+
+def handle_image(file_path, enhance=True, source_lang='en', progress=None, on_page=None, page_sources=None):
+    result = ocr_page(file_path, enhance, source_lang, label=os.path.basename(file_path), progress=progress)
+    metrics.PAGES.inc()
+    if page_sources is not None:
+        page_sources[1] = SOURCE_OCR
+    report_page(on_page, 1, result)
+    return result
+
+def _init_pdf_worker(num_threads):
+    # Each PDF worker process gets an equal share of the cores so the pool does not oversubscribe the CPU
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except Exception as e:
+        print(f"[WARN] Could not set torch threads in PDF worker: {e}")
+    cv2.setNumThreads(num_threads)
+    # onnxruntime sessions (TROCR_BACKEND=onnx) would otherwise take every core in every worker
+    from app.trocr_onnx import set_process_threads
+    set_process_threads(num_threads)
+    # Models loaded here count against this worker's share of MODEL_RAM_BUDGET_MB, not the whole budget
+    configure_model_registry("pdf-worker")
+
+def _get_pdf_pool():
+    """Returns the shared PDF worker pool, (re)creating it if needed. Reused across documents."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            workers = Config.PDF_OCR_WORKERS
+            num_threads = max(1, (os.cpu_count() or 1) // workers)
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(Config.PDF_MP_START_METHOD),
+                initializer=_init_pdf_worker,
+                initargs=(num_threads,),
+            )
+            print(f"[INFO] Started PDF worker pool: {workers} processes x {num_threads} threads.")
+        return _pdf_pool
+
+def _reset_pdf_pool(broken_pool):
+    """Drops `broken_pool`, unless another document has already replaced it with a new pool."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is broken_pool:
+            _pdf_pool = None
+    broken_pool.shutdown(wait=False)
+
+def _run_on_pdf_pool(items, submit, run_in_process, finish, fail, window, label):
+    """
+    Runs `items` on the shared worker pool with at most `window` of them in flight.
+    submit(pool, item) returns the future of a task returning (result, observations);
+    finish(item, result) is called as each one completes, fail(item, error) when its task
+    raised. If the pool breaks (a worker died, in this document or in another one sharing
+    the pool), the items not finished yet are run in-process with run_in_process(item).
+    """
+    pool = _get_pdf_pool()
+    pending = {}  # future -> index in items
+    next_index = 0
+    broken = None
+    while (next_index < len(items) or pending) and broken is None:
         try:
-            path_to_process = preprocess_image(tmp_path) if enhance else tmp_path # preprocess_image now handles its own handwritten detection
-            text, wc, lowc = extract_text_with_best_model(path_to_process, source_lang=source_lang)
-            if text.strip():
-                all_text += f"\n[Page {idx + 1}]\n{text}"
+            while next_index < len(items) and len(pending) < window:
+                pending[submit(pool, items[next_index])] = next_index
+                next_index += 1
+        except (BrokenProcessPool, RuntimeError) as e:
+            # RuntimeError: another document already shut the broken pool down
+            broken = e
+            break
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            try:
+                result, observations = future.result()
+                metrics.replay(observations)
+                finish(items[index], result)
+            except BrokenProcessPool as e:
+                pending[future] = index
+                broken = e
+            except Exception as e:
+                fail(items[index], e)
+
+    if broken is None:
+        return
+    # A worker died (e.g. out of memory); finish this document in-process
+    print(f"[ERROR] Worker pool broke during {label}: {broken}. Falling back to in-process OCR.")
+    _reset_pdf_pool(pool)
+    for index in sorted(pending.values()) + list(range(next_index, len(items))):
+        run_in_process(items[index])
+
+def _ocr_pdf_regions(file_path, page_no, regions, enhance=True, source_lang='en'):
+    """OCRs image regions (PDF point rectangles) of one page; texts are joined in region order."""
+    text, word_conf, low_conf = "", [], []
+    with PdfRasterizer(file_path, dpi=Config.PDF_REGION_DPI) as pdf:
+        for idx, rect in enumerate(regions, 1):
+            image = pdf.render(page_no, clip=rect)
+            region_text, wc, lowc = ocr_page(image, enhance, source_lang, label=f"PDF page {page_no} image {idx}")
+            del image
+            if region_text.strip():
+                text, low_conf = append_with_spans(text, low_conf, "\n", region_text, lowc)
             word_conf.extend(wc)
-            low_conf.extend(lowc)
+    text, low_conf = strip_with_spans(text, low_conf)
+    return text, word_conf, low_conf
+
+def _ocr_pdf_page(file_path, page_no, enhance=True, source_lang='en', regions=None):
+    """
+    Rasterizes a single PDF page (1-based) in-process at its own DPI (see app/rasterizer.py)
+    and runs OCR on it, or only on `regions` of it when given. Runs in a PDF worker process,
+    so only the pages currently being worked on are ever held in memory.
+    """
+    if regions:
+        try:
+            return _ocr_pdf_regions(file_path, page_no, regions, enhance, source_lang)
         except Exception as e:
-            print(f"[ERROR] Failed to process PDF page {idx + 1}: {e}")
+            print(f"[ERROR] Failed to OCR image regions of PDF page {page_no}: {e}")
             traceback.print_exc()
-        finally:
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path) # Clean up original temp image
-            if enhance and 'path_to_process' in locals() and path_to_process != tmp_path and os.path.exists(path_to_process):
-                os.unlink(path_to_process) # Clean up preprocessed temp image
+            metrics.ERRORS.inc(stage="pdf_page")
+            return "", [], []
+
+    try:
+        with PdfRasterizer(file_path) as pdf:
+            dpi = pdf.dpi_for(page_no)
+            page = pdf.render(page_no, dpi=dpi)
+        print(f"[DEBUG] Rasterized PDF page {page_no} at {dpi} DPI ({page.shape[1]}x{page.shape[0]}).")
+    except Exception as e:
+        print(f"[WARN] PDF page {page_no} could not be rasterized: {e}")
+        metrics.ERRORS.inc(stage="pdf_page")
+        return "", [], []
 
-    return all_text.strip(), word_conf, low_conf
+    try:
+        return ocr_page(page, enhance, source_lang, label=f"PDF page {page_no}")
+    except Exception as e:
+        print(f"[ERROR] Failed to process PDF page {page_no}: {e}")
+        traceback.print_exc()
+        metrics.ERRORS.inc(stage="pdf_page")
+        return "", [], []
 
-def handle_docx(file_path, enhance=True, source_lang='en'):
-    doc = Document(file_path)
-    text_parts = [para.text.strip() for para in doc.paragraphs if para.text.strip()]
-    extracted_text = "\n".join(text_parts)
+def _ocr_pdf_page_task(file_path, page_no, enhance=True, source_lang='en', regions=None):
+    """
+    Pool entry point for _ocr_pdf_page. Metrics recorded in a worker process would never be
+    scraped, so they are captured and returned with the result for the parent to replay.
+    """
+    with metrics.labels(file_type="pdf", lang=source_lang), metrics.capture() as observations:
+        result = _ocr_pdf_page(file_path, page_no, enhance, source_lang, regions)
+    return result, observations
 
-    images = extract_images_from_docx(file_path)
-    # For text already present in DOCX, assign a high confidence as it's not OCR'd
-    word_conf = [(w, 0.99) for w in extracted_text.split()] 
-    low_conf = []
+def _plan_pdf_pages(file_path, source_lang):
+    """
+    Decides per page whether the embedded text layer is used, the page is OCR'd, or both
+    (see app/pdf_text.py). Returns {page_no: PagePlan}. A page whose text layer can't be
+    read is OCR'd.
+    """
+    plans = {}
+    doc = open_pdf(file_path)
+    try:
+        for page in doc:
+            try:
+                plans[page.number + 1] = plan_page(page, source_lang)
+            except Exception as e:
+                print(f"[WARN] Could not read the text layer of PDF page {page.number + 1}: {e}. OCR'ing it.")
+                plans[page.number + 1] = PagePlan(SOURCE_OCR, reason="text layer unreadable")
+    finally:
+        doc.close()
+
+    for page_no, plan in plans.items():
+        print(f"[DEBUG] PDF page {page_no}: {plan.source} ({plan.reason})")
+    text_pages = sum(1 for plan in plans.values() if not plan.needs_ocr)
+    print(f"[INFO] {text_pages} of {len(plans)} PDF pages use the embedded text layer.")
+    return plans
+
+def _merge_page_result(plan, ocr_result):
+    """Combines a page's text layer with the OCR of its image regions, per its PagePlan."""
+    if plan.source == SOURCE_OCR:
+        return ocr_result
+    text, word_conf, low_conf = plan.text_result()
+    if plan.source == SOURCE_MIXED and ocr_result is not None:
+        ocr_text, ocr_wc, ocr_lowc = ocr_result
+        if ocr_text.strip():
+            text, low_conf = append_with_spans(text, low_conf, "\n", ocr_text, ocr_lowc)
+        word_conf = word_conf + ocr_wc
+    return text, word_conf, low_conf
 
-    for idx, img_path in enumerate(images):
-        try:
-            path_to_process = preprocess_image(img_path) if enhance else img_path # preprocess_image now handles its own handwritten detection
-            img_text, wc, lowc = extract_text_with_best_model(path_to_process, source_lang=source_lang)
-            if img_text.strip():
-                extracted_text += f"\n[Image {idx + 1}]\n{img_text}"
-            word_conf.extend(wc)
-            low_conf.extend(lowc)
-        except Exception as e:
-            print(f"[ERROR] Failed to process DOCX image {idx + 1}: {e}")
+def handle_pdf(file_path, enhance=True, source_lang='en', progress=None, on_page=None, page_sources=None):
+    plans = _plan_pdf_pages(file_path, source_lang)
+    page_count = len(plans)
+    ocr_pages = [page_no for page_no in range(1, page_count + 1) if plans[page_no].needs_ocr]
+    # Pages are rasterized, preprocessed and OCR'd together inside the workers, so only
+    # page completion can be reported from here
+    report_progress(progress, "rasterize", total=page_count)
+    workers = max(1, min(Config.PDF_OCR_WORKERS, len(ocr_pages)))
+    # Upper bound on pages submitted but not yet finished; this is what bounds memory
+    window = max(workers, Config.PDF_PAGE_WINDOW)
+    page_results = {}
+
+    def finish_page(page_no, result):
+        plan = plans[page_no]
+        page_results[page_no] = result = _merge_page_result(plan, result)
+        if plan.needs_ocr:
+            metrics.PAGES.inc()
+        metrics.PDF_PAGES.inc(source=plan.source)
+        if page_sources is not None:
+            page_sources[page_no] = plan.source
+        report_progress(progress, "ocr", page=page_no, done=len(page_results), total=page_count)
+        # Pages finish out of order; consumers key partial results by page number
+        report_page(on_page, page_no, result)
+
+    # Text-layer pages need no OCR and are done right away
+    for page_no in range(1, page_count + 1):
+        if not plans[page_no].needs_ocr:
+            finish_page(page_no, None)
+
+    def ocr_in_process(page_no):
+        finish_page(page_no, _ocr_pdf_page(file_path, page_no, enhance, source_lang, plans[page_no].regions))
+
+    if workers == 1:
+        for page_no in ocr_pages:
+            ocr_in_process(page_no)
+    else:
+        def fail_page(page_no, e):
+            print(f"[ERROR] Failed to process PDF page {page_no}: {e}")
             traceback.print_exc()
-        finally:
-            # extract_images_from_docx uses a TemporaryDirectory, which handles cleanup.
-            # No explicit unlink needed here as the temp_dir context manager will remove them.
-            pass
+            metrics.ERRORS.inc(stage="pdf_page")
+            finish_page(page_no, ("", [], []))
+
+        _run_on_pdf_pool(
+            ocr_pages,
+            lambda pool, page_no: pool.submit(_ocr_pdf_page_task, file_path, page_no, enhance, source_lang,
+                                              plans[page_no].regions),
+            ocr_in_process, finish_page, fail_page, window, "PDF OCR")
+
+    # Reassemble in page order; low-confidence spans move with their page's text
+    all_text, word_conf, low_conf = "", [], []
+    for page_no in range(1, page_count + 1):
+        text, wc, lowc = page_results.get(page_no, ("", [], []))
+        if text.strip():
+            all_text, low_conf = append_with_spans(all_text, low_conf, f"\n[Page {page_no}]\n", text, lowc)
+        word_conf.extend(wc)
+
+    all_text, low_conf = strip_with_spans(all_text, low_conf)
+    return all_text, word_conf, low_conf
+
+def _ocr_docx_image(image, enhance=True, source_lang='en'):
+    """Decodes and OCRs one embedded DOCX image (a DocxImage). Runs in a worker process when parallel."""
+    try:
+        return ocr_page(decode_image(image.blob), enhance, source_lang, label=image.label)
+    except Exception as e:
+        print(f"[ERROR] Failed to process {image.label}: {e}")
+        traceback.print_exc()
+        metrics.ERRORS.inc(stage="docx_image")
+        return "", [], []
+
+def _ocr_docx_image_task(image, enhance=True, source_lang='en'):
+    """Pool entry point for _ocr_docx_image; metrics are returned to the parent like _ocr_pdf_page_task's."""
+    with metrics.labels(file_type="docx", lang=source_lang), metrics.capture() as observations:
+        result = _ocr_docx_image(image, enhance, source_lang)
+    return result, observations
+
+def _ocr_docx_images(images, enhance=True, source_lang='en', progress=None):
+    """
+    OCRs the DocxImages on the shared worker pool (the one PDF pages use), or in-process
+    when there is only one image or one worker. Only the encoded bytes are sent to the
+    workers, which decode each image once. Returns {image.number: result}.
+    """
+    results = {}
 
-    return extracted_text.strip(), word_conf, low_conf
+    def finish(image, result):
+        results[image.number] = result
+        metrics.PAGES.inc()
+        report_progress(progress, "ocr", page=image.number, done=len(results), total=len(images))
+
+    workers = max(1, min(Config.PDF_OCR_WORKERS, len(images)))
+    if workers == 1:
+        for image in images:
+            finish(image, _ocr_docx_image(image, enhance, source_lang))
+        return results
+
+    def fail(image, e):
+        print(f"[ERROR] Failed to process {image.label}: {e}")
+        traceback.print_exc()
+        metrics.ERRORS.inc(stage="docx_image")
+        finish(image, ("", [], []))
+
+    _run_on_pdf_pool(
+        images,
+        lambda pool, image: pool.submit(_ocr_docx_image_task, image, enhance, source_lang),
+        lambda image: finish(image, _ocr_docx_image(image, enhance, source_lang)),
+        finish, fail, len(images), "DOCX image OCR")
+    return results
+
+def handle_docx(file_path, enhance=True, source_lang='en', progress=None, on_page=None, page_sources=None):
+    blocks, images, paragraph_count = read_docx(file_path)
+    image_results = _ocr_docx_images(images, enhance, source_lang, progress) if images else {}
+
+    # Paragraphs and image texts in document order. Paragraph text is not OCR'd, so it gets a high confidence
+    extracted_text, word_conf, low_conf = "", [], []
+    for kind, block in blocks:
+        if kind == "text":
+            extracted_text += "\n" + block
+            word_conf.extend((w, 0.99) for w in block.split())
+            continue
+        img_text, wc, lowc = image_results.get(block.number, ("", [], []))
+        if img_text.strip():
+            extracted_text, low_conf = append_with_spans(extracted_text, low_conf, f"\n[Image {block.number}]\n", img_text, lowc)
+        word_conf.extend(wc)
+
+    # A DOCX has no reliable page boundaries, so the whole document is reported as page 1
+    if page_sources is not None:
+        page_sources[1] = SOURCE_MIXED if paragraph_count and images else (SOURCE_OCR if images else SOURCE_TEXT)
+    extracted_text, low_conf = strip_with_spans(extracted_text, low_conf)
+    result = (extracted_text, word_conf, low_conf)
+    report_page(on_page, 1, result)
+    return result
 
 # ------------------- File Routing -------------------
 
-def extract_text_dynamic(file_path, enhance=True, source_lang='en'):
+def file_type_of(file_path):
+    """Metrics label for an upload: "image", "pdf", "docx" or "other"."""
     ext = os.path.splitext(file_path)[1].lower()
     if ext in ['.jpg', '.jpeg', '.png']:
-        return handle_image(file_path, enhance, source_lang)
-    elif ext == '.pdf':
-        return handle_pdf(file_path, enhance, source_lang)
-    elif ext == '.docx':
-        return handle_docx(file_path, enhance, source_lang)
+        return "image"
+    return {'.pdf': "pdf", '.docx': "docx"}.get(ext, "other")
+
+def extract_text_dynamic(file_path, enhance=True, source_lang='en', progress=None, on_page=None, page_sources=None):
+    """
+    Extracts text from an image, PDF or DOCX. If given, `page_sources` is filled with
+    {page_no: "text" | "ocr" | "text+ocr"}: whether each page's text came from the embedded
+    text layer, from OCR, or both (see app/pdf_text.py).
+    """
+    file_type = file_type_of(file_path)
+    with metrics.labels(file_type=file_type, lang=source_lang):
+        if file_type == "image":
+            return handle_image(file_path, enhance, source_lang, progress=progress, on_page=on_page, page_sources=page_sources)
+        elif file_type == "pdf":
+            return handle_pdf(file_path, enhance, source_lang, progress=progress, on_page=on_page, page_sources=page_sources)
+        elif file_type == "docx":
+            return handle_docx(file_path, enhance, source_lang, progress=progress, on_page=on_page, page_sources=page_sources)
     return "Unsupported file format", [], []
 
 # ------------------- Output Writers -------------------
 
+@metrics.timed_stage("export_pdf", engine="reportlab", lang_param="lang_code")
 def save_to_pdf(text, path, lang_code='en'):
-    font_name = "Helvetica" 
-    font_size = 11
-    
     lang_code = normalize_lang(lang_code or "en")
-    font_path = LANG_FONT_MAP.get(lang_code, LANG_FONT_MAP.get("en")) 
-    
-    print(f"[DEBUG] Font path for {lang_code}: {font_path}")
-    print(f"[DEBUG] Font file exists: {os.path.exists(font_path) if font_path else 'N/A'}")
-
-    if font_path and os.path.exists(font_path):
-        try:
-            custom_font_name = f"Noto_{lang_code}" 
-            if custom_font_name not in pdfmetrics.getRegisteredFontNames():
-                pdfmetrics.registerFont(TTFont(custom_font_name, font_path))
-            font_name = custom_font_name
-        except Exception as e:
-            print(f"[ERROR] Failed to register font for {lang_code}: {e}")
-            traceback.print_exc()
-            font_name = "Helvetica" 
-    else:
-        print(f"[WARN] Font not found for language: {lang_code} at {font_path}, using default 'Helvetica'.")
-        font_name = "Helvetica" 
-
-    c = canvas.Canvas(path, pagesize=A4)
-    w, h = A4
-    x_margin, y_margin = inch * 0.75, inch * 0.75
-    y = h - y_margin
-    
-    if font_name in pdfmetrics.getRegisteredFontNames() or font_name in ["Helvetica", "Times-Roman", "Courier"]:
-        c.setFont(font_name, font_size)
-    else:
-        print(f"[WARN] Requested font '{font_name}' is not registered. Using 'Helvetica'.")
-        c.setFont("Helvetica", font_size)
-
-    for para in text.split("\n"):
-        words = para.split(" ")
-        line = ""
-        for word in words:
-            if c.stringWidth(line + word + " ", font_name, font_size) < w - 2 * x_margin:
-                line += word + " "
-            else:
-                c.drawString(x_margin, y, line.strip())
-                y -= font_size + 3 
-                line = word + " "
-                
-                if y < y_margin:
-                    c.showPage()
-                    y = h - y_margin
-                    if font_name in pdfmetrics.getRegisteredFontNames() or font_name in ["Helvetica", "Times-Roman", "Courier"]:
-                        c.setFont(font_name, font_size)
-                    else:
-                        c.setFont("Helvetica", font_size)
-        
-        if line:
-            c.drawString(x_margin, y, line.strip())
-            y -= font_size + 3
-        
-        y -= 5 # Add extra spacing between paragraphs
-
-        if y < y_margin:
-            c.showPage()
-            y = h - y_margin
-            if font_name in pdfmetrics.getRegisteredFontNames() or font_name in ["Helvetica", "Times-Roman", "Courier"]:
-                c.setFont(font_name, font_size)
-            else:
-                c.setFont("Helvetica", font_size)
-                
-    c.save()
+    render_text_pdf(text, path, lang_code=lang_code, font_size=11)
 
+@metrics.timed_stage("export_docx", engine="python-docx")
 def save_to_docx(text, path):
     doc = Document()
     font = doc.styles['Normal'].font
@@ -254,13 +533,111 @@ def save_to_docx(text, path):
 
 # ------------------- Main Pipeline -------------------
 
-def process_document(file_path, source_lang=None, target_lang=None, enhance=False):
+def build_page_result(page_no, result):
+    """Turns one page's raw OCR output into the partial result exposed while the job runs."""
+    text, word_conf, low_conf = result
+    return {
+        "page": page_no,
+        "text": text,
+        "word_confidence_scores": [conf for _, conf in word_conf],
+        "low_conf_count": len(low_conf),
+    }
+
+def _get_page_translation_pool():
+    """Returns the shared thread pool translating partial page results, creating it on first use."""
+    global _page_translation_pool
+    with _page_translation_pool_lock:
+        if _page_translation_pool is None:
+            _page_translation_pool = ThreadPoolExecutor(max_workers=max(1, Config.PAGE_TRANSLATION_WORKERS),
+                                                        thread_name_prefix="page-translate")
+        return _page_translation_pool
+
+class PageReporter:
+    """
+    The on_page callback handed down to the file handlers. Pages are passed on to
+    `on_page(page_result)` as they finish; with `translate`, each page is first translated
+    on the shared page-translation pool, so translation never holds up the loop that feeds
+    pages to the OCR workers.
+
+    finish() is called once the document result is ready: translations that haven't started
+    are dropped (the page is reported untranslated, the document result has the full
+    translation) and running ones are waited for.
+    """
+
+    def __init__(self, on_page, source_lang=None, target_lang=None, translate=False):
+        self.on_page = on_page
+        self.source_lang = source_lang
+        self.target_lang = normalize_lang(target_lang or 'en')
+        self.translate = translate
+        self._pending = []  # (future, page_result)
+
+    def __call__(self, page_no, result):
+        page_result = build_page_result(page_no, result)
+        if self.translate and page_result["text"].strip():
+            future = _get_page_translation_pool().submit(self._translate_and_report, page_result)
+            self._pending.append((future, page_result))
+        else:
+            self._report(page_result)
+
+    def _report(self, page_result):
+        try:
+            self.on_page(page_result)
+        except Exception as e:
+            print(f"[WARN] Page callback failed for page {page_result['page']}: {e}")
+
+    def _translate_and_report(self, page_result):
+        text = page_result["text"]
+        page_lang = self.source_lang or detect_language(text)[0]
+        try:
+            page_result["translated_text"] = translate_text(text, page_lang, self.target_lang)
+        except Exception as e:
+            print(f"[ERROR] Failed to translate page {page_result['page']}: {e}")
+            traceback.print_exc()
+        self._report(page_result)
+
+    def finish(self):
+        pending, self._pending = self._pending, []
+        for future, page_result in pending:
+            if future.cancel():
+                self._report(page_result)
+        wait([future for future, _ in pending])
+
+def process_document(file_path, source_lang=None, target_lang=None, enhance=False, progress=None,
+                     on_page=None, translate_pages=False):
+    """
+    Runs OCR, spelling/grammar correction and translation on a document and registers the
+    texts for PDF/DOCX export (rendered on first download, see app/exports.py).
+    `progress(stage, **info)` is called on every stage transition
+    (rasterize, preprocess, ocr, spell, translate, grammar, export).
+
+    `on_page(page_result)` is called as soon as each page is OCR'd (see build_page_result).
+    With `translate_pages`, pages are translated off the OCR path first (see PageReporter).
+    The document-level result is still assembled at the end.
+    """
+    # Every stage timed below this point is labeled with the upload's file type
+    with metrics.labels(file_type=file_type_of(file_path)):
+        return _process_document(file_path, source_lang, target_lang, enhance, progress, on_page, translate_pages)
+
+def _process_document(file_path, source_lang, target_lang, enhance, progress, on_page, translate_pages):
     # Determine the language to use for OCR based on source_lang or detection
     # Ensure source_lang is normalized for consistency
     initial_source_lang = normalize_lang(source_lang) if source_lang else None
 
-    # Perform OCR
-    extracted_text, word_conf, low_conf_words = extract_text_dynamic(file_path, enhance, source_lang=initial_source_lang)
+    page_reporter = None
+    if on_page is not None:
+        page_reporter = PageReporter(on_page, initial_source_lang, target_lang, translate=translate_pages)
+    try:
+        return _run_pipeline(file_path, initial_source_lang, target_lang, enhance, progress, page_reporter)
+    finally:
+        if page_reporter is not None:
+            page_reporter.finish()
+
+def _run_pipeline(file_path, initial_source_lang, target_lang, enhance, progress, page_callback):
+    # Perform OCR (or read the embedded text of digital PDF pages)
+    page_sources = {}
+    extracted_text, word_conf, low_conf_words = extract_text_dynamic(file_path, enhance, source_lang=initial_source_lang,
+                                                                     progress=progress, on_page=page_callback,
+                                                                     page_sources=page_sources)
     
     if not extracted_text.strip():
         print("[ERROR] No text could be extracted from the document.")
@@ -274,38 +651,33 @@ def process_document(file_path, source_lang=None, target_lang=None, enhance=Fals
     print(f"[INFO] Using language for processing: {lang_to_use} (Detected: {detected_lang_code}, Provided: {initial_source_lang})")
 
     # Spell correction (only for 'en' or 'hi' as per your logic)
+    report_progress(progress, "spell")
     extracted_text_corrected = correct_spelling(extracted_text, lang_code=lang_to_use)
+    # Low-confidence spans point into the OCR text; carry them over to the corrected text
+    low_conf_spans = remap_spans(extracted_text, extracted_text_corrected, low_conf_words)
 
     # Normalize target language code
     target_lang_code = normalize_lang(target_lang or 'en') # Default to 'en' if target_lang is None
 
     # Translate text
+    report_progress(progress, "translate")
     translated = translate_text(extracted_text_corrected, lang_to_use, target_lang_code)
     
     # Apply spell correction to translated text (only for 'en' or 'hi' as per your logic)
     translated_corrected = correct_spelling(translated, lang_code=target_lang_code)
     
     # Apply grammar correction to translated text (only for 'en' as per your logic)
+    report_progress(progress, "grammar")
     translated_final = grammar_correction(translated_corrected, lang_code=target_lang_code)
 
     # Get document statistics
     stats = get_doc_stats(extracted_text_corrected, file_path, chars_per_line=80)
 
-    file_id = str(uuid.uuid4())
-    results_dir = "static/results"
-    os.makedirs(results_dir, exist_ok=True) # Ensure results directory exists
-
-    # Save extracted text
-    extracted_pdf_path = os.path.join(results_dir, f"extracted_{file_id}.pdf")
-    extracted_docx_path = os.path.join(results_dir, f"extracted_{file_id}.docx")
-    save_to_pdf(extracted_text_corrected, extracted_pdf_path, lang_code=lang_to_use)
-    save_to_docx(extracted_text_corrected, extracted_docx_path)
-
-    # Save translated text
-    translated_pdf_path = os.path.join(results_dir, f"translated_{file_id}.pdf")
-    translated_docx_path = os.path.join(results_dir, f"translated_{file_id}.docx")
-    save_to_pdf(translated_final, translated_pdf_path, lang_code=target_lang_code)
-    save_to_docx(translated_final, translated_docx_path)
+    # Exports are rendered on first download; only the texts are stored here
+    report_progress(progress, "export")
+    export_store = get_export_store()
+    extracted_downloads = export_store.register("extracted", extracted_text_corrected, lang_to_use)
+    translated_downloads = export_store.register("translated", translated_final, target_lang_code)
 
     avg_conf = sum([conf for _, conf in word_conf]) / len(word_conf) if word_conf else 1.0
 
@@ -313,20 +685,21 @@ def process_document(file_path, source_lang=None, target_lang=None, enhance=Fals
     print("[DEBUG] Flattened Confidence Scores (sample):", [conf for _, conf in word_conf[:3]])
 
     return {
-        "extracted_text": highlight_low_confidence_words(extracted_text_corrected, low_conf_words),
+        "extracted_text": highlight_low_confidence_words(extracted_text_corrected, low_conf_spans),
         "translated_text": translated_final,
         "detected_language": detected_lang_code,
         "confidence": confidence, # Confidence of language detection
         "stats": stats,
         "low_conf_count": len(low_conf_words),
         "word_confidence_scores": [conf for _, conf in word_conf],
+        "page_sources": {str(page_no): page_sources[page_no] for page_no in sorted(page_sources)},
         "confidence_metrics": {
             "document_quality": min(100, round(avg_conf * 100 + (10 if enhance else 0))), # Add bonus for enhancement
             "handwriting_clarity": round(avg_conf * 100), # This metric might be misleading if text is printed
             "text_recognition": round(avg_conf * 100) # Use OCR average confidence for recognition
         },
-        "download_extracted_pdf": f"/{extracted_pdf_path}", 
-        "download_extracted_docx": f"/{extracted_docx_path}",
-        "download_translated_pdf": f"/{translated_pdf_path}",
-        "download_translated_docx": f"/{translated_docx_path}"
+        "download_extracted_pdf": extracted_downloads["pdf"],
+        "download_extracted_docx": extracted_downloads["docx"],
+        "download_translated_pdf": translated_downloads["pdf"],
+        "download_translated_docx": translated_downloads["docx"]
     }
\ No newline at end of file
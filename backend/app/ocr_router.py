@@ -1,24 +1,71 @@
 import os
-import torch
+import re
+import cv2
+import numpy as np
 from PIL import Image
-from paddleocr import PaddleOCR
-from transformers import TrOCRProcessor, VisionEncoderDecoderModel
 # Import the new segment_text_lines_opencv function
-from app.utils import detect_handwritten_or_printed, segment_text_lines_opencv 
+from app.utils import detect_handwritten_or_printed, segment_text_lines_opencv, load_image, strip_with_spans
+from app.preload import timed
+from app.model_registry import get_model_registry
+from app.quantization import maybe_quantize
+from app import metrics
+from config import Config
 import traceback
 
+# torch, transformers and paddleocr are imported on first use (see get_device, get_trocr and
+# _get_paddle_ocr_instance) so importing this module stays cheap.
+
+TROCR_MODEL_NAME = "microsoft/trocr-base-handwritten"
+
 # ------------------ Device Setup ------------------
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-print(f"[INFO] Using device: {device}")
+_device = None
+
+def get_device():
+    global _device
+    if _device is None:
+        with timed("module", "torch"):
+            import torch
+        _device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        print(f"[INFO] Using device: {_device}")
+    return _device
 
 # ------------------ Global OCR Engine Instances (Cached) ------------------
-_paddle_ocr_models = {} # Cache for PaddleOCR instances per language
+# Loaded models live in the model registry (keys "trocr" and "paddleocr:<lang>"), which
+# unloads the least recently used ones when MODEL_RAM_BUDGET_MB is exceeded.
+_paddle_failed_langs = set() # Languages whose PaddleOCR model failed to load; served by 'en'
+_trocr_onnx_failed = False # TROCR_BACKEND=onnx couldn't load or failed its parity check; torch is used
 
 # TrOCR is primarily for English handwritten text with the current model.
 # If multi-lingual handwritten OCR is required, a different TrOCR model or fine-tuning is needed.
-processor = TrOCRProcessor.from_pretrained("microsoft/trocr-base-handwritten")
-model = VisionEncoderDecoderModel.from_pretrained("microsoft/trocr-base-handwritten").to(device)
-model.eval()
+def _load_trocr(quantize=None):
+    """Loads the TrOCR (processor, model) pair; int8-quantized if configured (see QUANTIZE_MODELS)."""
+    device = get_device()
+    with timed("module", "transformers"):
+        from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+    with timed("model", TROCR_MODEL_NAME):
+        processor = TrOCRProcessor.from_pretrained(TROCR_MODEL_NAME)
+        model = VisionEncoderDecoderModel.from_pretrained(TROCR_MODEL_NAME).to(device)
+        model.eval()
+    model = maybe_quantize("trocr", model, device, quantize=quantize)
+    return processor, model
+
+def get_trocr():
+    """Returns the shared (processor, model) TrOCR pair, loading it on first use."""
+    return get_model_registry().get("trocr", _load_trocr)
+
+def get_trocr_onnx():
+    """Returns the shared onnxruntime TrOCR recognizer (TROCR_BACKEND=onnx), exporting the model on first use."""
+    from app.trocr_onnx import load_trocr_onnx
+    return get_model_registry().get("trocr:onnx", lambda: load_trocr_onnx(TROCR_MODEL_NAME))
+
+def _create_paddle_ocr(lang_code):
+    import torch
+    print(f"[INFO] Initializing PaddleOCR for language: {lang_code}")
+    with timed("module", "paddleocr"):
+        from paddleocr import PaddleOCR
+    with timed("model", f"paddleocr-{lang_code}"):
+        # use_gpu=True ensures GPU is utilized if available
+        return PaddleOCR(use_angle_cls=True, lang=lang_code, use_gpu=torch.cuda.is_available(), show_log=False)
 
 # Helper to get/initialize PaddleOCR instance for a given language
 def _get_paddle_ocr_instance(lang_code):
@@ -26,34 +73,34 @@ def _get_paddle_ocr_instance(lang_code):
     Lazily initializes and returns a PaddleOCR instance for the given language code.
     Falls back to 'en' if the specific language model fails to load.
     """
-    if lang_code not in _paddle_ocr_models:
-        print(f"[INFO] Initializing PaddleOCR for language: {lang_code}")
+    registry = get_model_registry()
+    if lang_code not in _paddle_failed_langs:
         try:
-            # use_gpu=True ensures GPU is utilized if available
-            _paddle_ocr_models[lang_code] = PaddleOCR(use_angle_cls=True, lang=lang_code, use_gpu=torch.cuda.is_available(), show_log=False)
-            print(f"[INFO] PaddleOCR for '{lang_code}' loaded successfully.")
+            return registry.get(f"paddleocr:{lang_code}", lambda: _create_paddle_ocr(lang_code))
         except Exception as e:
             print(f"[ERROR] Failed to load PaddleOCR for '{lang_code}': {e}.")
-            print(f"[WARN] Falling back to 'en' PaddleOCR model for '{lang_code}'.")
-            if 'en' not in _paddle_ocr_models: # Ensure 'en' fallback is also loaded if not already
-                _paddle_ocr_models['en'] = PaddleOCR(use_angle_cls=True, lang='en', use_gpu=torch.cuda.is_available(), show_log=False)
-            _paddle_ocr_models[lang_code] = _paddle_ocr_models['en'] # Assign 'en' fallback
-    return _paddle_ocr_models[lang_code]
+            _paddle_failed_langs.add(lang_code)
+    print(f"[WARN] Falling back to 'en' PaddleOCR model for '{lang_code}'.")
+    return registry.get("paddleocr:en", lambda: _create_paddle_ocr('en'))
 
 # ------------------ PP-OCRv3 Handler ------------------
-def run_ppocr(image_path, lang='en'):
+@metrics.timed_stage("ocr", engine="paddleocr", lang_param="lang")
+def run_ppocr(image, lang='en'):
+    """Runs PaddleOCR on an image path or a BGR/grayscale ndarray."""
+    image_path = image if isinstance(image, str) else "<in-memory image>"
     try:
         print(f"[INFO] Running PaddleOCR (lang='{lang}') on: {image_path}")
         ocr_instance = _get_paddle_ocr_instance(lang)
-        result = ocr_instance.ocr(image_path, cls=True)
+        result = ocr_instance.ocr(image, cls=True)
 
         if not result or not result[0]:
             print(f"[WARN] No OCR result from PaddleOCR for {image_path} with lang='{lang}'.")
             return "", [], []
 
-        extracted_text = ""
+        lines = []
+        offset = 0  # Where the next line starts in the joined text
         word_conf_list = []
-        low_conf_words = []
+        low_conf_words = []  # (word, start, end) character spans into the returned text
 
         for line_data in result[0]:
             try:
@@ -64,13 +111,14 @@ def run_ppocr(image_path, lang='en'):
                     full_line = text_conf[0]
                     conf = float(text_conf[1])
 
-                    words = full_line.split()
-                    for word in words:
+                    for match in re.finditer(r"\S+", full_line):
+                        word = match.group()
                         word_conf_list.append((word, conf))
                         if conf < 0.7:
-                            low_conf_words.append(word)
+                            low_conf_words.append((word, offset + match.start(), offset + match.end()))
 
-                    extracted_text += full_line + " "
+                    lines.append(full_line)
+                    offset += len(full_line) + 1
                 else:
                     # Fallback if format is not standard
                     print(f"[WARN] Unexpected OCR data format: {text_conf}")
@@ -78,8 +126,9 @@ def run_ppocr(image_path, lang='en'):
                         word = text_conf
                         conf = 0.5  # Assume low confidence
                         word_conf_list.append((word, conf))
-                        low_conf_words.append(word)
-                        extracted_text += word + " "
+                        low_conf_words.append((word, offset, offset + len(word)))
+                        lines.append(word)
+                        offset += len(word) + 1
 
             except Exception as inner_e:
                 print(f"[ERROR] Failed to parse OCR line: {line_data}. Error: {inner_e}")
@@ -89,27 +138,96 @@ def run_ppocr(image_path, lang='en'):
         print("[DEBUG] Word Confidence Scores (sample):", word_conf_list[:3])
         print("[DEBUG] Flattened Confidence Scores (sample):", [conf for _, conf in word_conf_list[:3]])
 
-        return extracted_text.strip(), word_conf_list, low_conf_words
+        extracted_text, low_conf_words = strip_with_spans(" ".join(lines), low_conf_words)
+        return extracted_text, word_conf_list, low_conf_words
 
     except Exception as e:
         print(f"[ERROR] PaddleOCR failed for {image_path} (lang='{lang}'): {e}")
+        metrics.ERRORS.inc(stage="ocr")
         traceback.print_exc()
         return "", [], []
 
 # ------------------ TrOCR Handler ------------------
-def run_trocr(image_path):
+def _line_to_rgb(line):
+    """Line crops arrive as grayscale/BGR arrays (segment_text_lines_opencv) or PIL images; TrOCR wants RGB PIL."""
+    if isinstance(line, np.ndarray):
+        code = cv2.COLOR_GRAY2RGB if line.ndim == 2 else cv2.COLOR_BGR2RGB
+        return Image.fromarray(cv2.cvtColor(line, code))
+    return line if line.mode == 'RGB' else line.convert("RGB")
+
+def recognize_lines_trocr(line_images, batch_size=None, trocr=None):
+    """
+    Runs TrOCR over a list of line images in padded mini-batches and returns one string per
+    line, in the same order as the input.
+
+    Lines are grouped by width so each batch holds lines of similar length: generation runs
+    until the longest sequence in a batch finishes, so mixing short and long lines wastes
+    decoder steps on the short ones.
+
+    `trocr` optionally overrides the shared (processor, model) pair, e.g. to compare variants.
+    With TROCR_BACKEND=onnx (and no override), lines are decoded through onnxruntime instead,
+    provided the export matched generate() on its parity lines (see app/trocr_onnx.py).
+    """
+    global _trocr_onnx_failed
+    use_onnx = trocr is None and Config.TROCR_BACKEND == "onnx" and not _trocr_onnx_failed
+    if use_onnx:
+        try:
+            recognizer = get_trocr_onnx()
+        except Exception as e:
+            # Remembered so a failed export or parity check isn't retried for every page
+            print(f"[ERROR] TrOCR ONNX backend unavailable: {e}. Falling back to torch.")
+            _trocr_onnx_failed = True
+            use_onnx = False
+    if not use_onnx:
+        import torch
+        processor, model = trocr or get_trocr()
+        device = get_device()
+    batch_size = max(1, batch_size or Config.TROCR_BATCH_SIZE)
+    line_images = [_line_to_rgb(img) for img in line_images]
+
+    order = sorted(range(len(line_images)), key=lambda i: line_images[i].width)
+    line_texts = [""] * len(line_images)
+
+    for start in range(0, len(order), batch_size):
+        batch_indices = order[start:start + batch_size]
+        if use_onnx:
+            decoded = recognizer.recognize([line_images[i] for i in batch_indices], num_beams=5, max_length=512)
+            for i, line_text in zip(batch_indices, decoded):
+                line_texts[i] = line_text
+            continue
+
+        # Prepare pixel values for the model; the processor resizes every line to the same input size
+        pixel_values = processor(images=[line_images[i] for i in batch_indices], return_tensors="pt").pixel_values.to(device)
+
+        with torch.no_grad():
+            generated_ids = model.generate(
+                pixel_values, 
+                max_length=512, 
+                num_beams=5, 
+                early_stopping=True
+            )
+
+        decoded = processor.batch_decode(generated_ids, skip_special_tokens=True)
+        for i, line_text in zip(batch_indices, decoded):
+            line_texts[i] = line_text
+
+    return line_texts
+
+@metrics.timed_stage("ocr", engine="trocr")
+def run_trocr(image):
     """
-    Runs TrOCR on a given image. It first segments the image into lines
-    and then processes each line individually with TrOCR.
+    Runs TrOCR on a given image (path or ndarray). It first segments the image into lines
+    and then recognizes the lines in batches with TrOCR.
     This TrOCR model is primarily for English handwritten text.
     For multi-lingual handwritten OCR, a different model or fine-tuning is generally required.
     """
+    image_path = image if isinstance(image, str) else "<in-memory image>"
     try:
         print(f"[INFO] Running TrOCR on segmented lines from: {image_path}")
         
         # Segment the image into text lines using OpenCV from utils
-        # segment_text_lines_opencv returns a list of (PIL_Image_of_line, y_coordinate)
-        line_images_with_coords = segment_text_lines_opencv(image_path) 
+        # segment_text_lines_opencv returns a list of (grayscale line crop, y_coordinate)
+        line_images_with_coords = segment_text_lines_opencv(image) 
         
         if not line_images_with_coords:
             print(f"[WARN] No text lines found for TrOCR processing in {image_path}.")
@@ -121,24 +239,10 @@ def run_trocr(image_path):
         word_conf_list = [] 
         low_conf_words = []
 
-        # Process each segmented line
-        for line_img, y_coord in line_images_with_coords:
-            # Ensure the PIL Image is in RGB format for TrOCR
-            if line_img.mode != 'RGB':
-                line_img = line_img.convert("RGB")
-            
-            # Prepare pixel values for the model
-            pixel_values = processor(images=line_img, return_tensors="pt").pixel_values.to(device)
-
-            with torch.no_grad():
-                generated_ids = model.generate(
-                    pixel_values, 
-                    max_length=512, 
-                    num_beams=5, 
-                    early_stopping=True
-                )
-            
-            line_text = processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
+        # Recognize all segmented lines in mini-batches; results come back in line order
+        line_texts = recognize_lines_trocr([line_img for line_img, _ in line_images_with_coords])
+
+        for line_text in line_texts:
             full_extracted_text.append(line_text.strip()) # Add stripped line text
 
             line_words = line_text.strip().split()
@@ -153,26 +257,35 @@ def run_trocr(image_path):
 
     except Exception as e:
         print(f"[ERROR] TrOCR failed: {e}")
+        metrics.ERRORS.inc(stage="ocr")
         traceback.print_exc()
         return "", [], []
 
 # ------------------ Dynamic Routing ------------------
-def extract_text_with_best_model(image_path, source_lang='en'):
-    if not os.path.exists(image_path):
-        print(f"[ERROR] File not found: {image_path}")
+def extract_text_with_best_model(image, source_lang='en', is_handwritten=None):
+    """
+    Routes an image (path or ndarray) to TrOCR or PaddleOCR. Pass `is_handwritten` when the
+    page has already been classified to avoid running the detection again.
+    """
+    image_path = image if isinstance(image, str) else "<in-memory image>"
+    if isinstance(image, str) and not os.path.exists(image):
+        print(f"[ERROR] File not found: {image}")
         return "", [], []
 
     try:
-        is_handwritten = detect_handwritten_or_printed(image_path)
+        # Decode once; both detection and the OCR engine work on the same array
+        image = load_image(image)
+        if is_handwritten is None:
+            is_handwritten = detect_handwritten_or_printed(image)
         engine = "TrOCR" if is_handwritten else "PaddleOCR"
         print(f"[INFO] Routing to {engine} for file: {image_path} (detected handwritten: {is_handwritten})")
 
         if is_handwritten:
             # If handwritten, use TrOCR, which now processes segmented lines
-            return run_trocr(image_path) 
+            return run_trocr(image) 
         else:
             # If not handwritten, use PaddleOCR with the specified source language.
-            return run_ppocr(image_path, lang=source_lang)
+            return run_ppocr(image, lang=source_lang)
 
     except Exception as e:
         print(f"[ERROR] OCR routing failed for {image_path}: {e}")
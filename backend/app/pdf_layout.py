@@ -0,0 +1,139 @@
+import os
+import threading
+import traceback
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from app.preload import timed
+from app.utils import LANG_FONT_MAP
+
+FALLBACK_FONT = "Helvetica"
+
+# lang code -> registered font name, filled once by register_fonts()
+_registered_fonts = {}
+_fonts_lock = threading.Lock()
+_fonts_loaded = False
+
+
+def register_fonts():
+    """
+    Registers every LANG_FONT_MAP font with ReportLab once per process. TrueType fonts are
+    embedded as subsets holding only the glyphs a document uses, so registering them all
+    costs nothing in the output size.
+    """
+    global _fonts_loaded
+    if _fonts_loaded:
+        return dict(_registered_fonts)
+    with _fonts_lock:
+        if not _fonts_loaded:
+            with timed("module", "pdf fonts"):
+                for lang_code, font_path in LANG_FONT_MAP.items():
+                    font_name = f"Noto_{lang_code}"
+                    if not os.path.exists(font_path):
+                        print(f"[WARN] Font not found for language: {lang_code} at {font_path}.")
+                        continue
+                    try:
+                        if font_name not in pdfmetrics.getRegisteredFontNames():
+                            pdfmetrics.registerFont(TTFont(font_name, font_path))
+                        _registered_fonts[lang_code] = font_name
+                    except Exception as e:
+                        print(f"[ERROR] Failed to register font for {lang_code}: {e}")
+                        traceback.print_exc()
+            _fonts_loaded = True
+    return dict(_registered_fonts)
+
+
+def font_for(lang_code):
+    """Registered font name for `lang_code`, falling back to the English Noto font, then Helvetica."""
+    fonts = register_fonts()
+    return fonts.get(lang_code) or fonts.get("en") or FALLBACK_FONT
+
+
+class FontMetrics:
+    """
+    Advance widths for one font, measured per character on first use and cached. ReportLab
+    measures a string as the sum of its characters' advances (no kerning), so adding up
+    cached widths gives exactly what stringWidth would.
+    """
+
+    def __init__(self, font_name):
+        self.font_name = font_name
+        self._char_widths = {}
+
+    def width(self, text, font_size):
+        widths = self._char_widths
+        total = 0.0
+        for char in text:
+            w = widths.get(char)
+            if w is None:
+                w = widths[char] = pdfmetrics.stringWidth(char, self.font_name, 1000)
+            total += w
+        return total * font_size / 1000
+
+
+_metrics = {}
+
+
+def get_font_metrics(font_name):
+    metrics = _metrics.get(font_name)
+    if metrics is None:
+        metrics = _metrics.setdefault(font_name, FontMetrics(font_name))
+    return metrics
+
+
+def wrap_paragraph(paragraph, font_metrics, font_size, max_width):
+    """
+    Greedy line breaking in one pass over the words: each word is measured once and the line
+    width is kept as a running sum. A word that doesn't fit starts a new line; a word wider
+    than a whole line gets a line of its own.
+    """
+    space = font_metrics.width(" ", font_size)
+    lines, line, line_width = [], [], 0.0
+    for word in paragraph.split(" "):
+        word_width = font_metrics.width(word, font_size)
+        if line and line_width + word_width + space >= max_width:
+            lines.append(" ".join(line).strip())
+            line, line_width = [], 0.0
+        line.append(word)
+        line_width += word_width + space
+    if line:
+        lines.append(" ".join(line).strip())
+    return lines
+
+
+def render_text_pdf(text, path, lang_code="en", font_size=11):
+    """Lays `text` out on A4 pages (one paragraph per input line) with the font for `lang_code`."""
+    font_name = font_for(lang_code)
+    font_metrics = get_font_metrics(font_name)
+
+    c = canvas.Canvas(path, pagesize=A4)
+    w, h = A4
+    x_margin, y_margin = inch * 0.75, inch * 0.75
+    max_width = w - 2 * x_margin
+    leading = font_size + 3
+    y = h - y_margin
+    c.setFont(font_name, font_size)
+
+    def next_page_if_full():
+        nonlocal y
+        if y < y_margin:
+            c.showPage()
+            c.setFont(font_name, font_size)
+            y = h - y_margin
+
+    for para in text.split("\n"):
+        lines = wrap_paragraph(para, font_metrics, font_size, max_width)
+        for i, line in enumerate(lines):
+            c.drawString(x_margin, y, line)
+            y -= leading
+            # The last line of a paragraph may still use the bottom margin, like its spacing below
+            if i < len(lines) - 1:
+                next_page_if_full()
+        y -= 5  # Extra spacing between paragraphs
+        next_page_if_full()
+
+    c.save()
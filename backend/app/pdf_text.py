@@ -0,0 +1,122 @@
+import unicodedata
+
+from config import Config
+
+# How a page's text was obtained; reported per page as the job's page_sources
+SOURCE_TEXT = "text"        # Embedded text layer only
+SOURCE_OCR = "ocr"          # Rasterized and OCR'd
+SOURCE_MIXED = "text+ocr"   # Text layer plus OCR of embedded images without text over them
+
+# Unicode blocks of the Indic scripts the app supports
+SCRIPT_RANGES = {
+    "hi": (0x0900, 0x097F),  # Devanagari
+    "ta": (0x0B80, 0x0BFF),
+    "te": (0x0C00, 0x0C7F),
+    "kn": (0x0C80, 0x0CFF),
+    "ml": (0x0D00, 0x0D7F),
+}
+_INDIC_RANGE = (0x0900, 0x0DFF)
+
+
+def _is_indic(char):
+    return _INDIC_RANGE[0] <= ord(char) <= _INDIC_RANGE[1]
+
+
+def check_text_layer(text, source_lang=None):
+    """
+    Decides whether an embedded text layer can be used instead of OCR.
+
+    Rejects layers that are nearly empty, contain replacement/private-use/control characters
+    (fonts without a usable ToUnicode map), are mostly in another script than `source_lang`
+    (legacy Indic fonts that map Devanagari glyphs to Latin codes), or have many Indic words
+    starting with a vowel sign or virama (glyphs extracted in visual instead of logical order).
+
+    Returns:
+        tuple[bool, str]: (plausible, reason)
+    """
+    chars = [c for c in text if not c.isspace()]
+    if len(chars) < Config.PDF_TEXT_MIN_CHARS:
+        return False, f"only {len(chars)} characters"
+
+    bad = sum(1 for c in chars if c == "�" or unicodedata.category(c) in ("Co", "Cc", "Cs", "Cn"))
+    if bad / len(chars) > 0.02:
+        return False, f"{bad} replacement, private-use or control characters"
+
+    letters = [c for c in chars if unicodedata.category(c)[0] in "LM"]
+    if len(letters) < len(chars) / 2:
+        return False, "mostly non-letters"
+
+    script = SCRIPT_RANGES.get(source_lang)
+    if script:
+        share = sum(1 for c in letters if script[0] <= ord(c) <= script[1]) / len(letters)
+        if share < 0.5:
+            return False, f"only {share:.0%} of letters in the '{source_lang}' script"
+
+    indic_words = [w for w in text.split() if any(_is_indic(c) for c in w)]
+    if indic_words:
+        broken = sum(1 for w in indic_words if unicodedata.category(w[0]) in ("Mn", "Mc"))
+        if broken / len(indic_words) > 0.1:
+            return False, f"{broken} of {len(indic_words)} Indic words start with a combining mark"
+
+    return True, "ok"
+
+
+def _area(rect):
+    return max(0.0, rect[2] - rect[0]) * max(0.0, rect[3] - rect[1])
+
+
+def _overlap(a, b):
+    return _area((max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3])))
+
+
+class PagePlan:
+    """What to do with one PDF page: its usable text layer (if any) and the image regions to OCR."""
+
+    def __init__(self, source, text="", regions=None, reason=""):
+        self.source = source
+        self.text = text
+        self.regions = regions or []
+        self.reason = reason
+
+    @property
+    def needs_ocr(self):
+        return self.source != SOURCE_TEXT
+
+    def text_result(self):
+        # Embedded text is not OCR'd, so it gets the same high confidence as DOCX paragraphs
+        return self.text, [(w, 0.99) for w in self.text.split()], []
+
+
+def plan_page(page, source_lang=None):
+    """
+    Builds the PagePlan for a PyMuPDF page: OCR the whole page when its text layer is
+    missing or implausible (or images without text cover most of it), otherwise use the
+    text layer and OCR only sizeable images that no text is drawn over.
+    """
+    if not Config.PDF_TEXT_LAYER:
+        return PagePlan(SOURCE_OCR, reason="text layer disabled")
+
+    text = page.get_text("text", sort=True).strip()
+    plausible, reason = check_text_layer(text, source_lang)
+    if not plausible:
+        return PagePlan(SOURCE_OCR, reason=reason)
+
+    page_rect = tuple(page.rect)
+    page_area = _area(page_rect)
+    text_rects = [tuple(block[:4]) for block in page.get_text("blocks") if block[6] == 0]
+    regions = []
+    for info in page.get_image_info():
+        rect = tuple(info["bbox"])
+        area = _area(rect)
+        if area < Config.PDF_IMAGE_REGION_MIN_AREA * page_area:
+            continue  # Logos, bullets, rules
+        # Scans with an invisible OCR layer have text over the image; that text is used as is
+        if sum(_overlap(rect, t) for t in text_rects) < 0.1 * area:
+            regions.append(rect)
+
+    if sum(_area(r) for r in regions) >= 0.6 * page_area:
+        return PagePlan(SOURCE_OCR, reason="images without text cover most of the page")
+    if regions:
+        return PagePlan(SOURCE_MIXED, text, regions, reason=f"{len(regions)} image region(s) to OCR")
+    return PagePlan(SOURCE_TEXT, text, reason=reason)
+
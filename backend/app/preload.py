@@ -0,0 +1,111 @@
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+from config import Config
+
+# (kind, name) -> seconds, for every heavy module import and model load done so far
+_timings = {}
+_timings_lock = threading.Lock()
+
+_ready = threading.Event()
+_warmup_state = {"policy": None, "started_at": None, "finished_at": None, "errors": []}
+
+
+@contextmanager
+def timed(kind, name):
+    """
+    Records how long the wrapped import or model load took under `kind` ("module" or "model").
+    Only the first measurement per name is kept, since that is the one that paid the cost.
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started_at
+        with _timings_lock:
+            if (kind, name) not in _timings:
+                _timings[(kind, name)] = elapsed
+                print(f"[INFO] Loaded {kind} '{name}' in {elapsed:.2f}s.")
+
+
+def startup_report():
+    """Returns the recorded load times grouped by kind, slowest first."""
+    with _timings_lock:
+        items = sorted(_timings.items(), key=lambda item: item[1], reverse=True)
+    report = {"modules": {}, "models": {}}
+    for (kind, name), seconds in items:
+        report.setdefault(f"{kind}s", {})[name] = round(seconds, 3)
+    return report
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def readiness():
+    """Snapshot for the /ready endpoint."""
+    state = dict(_warmup_state, errors=list(_warmup_state["errors"]))
+    return {"ready": is_ready(), **state, "timings": startup_report()}
+
+
+def _split(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def warmup():
+    """Imports the OCR pipeline and loads the configured models so the first request doesn't pay for them."""
+    errors = _warmup_state["errors"]
+
+    def step(name, fn):
+        try:
+            fn()
+        except Exception as e:
+            print(f"[ERROR] Warmup step '{name}' failed: {e}")
+            traceback.print_exc()
+            errors.append(f"{name}: {e}")
+
+    with timed("module", "app.ocr_engine"):
+        import app.ocr_engine  # noqa: F401  (pulls in cv2, reportlab, ocr_router, translator)
+    from app import ocr_router, translator, pdf_layout
+
+    step("pdf-fonts", pdf_layout.register_fonts)
+    if Config.PRELOAD_TROCR:
+        step("trocr", ocr_router.get_trocr)
+    for lang in _split(Config.PRELOAD_OCR_LANGUAGES):
+        step(f"paddleocr-{lang}", lambda lang=lang: ocr_router._get_paddle_ocr_instance(lang))
+    step("indic-processor", translator.get_indic_processor)
+    for model_type in _split(Config.PRELOAD_TRANSLATION_MODELS):
+        step(f"translation-{model_type}", lambda model_type=model_type: translator._load_model_and_tokenizer(model_type))
+
+
+def start_preload():
+    """
+    Applies Config.MODEL_PRELOAD. With 'eager', models are warmed up in a background thread
+    and /ready reports 503 until that finishes; with 'lazy', the app is ready immediately and
+    every model loads on first use.
+    """
+    policy = Config.MODEL_PRELOAD
+    _warmup_state["policy"] = policy
+    _warmup_state["started_at"] = time.time()
+    if policy != "eager":
+        if policy != "lazy":
+            print(f"[WARN] Unknown MODEL_PRELOAD '{policy}', loading models lazily.")
+        _warmup_state["finished_at"] = time.time()
+        _ready.set()
+        return
+
+    def run():
+        print("[INFO] Warming up OCR and translation models...")
+        try:
+            warmup()
+        except Exception as e:
+            traceback.print_exc()
+            _warmup_state["errors"].append(str(e))
+        finally:
+            _warmup_state["finished_at"] = time.time()
+            _ready.set()
+            print(f"[INFO] Warmup finished in {_warmup_state['finished_at'] - _warmup_state['started_at']:.1f}s: {startup_report()}")
+
+    threading.Thread(target=run, name="model-warmup", daemon=True).start()
@@ -0,0 +1,44 @@
+from config import Config
+
+
+def _configured_keys():
+    return {key.strip() for key in Config.QUANTIZE_MODELS.split(",") if key.strip()}
+
+
+def is_quantized(key):
+    """
+    True if `key` (a model registry key such as "trocr" or "translation:en-indic") is configured
+    for int8 inference. "translation" enables it for every IndicTrans2 model.
+    """
+    keys = _configured_keys()
+    return key in keys or key.split(":", 1)[0] in keys
+
+
+def quantize_int8(model):
+    """
+    Applies PyTorch dynamic int8 quantization to every nn.Linear in `model` (CPU only).
+    Weights are stored as int8 and activations are quantized on the fly, which shrinks the
+    Linear layers about 4x and speeds up their matmuls on CPUs with int8 support.
+    """
+    import torch
+    quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    # Read by caches (translation memory, OCR result cache) so int8 outputs never mix with fp32 ones
+    quantized.quantized_int8 = True
+    return quantized
+
+
+def maybe_quantize(key, model, device, quantize=None):
+    """
+    Returns `model` quantized to int8 when `quantize` is True, or when it is None and `key` is
+    listed in Config.QUANTIZE_MODELS. Quantized kernels only run on CPU, so CUDA models are
+    returned unchanged.
+    """
+    if quantize is None:
+        quantize = is_quantized(key)
+    if not quantize:
+        return model
+    if str(device) != "cpu":
+        print(f"[WARN] Skipping int8 quantization of '{key}': dynamic quantization only runs on CPU (device: {device}).")
+        return model
+    print(f"[INFO] Quantizing '{key}' Linear layers to int8.")
+    return quantize_int8(model)
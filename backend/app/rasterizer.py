@@ -0,0 +1,130 @@
+import statistics
+
+import numpy as np
+
+from config import Config
+
+POINTS_PER_INCH = 72
+
+
+def open_pdf(file_path):
+    """Opens a PDF with PyMuPDF. Imported lazily so the module loads without it."""
+    import fitz
+    return fitz.open(file_path)
+
+
+def _text_dpi(page):
+    """
+    DPI at which the page's median font size renders PDF_TARGET_TEXT_PX tall, or None if
+    the page has no text spans. Even a text layer too garbled to use still has the right
+    geometry.
+    """
+    sizes = [
+        span["size"]
+        for block in page.get_text("dict")["blocks"] if block.get("type") == 0
+        for line in block["lines"]
+        for span in line["spans"] if span["text"].strip() and span["size"] > 0
+    ]
+    if not sizes:
+        return None
+    return Config.PDF_TARGET_TEXT_PX * POINTS_PER_INCH / statistics.median(sizes)
+
+
+def _image_dpi(page):
+    """
+    Native resolution of the largest image if it covers at least half of the page (a scan),
+    else None. Rendering a scan above its own resolution only adds pixels, not detail.
+    """
+    page_area = page.rect.width * page.rect.height
+    best, best_area = None, 0.5 * page_area
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = info["bbox"]
+        area = (x1 - x0) * (y1 - y0)
+        if area >= best_area and x1 > x0 and info.get("width"):
+            best, best_area = info["width"] * POINTS_PER_INCH / (x1 - x0), area
+    return best
+
+
+def page_dpi(page):
+    """
+    Picks the rasterization DPI of a PyMuPDF page: from its text size when it has a text
+    layer, else from the resolution of the scan filling it, else PDF_DPI. The result is
+    clamped to [PDF_MIN_DPI, PDF_MAX_DPI] and lowered further for large pages, so no render
+    exceeds PDF_MAX_PIXELS.
+    """
+    dpi = _text_dpi(page) or _image_dpi(page) or Config.PDF_DPI
+    dpi = min(max(dpi, Config.PDF_MIN_DPI), Config.PDF_MAX_DPI)
+    page_sq_inches = (page.rect.width / POINTS_PER_INCH) * (page.rect.height / POINTS_PER_INCH)
+    if page_sq_inches > 0:
+        dpi = min(dpi, (Config.PDF_MAX_PIXELS / page_sq_inches) ** 0.5)
+    return max(1, int(dpi))
+
+
+def render_page(page, dpi=None, clip=None):
+    """
+    Renders a PyMuPDF page (or the `clip` rectangle of it, in PDF points) straight into a
+    BGR ndarray. The pixmap's samples are read in place, so the only copy made is the
+    RGB-to-BGR conversion.
+    """
+    import cv2
+    import fitz
+    if dpi is None:
+        dpi = page_dpi(page)
+    pix = page.get_pixmap(dpi=dpi, clip=fitz.Rect(clip) if clip is not None else None,
+                          colorspace=fitz.csRGB, alpha=False)
+    samples = pix.samples_mv if hasattr(pix, "samples_mv") else pix.samples
+    rgb = np.frombuffer(samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width * 3]
+    return cv2.cvtColor(rgb.reshape(pix.height, pix.width, 3), cv2.COLOR_RGB2BGR)
+
+
+class PdfRasterizer:
+    """
+    Renders the pages of one PDF in-process, one at a time and only when asked for, so a
+    document never has more than the current page in memory. Use as a context manager.
+
+    Args:
+        dpi: Fixed resolution for every page; by default it is chosen per page (page_dpi).
+    """
+
+    def __init__(self, file_path, dpi=None):
+        self.file_path = file_path
+        self.dpi = dpi
+        self._doc = open_pdf(file_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+
+    @property
+    def page_count(self):
+        return self._doc.page_count
+
+    def page(self, page_no):
+        """PyMuPDF page for a 1-based page number."""
+        return self._doc[page_no - 1]
+
+    def dpi_for(self, page_no):
+        return self.dpi or page_dpi(self.page(page_no))
+
+    def render(self, page_no, clip=None, dpi=None):
+        """Renders a 1-based page, or the `clip` rectangle of it, to a BGR ndarray."""
+        page = self.page(page_no)
+        return render_page(page, dpi or self.dpi or page_dpi(page), clip=clip)
+
+    def iter_pages(self, page_numbers=None):
+        """Yields (page_no, image) for `page_numbers` (default: all pages), rendering each on demand."""
+        for page_no in page_numbers or range(1, self.page_count + 1):
+            yield page_no, self.render(page_no)
+
+
+def rasterize_page(file_path, page_no, dpi=None):
+    """Renders a single 1-based page of a PDF to a BGR ndarray."""
+    with PdfRasterizer(file_path, dpi=dpi) as pdf:
+        return pdf.render(page_no)
@@ -1,17 +1,26 @@
-from flask import Blueprint, request, jsonify, send_file, current_app
+from flask import Blueprint, request, jsonify, send_file, current_app, Response, stream_with_context
 from werkzeug.utils import secure_filename
 import mimetypes
 import traceback
+import itertools
+import json
 import os
-import uuid
 import threading
 import time
+import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
-# Import only what's directly used in this file for clarity and to avoid circular dependencies
-from app.ocr_engine import process_document, extract_text_dynamic, save_to_pdf, save_to_docx
-from app.utils import detect_language, normalize_lang, correct_spelling, grammar_correction # Re-importing these if needed for specific routes like reprocess_text or direct detection
+# Import only what's directly used in this file for clarity and to avoid circular dependencies.
+# The OCR/translation modules (ocr_engine, utils, translator) are imported inside the routes
+# that need them, so lightweight endpoints don't pay for cv2, torch and friends.
 from app.models import db, User, RecentDocument, DocumentHistory
-from app.translator import translate_text # Kept for reprocess_text translate_text
+from app.job_queue import get_job_queue, QueueFullError
+from app.job_store import get_job_store, FINISHED_STATUSES
+from app.ocr_cache import get_ocr_cache
+from app.translation_memory import get_translation_memory
+from app.preload import readiness
+from app.model_registry import get_model_registry
+from app import metrics
 from config import Config
 
 bp = Blueprint('main', __name__)
@@ -27,8 +36,13 @@ os.makedirs(RESULT_FOLDER, exist_ok=True)
 LANGUAGE_MAP = Config.SUPPORTED_LANGUAGES
 REVERSE_LANGUAGE_MAP = {v.lower(): k for k, v in LANGUAGE_MAP.items()}
 
-ocr_jobs = {}  # job_id: {"status": ..., "cancel": ..., "result": ...}
-ocr_lock = threading.Lock()
+EXPORT_RETRY_AFTER = 10  # Seconds a client is asked to wait before re-requesting an export still rendering
+
+# Gauges read live state at scrape time
+metrics.QUEUE_DEPTH.set_function(lambda: get_job_queue().stats()['queue_depth'])
+metrics.ACTIVE_JOBS.set_function(lambda: get_job_queue().stats()['active_jobs'])
+metrics.LOADED_MODELS.set_function(lambda: len(get_model_registry().stats()['models']))
+metrics.LOADED_MODEL_BYTES.set_function(lambda: get_model_registry().stats()['used_mb'] * 2 ** 20)
 
 
 @bp.route('/upload', methods=['POST'])
@@ -38,6 +52,7 @@ def upload_file():
     target_lang = request.form.get('target_lang')
     user_email = request.form.get('email')
     enhance_flag = request.form.get('enhance', 'false').lower() == 'true'
+    translate_pages = request.form.get('translate_pages', 'false').lower() == 'true'
 
     if not file or not user_email:
         return jsonify({'error': 'Missing file or user email'}), 400
@@ -47,26 +62,43 @@ def upload_file():
     file.save(upload_path)
 
     job_id = str(uuid.uuid4())
-    with ocr_lock:
-        ocr_jobs[job_id] = {"status": "queued", "cancel": False}
+    job_store = get_job_store()
+    job_store.create(job_id, status="queued", upload_path=upload_path)
 
     # Capture the actual app and its context for the background thread
     app = current_app._get_current_object()
 
+    progress_seq = itertools.count(1)
+
+    def report_progress(stage, **info):
+        # Latest stage wins; `seq` lets stream clients tell a new event from a repeated one
+        job_store.update(job_id, progress={"stage": stage, "seq": next(progress_seq), **info})
+
+    pages_ready = itertools.count(1)
+    pages_lock = threading.Lock()
+
+    def report_page(page_result):
+        # Partial results become readable through /status?pages=... as soon as each page is OCR'd.
+        # With translate_pages they arrive from translation threads; the lock keeps pages_ready monotonic
+        with pages_lock:
+            job_store.add_page_result(job_id, page_result["page"], page_result)
+            job_store.update(job_id, pages_ready=next(pages_ready))
+
     def background_ocr(app_context):
+        from app.ocr_engine import process_document
         with app_context:
-            time.sleep(0.5) # Small delay before starting processing
-            with ocr_lock:
-                if ocr_jobs[job_id]["cancel"]:
-                    ocr_jobs[job_id]["status"] = "cancelled"
-                    print(f"[INFO] OCR job {job_id} cancelled before processing.")
-                    return
-                ocr_jobs[job_id]["status"] = "processing"
-                print(f"[INFO] OCR job {job_id} started processing for file: {filename}")
+            # Only start if the job is still queued; a cancelled job stays cancelled
+            if job_store.transition(job_id, ("queued",), status="processing") is None:
+                print(f"[INFO] OCR job {job_id} cancelled before processing.")
+                if os.path.exists(upload_path):
+                    os.unlink(upload_path)
+                return
+            print(f"[INFO] OCR job {job_id} started processing for file: {filename}")
 
             try:
                 # Pass source_lang to process_document
-                result = process_document(upload_path, source_lang, target_lang, enhance_flag)
+                result = process_document(upload_path, source_lang, target_lang, enhance_flag, progress=report_progress,
+                                          on_page=report_page, translate_pages=translate_pages)
 
                 if "error" in result:
                     raise Exception(result["error"])
@@ -96,16 +128,18 @@ def upload_file():
                 else:
                     print(f"[WARN] User with email {user_email} not found. Skipping DB log for document history.")
 
-                with ocr_lock:
-                    ocr_jobs[job_id]["status"] = "done"
-                    ocr_jobs[job_id]["result"] = result
+                # Store the result before flipping the status so pollers never see 'done' without it
+                job_store.set_result(job_id, result)
+                if job_store.transition(job_id, ("processing",), status="done") is not None:
+                    metrics.JOBS.inc(status="done")
                 print(f"[INFO] OCR job {job_id} completed successfully.")
 
             except Exception as e:
                 traceback.print_exc()
-                with ocr_lock:
-                    ocr_jobs[job_id]["status"] = "error"
-                    ocr_jobs[job_id]["result"] = {"error": str(e), "traceback": traceback.format_exc()}
+                job_store.set_result(job_id, {"error": str(e), "traceback": traceback.format_exc()})
+                if job_store.transition(job_id, ("processing",), status="error") is not None:
+                    metrics.JOBS.inc(status="error")
+                metrics.ERRORS.inc(stage="job")
                 print(f"[ERROR] OCR job {job_id} failed: {e}")
             finally:
                 # Clean up uploaded file after processing
@@ -114,38 +148,160 @@ def upload_file():
                     print(f"[INFO] Cleaned up uploaded file: {upload_path}")
 
 
-    # Start background thread with app context
-    threading.Thread(target=background_ocr, args=(app.app_context(),), daemon=True).start()
+    # Hand the job to the bounded worker pool; reject with 429 when the queue is full
+    try:
+        position = get_job_queue().submit(job_id, lambda: background_ocr(app.app_context()))
+    except QueueFullError as e:
+        metrics.JOBS.inc(status="rejected")
+        job_store.delete(job_id)
+        if os.path.exists(upload_path):
+            os.unlink(upload_path)
+        print(f"[WARN] OCR queue full, rejecting upload of {filename}.")
+        response = jsonify({'error': 'Server is busy processing other documents. Please retry later.',
+                            'retry_after': e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+
+    metrics.JOBS.inc(status="submitted")
+    return jsonify({"job_id": job_id, "queue_position": position})
+
 
-    return jsonify({"job_id": job_id})
+def _parse_page_range(value):
+    """Parses a `pages` query value such as "3", "1-10" or "5-" into (first, last); last may be None."""
+    first, sep, last = value.partition('-')
+    first = int(first) if first.strip() else 1
+    last = (int(last) if last.strip() else None) if sep else first
+    if first < 1 or (last is not None and last < first):
+        raise ValueError(f"invalid page range: {value}")
+    return first, last
 
 
 @bp.route('/status/<job_id>', methods=['GET'])
 def get_job_status(job_id):
-    with ocr_lock:
-        job = ocr_jobs.get(job_id)
-        if not job:
-            return jsonify({'error': 'Invalid job ID'}), 404
-        return jsonify({
-            'status': job['status'],
-            'result': job.get('result', {}) if job['status'] == 'done' or job['status'] == 'error' else {}
-        })
+    job_store = get_job_store()
+    job = job_store.get(job_id)
+    if not job:
+        return jsonify({'error': 'Invalid job ID'}), 404
+
+    page_range = None
+    if request.args.get('pages'):
+        try:
+            page_range = _parse_page_range(request.args['pages'])
+        except ValueError:
+            return jsonify({'error': 'Invalid page range, expected e.g. pages=1-10'}), 400
+
+    status = job['status']
+    result = (job_store.get_result(job_id) or {}) if status == 'done' or status == 'error' else {}
+
+    response = {'status': status, 'result': result, 'progress': job.get('progress'),
+                'pages_ready': job.get('pages_ready', 0)}
+    if page_range:
+        response['pages'] = job_store.get_page_results(job_id, *page_range)
+    if status == 'queued':
+        # Only known to the worker process that accepted the upload
+        response['queue_position'] = get_job_queue().position(job_id)
+    return jsonify(response)
+
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@bp.route('/status/<job_id>/stream', methods=['GET'])
+def stream_job_status(job_id):
+    """
+    Server-Sent Events stream of a job's progress. Pushes a `progress` event whenever the
+    status, stage or queue position changes and a final `done`/`failed`/`cancelled` event
+    (carrying the result) before closing, so clients no longer need to poll /status.
+    """
+    job_store = get_job_store()
+    if not job_store.get(job_id):
+        return jsonify({'error': 'Invalid job ID'}), 404
+
+    def generate():
+        last_state = None
+        last_sent = time.monotonic()
+        deadline = last_sent + Config.SSE_MAX_DURATION
+        while time.monotonic() < deadline:
+            job = job_store.get(job_id)
+            if job is None:
+                yield _sse_event('failed', {'status': 'error', 'result': {'error': 'Job expired'}})
+                return
+
+            status = job['status']
+            queue_position = get_job_queue().position(job_id) if status == 'queued' else None
+            state = (status, job.get('progress'), queue_position)
+            if status in FINISHED_STATUSES:
+                result = job_store.get_result(job_id) if status != 'cancelled' else None
+                # 'error' is reserved by EventSource for connection errors, so failures are sent as 'failed'
+                yield _sse_event('failed' if status == 'error' else status, {'status': status, 'result': result or {}})
+                return
+            if state != last_state:
+                last_state = state
+                last_sent = time.monotonic()
+                yield _sse_event('progress', {'status': status, 'progress': job.get('progress'),
+                                              'queue_position': queue_position})
+            elif time.monotonic() - last_sent >= Config.SSE_HEARTBEAT_SECONDS:
+                # Comment line keeps proxies from closing an idle connection
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+
+            # Queue position changes without a store update, so wake up periodically while queued
+            job_store.wait_for_update(job_id, job['updated_at'], timeout=1.0 if status == 'queued' else Config.SSE_HEARTBEAT_SECONDS)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@bp.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 503 until the eager model warmup (MODEL_PRELOAD=eager) has finished."""
+    state = readiness()
+    return jsonify(state), 200 if state['ready'] else 503
+
+
+@bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint (text exposition format)."""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@bp.route('/models/stats', methods=['GET'])
+def model_stats():
+    return jsonify(get_model_registry().stats())
+
+
+@bp.route('/queue/stats', methods=['GET'])
+def queue_stats():
+    return jsonify(get_job_queue().stats())
+
+
+@bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    ocr_cache = get_ocr_cache()
+    translation_memory = get_translation_memory()
+    return jsonify({
+        'ocr': ocr_cache.stats() if ocr_cache else None,
+        'translation': translation_memory.stats() if translation_memory else None
+    })
 
 
 @bp.route('/cancel/<job_id>', methods=['POST'])
 def cancel_job(job_id):
-    with ocr_lock:
-        job = ocr_jobs.get(job_id)
+    job_store = get_job_store()
+    job = job_store.transition(job_id, ("queued", "processing"), status="cancelled", cancel=True)
+    if job is None:
+        job = job_store.get(job_id)
         if not job:
             return jsonify({'error': 'Invalid job ID'}), 404
-        
-        if job["status"] == "processing" or job["status"] == "queued":
-            job["cancel"] = True
-            job["status"] = "cancelled"
-            print(f"[INFO] OCR job {job_id} cancellation requested.")
-            return jsonify({'message': 'OCR job cancellation requested.'})
-        else:
-            return jsonify({'message': f'Cannot cancel job in {job["status"]} status.'}), 400
+        return jsonify({'message': f'Cannot cancel job in {job["status"]} status.'}), 400
+    metrics.JOBS.inc(status="cancelled")
+
+    # Drop it from the queue if no worker has picked it up yet
+    if get_job_queue().cancel(job_id) and job.get("upload_path") and os.path.exists(job["upload_path"]):
+        os.unlink(job["upload_path"])
+    print(f"[INFO] OCR job {job_id} cancellation requested.")
+    return jsonify({'message': 'OCR job cancellation requested.'})
 
 
 @bp.route('/save-edited-text', methods=['POST'])
@@ -158,6 +314,8 @@ def save_edited_text():
     if not edited_text:
         return jsonify({'error': 'No text provided'}), 400
 
+    from app.ocr_engine import save_to_pdf, save_to_docx
+
     file_id = str(uuid.uuid4())
     result_path = os.path.join(RESULT_FOLDER, f"edited_{file_id}.{format_type}")
     
@@ -222,6 +380,22 @@ def download_file(filename):
         print(f"[SECURITY WARNING] Attempted directory traversal: {filename}")
         return jsonify({'error': 'Access denied.'}), 403 # Forbidden
 
+    if not os.path.isfile(requested_absolute_path) and os.path.dirname(requested_absolute_path) == result_folder_path:
+        # Job exports are rendered the first time they are downloaded
+        from app.exports import get_export_store
+        try:
+            get_export_store().ensure(filename)
+        except FutureTimeoutError:
+            # The render keeps running in the background; a retry picks up the same render or the finished file
+            print(f"[WARN] Export {filename} is still rendering after {Config.EXPORT_RENDER_TIMEOUT}s.")
+            response = jsonify({'error': f'{filename} is still being generated. Please retry later.',
+                                'retry_after': EXPORT_RETRY_AFTER})
+            response.headers['Retry-After'] = str(EXPORT_RETRY_AFTER)
+            return response, 503
+        except Exception as e:
+            traceback.print_exc()
+            return jsonify({'error': f'Failed to generate {filename}: {str(e)}'}), 500
+
     if os.path.exists(requested_absolute_path) and os.path.isfile(requested_absolute_path):
         # Determine the MIME type based on the file extension
         mimetype, _ = mimetypes.guess_type(requested_absolute_path)
@@ -257,6 +431,9 @@ def detect_language_route():
     file.save(upload_path)
 
     try:
+        from app.ocr_engine import extract_text_dynamic
+        from app.utils import detect_language
+
         # Use extract_text_dynamic to get text from various file types.
         # Pass a default 'en' as source_lang, it won't affect detection.
         text, _, _ = extract_text_dynamic(upload_path, source_lang='en') 
@@ -291,6 +468,9 @@ def reprocess_text():
     if not text:
         return jsonify({'error': 'No text provided'}), 400
 
+    from app.utils import detect_language, normalize_lang, correct_spelling, grammar_correction
+    from app.translator import translate_text
+
     # Normalize target_lang for consistency with LANGUAGE_MAP keys
     target_lang_code = normalize_lang(target_lang) or 'en'
     # Normalize source_lang for consistency if provided
@@ -0,0 +1,96 @@
+import cv2
+import numpy as np
+
+from config import Config
+
+
+def _downscale_mask(foreground, work_width):
+    if foreground.dtype == bool:
+        foreground = foreground.astype(np.uint8) * 255
+    h, w = foreground.shape[:2]
+    if w > work_width:
+        # INTER_AREA averages, so a cell a quarter covered by a thin stroke still counts as ink
+        foreground = cv2.resize(foreground, (work_width, max(1, round(h * work_width / w))), interpolation=cv2.INTER_AREA)
+    return foreground > 63
+
+
+def _profile_scores(ys, xs, angles):
+    """
+    Projection-profile score for each candidate angle: foreground pixels are projected onto
+    the vertical axis of a page rotated by that angle, and the sum of squared row counts is
+    largest when text lines line up with rows.
+    """
+    scores = np.empty(len(angles))
+    for i, angle in enumerate(np.deg2rad(angles)):
+        rows = np.round(ys * np.cos(angle) - xs * np.sin(angle)).astype(np.int64)
+        counts = np.bincount(rows - rows.min())
+        scores[i] = np.dot(counts, counts)
+    return scores
+
+
+def estimate_skew(foreground, max_angle=None, work_width=None, coarse_step=0.5, fine_step=0.05):
+    """
+    Estimates page skew from a foreground (text) mask.
+
+    The mask is downscaled to `work_width` pixels wide, then a coarse projection-profile
+    search over [-max_angle, max_angle] is refined around the best coarse angle.
+
+    Args:
+        foreground (np.ndarray): Single-channel uint8 image with text pixels at 255 and
+            background at 0 (a boolean mask also works, at the cost of a full-size copy).
+
+    Returns:
+        tuple[float, float]: (angle, confidence). `angle` is in degrees, in the convention of
+        cv2.getRotationMatrix2D (rotating by it straightens the page). `confidence` in [0, 1]
+        is how much the best angle stands out from the typical one; blank pages, photos and
+        pages without text lines score near 0.
+    """
+    max_angle = Config.DESKEW_MAX_ANGLE if max_angle is None else max_angle
+    work_width = work_width or Config.DESKEW_WORK_WIDTH
+
+    small = _downscale_mask(foreground, work_width)
+    ys, xs = np.nonzero(small)
+    # Too little ink to hold text lines, or a near-solid page: nothing to measure
+    if len(ys) < 50 or len(ys) > 0.9 * small.size:
+        return 0.0, 0.0
+    ys = ys.astype(np.float64)
+    xs = xs.astype(np.float64)
+
+    coarse = np.arange(-max_angle, max_angle + coarse_step / 2, coarse_step)
+    coarse_scores = _profile_scores(ys, xs, coarse)
+    best = coarse[int(np.argmax(coarse_scores))]
+
+    fine = np.arange(best - coarse_step, best + coarse_step + fine_step / 2, fine_step)
+    fine_scores = _profile_scores(ys, xs, fine)
+    best_index = int(np.argmax(fine_scores))
+    angle = round(float(fine[best_index]), 2) + 0.0  # + 0.0 turns -0.0 into 0.0
+    best_score = fine_scores[best_index]
+
+    confidence = float((best_score - np.median(coarse_scores)) / best_score) if best_score > 0 else 0.0
+    return angle, max(0.0, min(1.0, confidence))
+
+
+def deskew(image, foreground, label="<in-memory image>", min_angle=None, min_confidence=None):
+    """
+    Estimates skew from `foreground` and rotates `image` once, at full resolution, to correct it.
+    Rotation is skipped when the angle is negligible or the estimate is not confident.
+
+    Returns:
+        tuple[np.ndarray, float]: The (possibly) rotated image and the angle applied (0.0 if skipped).
+    """
+    min_angle = Config.DESKEW_MIN_ANGLE if min_angle is None else min_angle
+    min_confidence = Config.DESKEW_MIN_CONFIDENCE if min_confidence is None else min_confidence
+
+    angle, confidence = estimate_skew(foreground)
+    if abs(angle) < min_angle:
+        print(f"[INFO] Skew of {label} is negligible ({angle:.2f} degrees), not rotating.")
+        return image, 0.0
+    if confidence < min_confidence:
+        print(f"[INFO] Skew estimate for {label} not confident ({angle:.2f} degrees, confidence {confidence:.2f}), not rotating.")
+        return image, 0.0
+
+    h, w = image.shape[:2]
+    M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
+    rotated = cv2.warpAffine(image, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+    print(f"[INFO] Deskewed image {label} by {angle:.2f} degrees (confidence {confidence:.2f}).")
+    return rotated, angle
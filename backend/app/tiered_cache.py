@@ -0,0 +1,142 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TieredCache:
+    """
+    String key/value cache with an in-process LRU in front of a SQLite table.
+
+    The SQLite file runs in WAL mode so every worker process can share it. Both tiers are
+    bounded by payload size in bytes and evict least recently used entries; the disk tier
+    is trimmed to 90% of its budget at most once per `sweep_interval` seconds.
+    """
+
+    def __init__(self, path, table, memory_bytes, disk_bytes, sweep_interval=60):
+        self.path = path
+        self.table = table
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.sweep_interval = sweep_interval
+
+        self._memory = OrderedDict()  # key -> (payload, size)
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0,
+                       "memory_evictions": 0, "disk_evictions": 0}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_access ON {table} (last_access)")
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared across threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """Returns the cached payload string for `key`, or None on a miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return entry[0]
+
+        try:
+            row = self._conn().execute(f"SELECT payload FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn().execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            print(f"[WARN] Cache lookup in {self.table} failed: {e}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._remember(key, row[0])
+        return row[0]
+
+    def put(self, key, payload):
+        with self._lock:
+            self._remember(key, payload)
+            self._stats["stores"] += 1
+
+        now = time.time()
+        try:
+            self._conn().execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, payload, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), now),
+            )
+            if now - self._last_sweep >= self.sweep_interval:
+                self._last_sweep = now
+                self._evict_disk()
+        except sqlite3.Error as e:
+            print(f"[WARN] Cache write to {self.table} failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_used
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        try:
+            count, size = self._conn().execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+            stats["disk_entries"], stats["disk_bytes"] = count, size
+        except sqlite3.Error:
+            pass
+        return stats
+
+    def _remember(self, key, payload):
+        # Caller holds self._lock
+        size = len(payload)
+        if size > self.memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_used -= previous[1]
+        self._memory[key] = (payload, size)
+        self._memory_used += size
+        while self._memory_used > self.memory_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_used -= evicted_size
+            self._stats["memory_evictions"] += 1
+
+    def _evict_disk(self):
+        conn = self._conn()
+        total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.disk_bytes:
+            return
+        # Trim to 90% of the budget so eviction does not run on every insert
+        excess = total - int(self.disk_bytes * 0.9)
+        freed = 0
+        victims = []
+        for key, size in conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_access ASC"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", victims)
+        with self._lock:
+            self._stats["disk_evictions"] += len(victims)
+        print(f"[INFO] Cache {self.table} evicted {len(victims)} entries ({freed} bytes) from disk.")
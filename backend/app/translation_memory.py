@@ -0,0 +1,50 @@
+import hashlib
+import re
+import threading
+import unicodedata
+
+from app.tiered_cache import TieredCache
+from config import Config
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_sentence(sentence):
+    """NFC-normalizes and collapses whitespace so trivially different copies share an entry."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", sentence)).strip()
+
+
+class TranslationMemory(TieredCache):
+    """
+    Sentence-level translation cache keyed on (normalized sentence, source tag, target tag,
+    model id). Boilerplate that repeats across uploads (headers, disclaimers, field labels)
+    is translated once and then served from memory or disk.
+    """
+
+    def __init__(self, path, memory_bytes, disk_bytes, sweep_interval=60):
+        super().__init__(path, "translations", memory_bytes, disk_bytes, sweep_interval)
+
+    @staticmethod
+    def make_key(sentence, src_tag, tgt_tag, model_id):
+        digest = hashlib.blake2b(normalize_sentence(sentence).encode("utf-8"), digest_size=20).hexdigest()
+        return f"{model_id}:{src_tag}:{tgt_tag}:{digest}"
+
+
+_translation_memory = None
+_translation_memory_lock = threading.Lock()
+
+
+def get_translation_memory():
+    """Returns the process-wide translation memory, or None when TRANSLATION_MEMORY_ENABLED is off."""
+    global _translation_memory
+    if not Config.TRANSLATION_MEMORY_ENABLED:
+        return None
+    if _translation_memory is None:
+        with _translation_memory_lock:
+            if _translation_memory is None:
+                _translation_memory = TranslationMemory(
+                    Config.TRANSLATION_MEMORY_PATH,
+                    memory_bytes=Config.TRANSLATION_MEMORY_MEMORY_MB * 1024 * 1024,
+                    disk_bytes=Config.TRANSLATION_MEMORY_DISK_MB * 1024 * 1024,
+                )
+    return _translation_memory
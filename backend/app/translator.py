@@ -1,23 +1,38 @@
-import torch
+import re
+import threading
 import traceback
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-from IndicTransToolkit import IndicProcessor
 # Import normalize_lang from utils to ensure consistency
 from .utils import REVERSE_LANGUAGE_MAP, normalize_lang 
+from .translation_memory import get_translation_memory, normalize_sentence
+from .preload import timed
+from .model_registry import get_model_registry
+from .quantization import maybe_quantize
+from . import metrics
+from config import Config
 
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"[INFO] Translator using device: {DEVICE}")
+# torch, transformers and IndicTransToolkit are imported on first use so importing this
+# module stays cheap; see get_device, get_indic_processor and _load_model_and_tokenizer.
+_device = None
+
+def get_device():
+    global _device
+    if _device is None:
+        with timed("module", "torch"):
+            import torch
+        _device = "cuda" if torch.cuda.is_available() else "cpu"
+        print(f"[INFO] Translator using device: {_device}")
+    return _device
 
 # Model identifiers for IndicTrans2
 EN_TO_INDIC_MODEL_NAME = "ai4bharat/indictrans2-en-indic-1B"
 INDIC_TO_EN_MODEL_NAME = "ai4bharat/indictrans2-indic-en-1B"
 INDIC_TO_INDIC_MODEL_NAME = "ai4bharat/indictrans2-indic-indic-1B"
 
-# Dictionaries to cache loaded models and tokenizers for lazy loading
-_models = {
-    "en-indic": {"tokenizer": None, "model": None},
-    "indic-en": {"tokenizer": None, "model": None},
-    "indic-indic": {"tokenizer": None, "model": None},
+# Loaded models and tokenizers are cached in the model registry under "translation:<model type>"
+MODEL_NAMES = {
+    "en-indic": EN_TO_INDIC_MODEL_NAME,
+    "indic-en": INDIC_TO_EN_MODEL_NAME,
+    "indic-indic": INDIC_TO_INDIC_MODEL_NAME,
 }
 
 # Language tags used by IndicTrans2 (ISO 639-1 to IndicTrans specific tags)
@@ -31,50 +46,169 @@ LANG_TAGS = {
     # Add other languages if your IndicTrans2 model supports them and your application needs them
 }
 
-# Initialize IndicProcessor once
-try:
-    ip = IndicProcessor(inference=True)
-except Exception as e:
-    print(f"[ERROR] Failed to initialize IndicProcessor: {e}")
-    traceback.print_exc()
-    ip = None # Set to None to handle cases where it fails
+# IndicProcessor is created once, on first use
+_ip = None
+_ip_lock = threading.Lock()
+
+def get_indic_processor():
+    """Returns the shared IndicProcessor, or None if it failed to initialize."""
+    global _ip
+    if _ip is None:
+        with _ip_lock:
+            if _ip is None:
+                try:
+                    with timed("module", "IndicTransToolkit"):
+                        from IndicTransToolkit import IndicProcessor
+                    _ip = IndicProcessor(inference=True)
+                except Exception as e:
+                    print(f"[ERROR] Failed to initialize IndicProcessor: {e}")
+                    traceback.print_exc()
+                    return None # Retried on the next call
+    return _ip
 
 # --- Lazy Loading Functions for Models ---
+def _load_translation_model(model_type, quantize=None):
+    """
+    Loads an uncached IndicTrans2 (model, tokenizer) pair; int8-quantized when `quantize` is
+    True, or when it is None and QUANTIZE_MODELS lists the model.
+    """
+    model_name = MODEL_NAMES.get(model_type)
+    if model_name is None:
+        raise ValueError(f"Unknown model type: {model_type}")
+
+    print(f"[INFO] Loading {model_type} model...")
+    device = get_device()
+    with timed("module", "transformers"):
+        from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+    with timed("model", model_name):
+        tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name, trust_remote_code=True).to(device)
+    model.eval()
+    model = maybe_quantize(f"translation:{model_type}", model, device, quantize=quantize)
+    print(f"[INFO] {model_type} model loaded successfully.")
+    return model, tokenizer
+
 def _load_model_and_tokenizer(model_type):
     """
     Loads and caches the specified IndicTrans2 model and its tokenizer.
     model_type can be "en-indic", "indic-en", or "indic-indic".
+    Returns (None, None) if the model could not be loaded.
+    """
+    model_name = MODEL_NAMES.get(model_type)
+    if model_name is None:
+        raise ValueError(f"Unknown model type: {model_type}")
+
+    try:
+        return get_model_registry().get(f"translation:{model_type}", lambda: _load_translation_model(model_type))
+    except Exception as e:
+        print(f"[CRITICAL ERROR] Failed to load {model_type} model from {model_name}: {e}")
+        print("Please ensure you have an active internet connection and the model identifiers are correct.")
+        traceback.print_exc()
+        # Nothing is cached on failure, so the next call tries again
+        return None, None
+
+
+# ------------------ Sentence Splitting ------------------
+# Danda (।) and double danda (॥) end sentences in Devanagari and are often not followed by a
+# space; Latin terminators only count when followed by whitespace (keeps decimals like 3.14 intact).
+_SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[।॥])\s*|(?<=[.!?])\s+')
+# Section markers inserted by ocr_engine; kept verbatim rather than translated
+_MARKER_RE = re.compile(r'^\[(Page|Image) \d+\]$')
+
+def split_into_sentences(text, max_words=None):
     """
-    if _models[model_type]["model"] is None:
-        try:
-            print(f"[INFO] Loading {model_type} model...")
-            if model_type == "en-indic":
-                model_name = EN_TO_INDIC_MODEL_NAME
-            elif model_type == "indic-en":
-                model_name = INDIC_TO_EN_MODEL_NAME
-            elif model_type == "indic-indic":
-                model_name = INDIC_TO_INDIC_MODEL_NAME
-            else:
-                raise ValueError(f"Unknown model type: {model_type}")
-
-            tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
-            model = AutoModelForSeq2SeqLM.from_pretrained(model_name, trust_remote_code=True).to(DEVICE)
-            
-            _models[model_type]["tokenizer"] = tokenizer
-            _models[model_type]["model"] = model
-            print(f"[INFO] {model_type} model loaded successfully.")
-        except Exception as e:
-            print(f"[CRITICAL ERROR] Failed to load {model_type} model from {model_name}: {e}")
-            print("Please ensure you have an active internet connection and the model identifiers are correct.")
-            traceback.print_exc()
-            # Set to None to indicate failure, so subsequent calls won't attempt to use a failed model
-            _models[model_type]["tokenizer"] = None
-            _models[model_type]["model"] = None
-    return _models[model_type]["model"], _models[model_type]["tokenizer"]
+    Splits text into lines (on newlines) and each line into sentences using script-aware
+    boundaries. Sentences longer than `max_words` words are cut into word chunks so no
+    single input exceeds the model's length limit.
+
+    Returns:
+        list[list[str]]: One list of sentences per line; blank lines give an empty list.
+    """
+    max_words = max_words or Config.TRANSLATION_MAX_SENTENCE_WORDS
+    lines = []
+    for line in text.split("\n"):
+        sentences = []
+        for sentence in _SENTENCE_BOUNDARY_RE.split(line.strip()):
+            words = sentence.split()
+            for start in range(0, len(words), max_words):
+                sentences.append(" ".join(words[start:start + max_words]))
+        lines.append(sentences)
+    return lines
+
+def _needs_translation(sentence):
+    # Skip page markers and segments with no letters at all (numbers, punctuation, dates)
+    return not _MARKER_RE.match(sentence) and any(ch.isalpha() for ch in sentence)
+
+def _translate_sentences(sentences, model, tokenizer, src_tag, tgt_tag, batch_size=None, num_beams=None):
+    """
+    Translates a list of sentences in length-sorted batches and returns the translations in
+    input order. Sorting keeps sentences of similar length together, so little padding is
+    wasted and short sentences don't wait on long beams.
+
+    Sentences already in the translation memory are not sent to the model, and duplicates
+    within the same call are translated only once.
+    """
+    import torch
+    ip = get_indic_processor()
+    batch_size = max(1, batch_size or Config.TRANSLATION_BATCH_SIZE)
+    num_beams = num_beams or Config.TRANSLATION_NUM_BEAMS
+    memory = get_translation_memory()
+    model_id = f"{getattr(model, 'name_or_path', type(model).__name__)}@beams{num_beams}"
+    if getattr(model, 'quantized_int8', False):
+        model_id += "@int8"
+
+    translations = [None] * len(sentences)
+    # Normalized sentence -> indices of every occurrence still needing a translation
+    pending = {}
+    for i, sentence in enumerate(sentences):
+        if memory:
+            cached = memory.get(memory.make_key(sentence, src_tag, tgt_tag, model_id))
+            if cached is not None:
+                translations[i] = cached
+                continue
+        pending.setdefault(normalize_sentence(sentence), []).append(i)
+
+    if pending:
+        print(f"[INFO] Translating {len(pending)} unique sentences ({len(sentences) - sum(map(len, pending.values()))} served from translation memory).")
+    unique = list(pending)
+    order = sorted(range(len(unique)), key=lambda i: len(unique[i]), reverse=True)
+
+    for start in range(0, len(order), batch_size):
+        batch_indices = order[start:start + batch_size]
+
+        # Preprocess using IndicProcessor
+        batch = ip.preprocess_batch([unique[i] for i in batch_indices], src_lang=src_tag, tgt_lang=tgt_tag)
+
+        # Tokenize input
+        inputs = tokenizer(batch, return_tensors="pt", padding=True, truncation=True,
+                           max_length=Config.TRANSLATION_MAX_LENGTH).to(get_device())
+
+        # Generate translation
+        with torch.no_grad():
+            generated_tokens = model.generate(
+                **inputs,
+                use_cache=True,
+                max_length=Config.TRANSLATION_MAX_LENGTH,
+                num_beams=num_beams,    # Number of beams for beam search, higher means better quality but slower
+                num_return_sequences=1,
+            )
+
+        # Decode and post-process
+        outputs = tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+        final = ip.postprocess_batch(outputs, lang=tgt_tag)
+        for i, translated in zip(batch_indices, final):
+            translated = translated.strip()
+            if memory:
+                memory.put(memory.make_key(unique[i], src_tag, tgt_tag, model_id), translated)
+            for sentence_index in pending[unique[i]]:
+                translations[sentence_index] = translated
+
+    return translations
 
 
 # ------------------ Translate Text ------------------
-def translate_text(text, src_lang_code, tgt_lang_code):
+@metrics.timed_stage("translate", engine="indictrans2", lang_param="src_lang_code")
+def translate_text(text, src_lang_code, tgt_lang_code, batch_size=None, num_beams=None):
     try:
         # Normalize language codes using the utility function from utils.py
         src_lang_code = normalize_lang(src_lang_code)
@@ -107,35 +241,27 @@ def translate_text(text, src_lang_code, tgt_lang_code):
         if model_to_use is None or tokenizer_to_use is None:
             raise RuntimeError(f"Translation model for '{src_lang_code}' to '{tgt_lang_code}' could not be loaded.")
 
-        if ip is None:
+        if get_indic_processor() is None:
             raise RuntimeError("IndicProcessor failed to initialize. Cannot perform translation.")
 
         print(f"[INFO] Translating from {src_lang_code} ({src_tag}) to {tgt_lang_code} ({tgt_tag})...")
 
-        # Preprocess using IndicProcessor
-        # Ensure batch is a list, even for a single text
-        batch = ip.preprocess_batch([text], src_lang=src_tag, tgt_lang=tgt_tag)
-
-        # Tokenize input
-        inputs = tokenizer_to_use(batch, return_tensors="pt", padding=True, truncation=True, max_length=2048).to(DEVICE)
-
-        # Generate translation
-        with torch.no_grad():
-            generated_tokens = model_to_use.generate(
-                **inputs,
-                use_cache=True,
-                max_length=2048, # Adjust max_length based on expected output length
-                num_beams=5,    # Number of beams for beam search, higher means better quality but slower
-                num_return_sequences=1,
-            )
-
-        # Decode and post-process
-        outputs = tokenizer_to_use.batch_decode(generated_tokens, skip_special_tokens=True)
-        final = ip.postprocess_batch(outputs, lang=tgt_tag)
+        # Translate sentence by sentence so nothing is truncated, then rebuild the line structure
+        lines = split_into_sentences(text)
+        sentences = [sentence for line in lines for sentence in line if _needs_translation(sentence)]
+        translations = _translate_sentences(sentences, model_to_use, tokenizer_to_use, src_tag, tgt_tag,
+                                            batch_size=batch_size, num_beams=num_beams)
 
-        return final[0].strip()
+        translated_iter = iter(translations)
+        output_lines = []
+        for line in lines:
+            output_lines.append(" ".join(
+                next(translated_iter) if _needs_translation(sentence) else sentence for sentence in line
+            ))
+        return "\n".join(output_lines).strip()
 
     except Exception as e:
         print(f"[ERROR] Translation failed: {src_lang_code} → {tgt_lang_code}: {e}")
+        metrics.ERRORS.inc(stage="translate")
         traceback.print_exc() # Print full traceback for debugging
         return text # Return original text on failure
\ No newline at end of file
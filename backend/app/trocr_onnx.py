@@ -0,0 +1,423 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import traceback
+
+import numpy as np
+
+from app.preload import timed
+from config import Config
+
+# Bump when the export wrappers or file layout change so stale exports are rebuilt
+ONNX_EXPORT_VERSION = "2"
+ONNX_OPSET = 17
+
+_export_lock = threading.Lock()
+
+# Intra-op threads for sessions created in this process. PDF worker processes set it to their
+# share of the cores (see _init_pdf_worker); None means all cores (the app process)
+_process_threads = None
+
+# Lines rendered for the export-time parity check against model.generate()
+PARITY_LINES = (
+    "The quick brown fox jumps over the lazy dog",
+    "Invoice total amount received",
+    "Please call back tomorrow morning",
+    "Meeting notes 12 March",
+    "customer address",
+    "Payment due within thirty days",
+)
+
+
+def set_process_threads(num_threads):
+    """Caps the intra-op threads of ONNX sessions created later in this process."""
+    global _process_threads
+    _process_threads = max(1, int(num_threads)) if num_threads else None
+
+
+def session_threads(num_threads=None):
+    """
+    Intra-op threads for a new session: `num_threads` if given, else TROCR_ONNX_THREADS capped
+    to this process's share of the cores, else that share (all cores outside PDF workers).
+    """
+    if num_threads:
+        return num_threads
+    share = _process_threads or os.cpu_count() or 1
+    return min(Config.TROCR_ONNX_THREADS, share) if Config.TROCR_ONNX_THREADS > 0 else share
+
+
+# ------------------ Export ------------------
+
+def _flatten_past(past_key_values):
+    # Newer transformers return a Cache object; the ONNX graphs use the flat legacy layout
+    if hasattr(past_key_values, "to_legacy_cache"):
+        past_key_values = past_key_values.to_legacy_cache()
+    return [tensor for layer in past_key_values for tensor in layer]
+
+
+def _past_names(prefix, num_layers, per_layer):
+    kinds = ("self_key", "self_value", "cross_key", "cross_value")[:per_layer]
+    return [f"{prefix}.{layer}.{kind}" for layer in range(num_layers) for kind in kinds]
+
+
+def _export(model_name, export_dir):
+    """Exports the encoder, the first-step decoder and the decoder-with-past of `model_name` to `export_dir`."""
+    import torch
+    from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+    from PIL import Image
+
+    processor = TrOCRProcessor.from_pretrained(model_name)
+    model = VisionEncoderDecoderModel.from_pretrained(model_name).eval()
+    generation_config = model.generation_config
+
+    class Encoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.encoder = model.encoder
+            self.proj = getattr(model, "enc_to_dec_proj", None)
+
+        def forward(self, pixel_values):
+            hidden = self.encoder(pixel_values=pixel_values).last_hidden_state
+            # Projects encoder features to the decoder width when the two differ
+            return self.proj(hidden) if self.proj is not None else hidden
+
+    class Decoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.decoder = model.decoder
+
+        def forward(self, input_ids, encoder_hidden_states):
+            out = self.decoder(input_ids=input_ids, encoder_hidden_states=encoder_hidden_states,
+                               use_cache=True, return_dict=True)
+            return (out.logits, *_flatten_past(out.past_key_values))
+
+    encoder, decoder = Encoder().eval(), Decoder().eval()
+    dummy = Image.new("RGB", (256, 64), "white")
+    pixel_values = processor(images=[dummy, dummy], return_tensors="pt").pixel_values
+    start_token = generation_config.decoder_start_token_id or model.config.decoder_start_token_id
+    input_ids = torch.full((2, 2), start_token, dtype=torch.long)
+
+    with torch.no_grad():
+        hidden = encoder(pixel_values)
+        first = decoder(input_ids, hidden)
+    past = list(first[1:])
+    per_layer = len(past) // model.decoder.config.decoder_layers
+    num_layers = len(past) // per_layer
+
+    class DecoderWithPast(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.decoder = model.decoder
+
+        def forward(self, input_ids, encoder_hidden_states, *flat_past):
+            past_key_values = tuple(tuple(flat_past[i:i + per_layer]) for i in range(0, len(flat_past), per_layer))
+            out = self.decoder(input_ids=input_ids, encoder_hidden_states=encoder_hidden_states,
+                               past_key_values=past_key_values, use_cache=True, return_dict=True)
+            return (out.logits, *_flatten_past(out.past_key_values))
+
+    present_names = _past_names("present", num_layers, per_layer)
+    past_names = _past_names("past", num_layers, per_layer)
+    batch = {0: "batch"}
+
+    torch.onnx.export(
+        encoder, (pixel_values,), os.path.join(export_dir, "encoder.onnx"),
+        input_names=["pixel_values"], output_names=["encoder_hidden_states"],
+        dynamic_axes={"pixel_values": batch, "encoder_hidden_states": batch}, opset_version=ONNX_OPSET,
+    )
+    torch.onnx.export(
+        decoder, (input_ids, hidden), os.path.join(export_dir, "decoder.onnx"),
+        input_names=["input_ids", "encoder_hidden_states"], output_names=["logits"] + present_names,
+        dynamic_axes={"input_ids": {0: "batch", 1: "seq"}, "encoder_hidden_states": batch,
+                      "logits": {0: "batch", 1: "seq"},
+                      **{name: {0: "batch", 2: "past_seq"} for name in present_names}},
+        opset_version=ONNX_OPSET,
+    )
+    torch.onnx.export(
+        DecoderWithPast().eval(), (input_ids[:, -1:], hidden, *past), os.path.join(export_dir, "decoder_with_past.onnx"),
+        input_names=["input_ids", "encoder_hidden_states"] + past_names, output_names=["logits"] + present_names,
+        dynamic_axes={"input_ids": batch, "encoder_hidden_states": batch, "logits": batch,
+                      **{name: {0: "batch", 2: "past_seq"} for name in past_names + present_names}},
+        opset_version=ONNX_OPSET,
+    )
+
+    processor.save_pretrained(export_dir)
+    meta = {
+        "model_name": model_name,
+        "export_version": ONNX_EXPORT_VERSION,
+        "past_names": past_names,
+        "decoder_start_token_id": start_token,
+        "eos_token_id": generation_config.eos_token_id or model.config.decoder.eos_token_id,
+        "pad_token_id": generation_config.pad_token_id or model.config.pad_token_id,
+        "length_penalty": generation_config.length_penalty,
+        "no_repeat_ngram_size": generation_config.no_repeat_ngram_size or 0,
+    }
+    with open(os.path.join(export_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # Recorded with the export; load_trocr_onnx refuses exports that don't match generate()
+    meta["parity"] = _check_parity(model, processor, export_dir)
+    with open(os.path.join(export_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def _parity_lines():
+    """Renders PARITY_LINES as single-line RGB images."""
+    from PIL import Image, ImageDraw, ImageFont
+    try:
+        from app.utils import LANG_FONT_MAP
+        font = ImageFont.truetype(LANG_FONT_MAP["en"], 32)
+    except Exception:
+        font = ImageFont.load_default()
+    lines = []
+    for text in PARITY_LINES:
+        img = Image.new("RGB", (int(font.getlength(text)) + 20, 48), "white")
+        ImageDraw.Draw(img).text((10, 6), text, font=font, fill="black")
+        lines.append(img)
+    return lines
+
+
+def _check_parity(model, processor, export_dir, num_beams=5, max_length=512):
+    """
+    Decodes PARITY_LINES in one batch with model.generate() and with the export in
+    `export_dir`, using the settings recognize_lines_trocr uses.
+
+    Returns:
+        dict: lines, identical and mismatches (a list of {"generate", "onnx"} texts).
+    """
+    import torch
+
+    lines = _parity_lines()
+    pixel_values = processor(images=lines, return_tensors="pt").pixel_values
+    with torch.no_grad():
+        generated = model.generate(pixel_values, max_length=max_length, num_beams=num_beams, early_stopping=True)
+    expected = processor.batch_decode(generated, skip_special_tokens=True)
+    actual = TrOCROnnx(export_dir).recognize(lines, num_beams=num_beams, max_length=max_length)
+
+    mismatches = [{"generate": e, "onnx": a} for e, a in zip(expected, actual) if e != a]
+    print(f"[INFO] TrOCR ONNX parity: {len(lines) - len(mismatches)}/{len(lines)} lines identical to generate().")
+    for mismatch in mismatches:
+        print(f"[WARN] generate(): {mismatch['generate']!r}  onnx: {mismatch['onnx']!r}")
+    return {"lines": len(lines), "identical": len(lines) - len(mismatches), "mismatches": mismatches}
+
+
+def ensure_export(model_name, cache_dir=None):
+    """
+    Returns the directory holding the ONNX export of `model_name`, exporting it on first use.
+    Exports are written to a temporary directory and renamed into place, so concurrent
+    processes never see a half-written export.
+    """
+    cache_dir = cache_dir or Config.TROCR_ONNX_DIR
+    export_dir = os.path.join(cache_dir, f"{model_name.replace('/', '--')}-v{ONNX_EXPORT_VERSION}")
+    if os.path.exists(os.path.join(export_dir, "meta.json")):
+        return export_dir
+
+    with _export_lock:
+        if os.path.exists(os.path.join(export_dir, "meta.json")):
+            return export_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix="export-", dir=cache_dir)
+        try:
+            print(f"[INFO] Exporting {model_name} to ONNX (one-time)...")
+            with timed("model", f"{model_name} (onnx export)"):
+                _export(model_name, tmp_dir)
+            try:
+                os.rename(tmp_dir, export_dir)
+            except OSError:
+                # Another process finished the same export first
+                if not os.path.exists(os.path.join(export_dir, "meta.json")):
+                    raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    print(f"[INFO] TrOCR ONNX export cached in {export_dir}")
+    return export_dir
+
+
+# ------------------ Inference ------------------
+
+def _log_softmax(logits):
+    logits = logits - logits.max(axis=-1, keepdims=True)
+    return logits - np.log(np.exp(logits).sum(axis=-1, keepdims=True))
+
+
+def _hypothesis_score(sum_logprobs, length, length_penalty):
+    """
+    transformers' BeamHypotheses score: the summed log-probabilities divided by
+    length ** length_penalty. As in BeamSearchScorer, a beam finished by EOS is scored with its
+    length without the EOS (start token included), while a beam still open at max_length is
+    scored with its length minus one.
+    """
+    return sum_logprobs / (length ** length_penalty)
+
+
+def _ban_repeated_ngrams(scores, sequences, ngram_size):
+    """Same rule as transformers' no_repeat_ngram_size: a token may not complete an n-gram seen before."""
+    if ngram_size <= 0 or sequences.shape[1] < ngram_size:
+        return
+    for row, seq in enumerate(sequences.tolist()):
+        prefix = tuple(seq[len(seq) - ngram_size + 1:])
+        for start in range(len(seq) - ngram_size + 1):
+            if tuple(seq[start:start + ngram_size - 1]) == prefix:
+                scores[row, seq[start + ngram_size - 1]] = -np.inf
+
+
+class TrOCROnnx:
+    """
+    TrOCR line recognizer running on onnxruntime CPU sessions.
+
+    The encoder runs once per batch; the decoder runs once on the start token and then
+    feeds its key/value cache back one token at a time, with greedy (num_beams=1) or beam
+    search decoding done in NumPy. Beam search scores hypotheses like transformers'
+    generate(): summed log-probabilities divided by length ** length_penalty.
+    """
+
+    def __init__(self, export_dir, num_threads=None):
+        import onnxruntime as ort
+        from transformers import TrOCRProcessor
+
+        with open(os.path.join(export_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.processor = TrOCRProcessor.from_pretrained(export_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = session_threads(num_threads)
+        options.inter_op_num_threads = 1
+
+        def session(name):
+            return ort.InferenceSession(os.path.join(export_dir, name), options, providers=["CPUExecutionProvider"])
+
+        self.encoder = session("encoder.onnx")
+        self.decoder = session("decoder.onnx")
+        self.decoder_with_past = session("decoder_with_past.onnx")
+        self._with_past_inputs = {i.name for i in self.decoder_with_past.get_inputs()}
+
+    def _first_step(self, input_ids, hidden):
+        logits, *present = self.decoder.run(None, {"input_ids": input_ids, "encoder_hidden_states": hidden})
+        return logits[:, -1], present
+
+    def _next_step(self, input_ids, hidden, past):
+        feeds = {"input_ids": input_ids, **dict(zip(self.meta["past_names"], past))}
+        # The exporter drops encoder_hidden_states when cross-attention reads only the cache
+        if "encoder_hidden_states" in self._with_past_inputs:
+            feeds["encoder_hidden_states"] = hidden
+        logits, *present = self.decoder_with_past.run(None, feeds)
+        return logits[:, -1], present
+
+    def recognize(self, images, num_beams=5, max_length=512):
+        """Returns the recognized text of each PIL line image, in input order."""
+        pixel_values = self.processor(images=images, return_tensors="np").pixel_values.astype(np.float32)
+        hidden = self.encoder.run(None, {"pixel_values": pixel_values})[0]
+        if num_beams <= 1:
+            sequences = self._greedy(hidden, max_length)
+        else:
+            sequences = self._beam_search(hidden, num_beams, max_length)
+        return self.processor.batch_decode(sequences, skip_special_tokens=True)
+
+    def _greedy(self, hidden, max_length):
+        meta = self.meta
+        batch = hidden.shape[0]
+        sequences = np.full((batch, 1), meta["decoder_start_token_id"], dtype=np.int64)
+        finished = np.zeros(batch, dtype=bool)
+        logits, past = self._first_step(sequences, hidden)
+        while True:
+            scores = _log_softmax(logits)
+            _ban_repeated_ngrams(scores, sequences, meta["no_repeat_ngram_size"])
+            tokens = scores.argmax(axis=-1)
+            tokens[finished] = meta["pad_token_id"]
+            sequences = np.concatenate([sequences, tokens[:, None]], axis=1)
+            finished |= tokens == meta["eos_token_id"]
+            if finished.all() or sequences.shape[1] >= max_length:
+                return sequences
+            logits, past = self._next_step(tokens[:, None], hidden, past)
+
+    def _beam_search(self, hidden, num_beams, max_length):
+        meta = self.meta
+        eos, length_penalty = meta["eos_token_id"], meta["length_penalty"]
+        batch = hidden.shape[0]
+        hidden = np.repeat(hidden, num_beams, axis=0)
+        sequences = np.full((batch * num_beams, 1), meta["decoder_start_token_id"], dtype=np.int64)
+        # Only the first beam is live at the start, so the first step doesn't pick the same token K times
+        beam_scores = np.tile(np.array([0.0] + [-np.inf] * (num_beams - 1)), batch)
+        hypotheses = [[] for _ in range(batch)]  # (score, tokens) of finished beams
+        done = np.zeros(batch, dtype=bool)
+
+        logits, past = self._first_step(sequences, hidden)
+        while True:
+            scores = _log_softmax(logits)
+            _ban_repeated_ngrams(scores, sequences, meta["no_repeat_ngram_size"])
+            vocab = scores.shape[-1]
+            next_scores = (beam_scores[:, None] + scores).reshape(batch, num_beams * vocab)
+            top = np.argsort(-next_scores, axis=1)[:, :2 * num_beams]
+
+            next_beams, next_tokens, next_beam_scores = [], [], []
+            for b in range(batch):
+                chosen = []
+                for rank, flat in enumerate(top[b]):
+                    beam, token = divmod(int(flat), vocab)
+                    score = next_scores[b, flat]
+                    source = b * num_beams + beam
+                    if done[b]:
+                        break
+                    if token == eos:
+                        if rank < num_beams and np.isfinite(score):
+                            hypotheses[b].append((_hypothesis_score(score, len(sequences[source]), length_penalty), sequences[source]))
+                        continue
+                    chosen.append((source, token, score))
+                    if len(chosen) == num_beams:
+                        break
+                # early_stopping=True: stop once num_beams hypotheses have finished
+                if len(hypotheses[b]) >= num_beams:
+                    done[b] = True
+                while len(chosen) < num_beams:  # Finished items keep padding beams so shapes stay fixed
+                    chosen.append((b * num_beams, meta["pad_token_id"], -np.inf))
+                for source, token, score in chosen:
+                    next_beams.append(source)
+                    next_tokens.append(token)
+                    next_beam_scores.append(score)
+
+            next_beams = np.array(next_beams)
+            tokens = np.array(next_tokens, dtype=np.int64)
+            beam_scores = np.array(next_beam_scores, dtype=np.float64)
+            sequences = np.concatenate([sequences[next_beams], tokens[:, None]], axis=1)
+            if done.all() or sequences.shape[1] >= max_length:
+                break
+            past = [array[next_beams] for array in past]
+            logits, past = self._next_step(tokens[:, None], hidden, past)
+
+        results = []
+        for b in range(batch):
+            candidates = list(hypotheses[b])
+            if not done[b]:
+                # Out of length: live beams compete with the finished ones
+                for beam in range(num_beams):
+                    row = b * num_beams + beam
+                    if np.isfinite(beam_scores[row]):
+                        candidates.append((_hypothesis_score(beam_scores[row], sequences.shape[1] - 1, length_penalty),
+                                           sequences[row]))
+            results.append(max(candidates, key=lambda c: c[0])[1] if candidates else sequences[b * num_beams])
+        return results
+
+
+def load_trocr_onnx(model_name):
+    """
+    Exports `model_name` if needed and opens its onnxruntime sessions. Raises RuntimeError if
+    the export didn't decode the parity lines exactly like model.generate().
+    """
+    export_dir = ensure_export(model_name)
+    with open(os.path.join(export_dir, "meta.json")) as f:
+        parity = json.load(f).get("parity")
+    if not parity or parity["mismatches"]:
+        identical = f"{parity['identical']}/{parity['lines']}" if parity else "no"
+        raise RuntimeError(f"TrOCR ONNX export in {export_dir} matched generate() on {identical} parity lines; "
+                           f"not using it (delete the directory to re-export).")
+    with timed("module", "onnxruntime"):
+        import onnxruntime  # noqa: F401
+    try:
+        with timed("model", f"{model_name} (onnx)"):
+            return TrOCROnnx(export_dir)
+    except Exception:
+        traceback.print_exc()
+        raise
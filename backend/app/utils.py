@@ -1,17 +1,19 @@
 import os
 import re
+import bisect
+import difflib
 import cv2
-import shutil
 import traceback
-import tempfile
-import language_tool_python
 from langdetect import detect_langs
-from zipfile import ZipFile
 from docx import Document
-import fitz  # PyMuPDF
 import numpy as np
 from PIL import Image
-from spello.model import SpellCorrectionModel
+from concurrent.futures import ThreadPoolExecutor
+from app.languagetool_pool import get_languagetool_pool
+from app.preload import timed
+from app import metrics
+# spello, language_tool_python and fitz are heavy and only needed by a few functions, which
+# import them on first use
 
 # Placeholder for Config and LANGUAGE_MAP
 class Config:
@@ -41,113 +43,160 @@ LANG_FONT_MAP = {
 
 _spello_models = {}
 
+# Grammar checking splits long text at line breaks into chunks of about this many characters
+GRAMMAR_CHUNK_CHARS = 2000
 
-def segment_text_lines_opencv(image_path, min_height=10, min_width=20, line_threshold_y=15, dilation_kernel_size=(3,3)):
+
+def load_image(image):
+    """
+    Returns the image as a NumPy array. Accepts a file path (decoded as BGR), a PIL image
+    (converted to BGR) or an ndarray, which is returned as-is.
+    """
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, Image.Image):
+        return cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR)
+    decoded = cv2.imread(image)
+    if decoded is None:
+        raise ValueError(f"Could not read image at {image}")
+    return decoded
+
+
+def to_grayscale(image):
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def compute_image_features(image):
+    """
+    Computes the per-page features shared by preprocessing and OCR routing, so each one is
+    derived once per page instead of once per stage.
+
+    Returns:
+        dict: gray, blurred (5x5 Gaussian), laplacian_var and is_handwritten.
+    """
+    gray = to_grayscale(image)
+    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    variance = cv2.Laplacian(blurred, cv2.CV_64F).var()
+    return {
+        "gray": gray,
+        "blurred": blurred,
+        "laplacian_var": variance,
+        "is_handwritten": variance < 180,
+    }
+
+
+def _line_skew(cx, cy, weights, max_skew, step=0.25):
+    """
+    Estimates the slope of text lines from component centroids: for each candidate angle the
+    centroids are projected onto the rotated vertical axis, binned, and the angle whose
+    histogram is most peaked wins. Candidates are tried in order of increasing |angle|, so
+    flat pages resolve to exactly 0. All angles are scored in one bincount.
+    """
+    angles = np.arange(-max_skew, max_skew + step / 2, step)
+    angles = np.deg2rad(angles[np.argsort(np.abs(angles), kind="stable")])
+    projected = cy[None, :] * np.cos(angles)[:, None] - cx[None, :] * np.sin(angles)[:, None]
+    bins = ((projected - projected.min(axis=1, keepdims=True)) // 2).astype(np.int64)
+    n_bins = int(bins.max()) + 1
+    bins += np.arange(len(angles))[:, None] * n_bins
+    hist = np.bincount(bins.ravel(), weights=np.broadcast_to(weights, bins.shape).ravel(),
+                       minlength=len(angles) * n_bins).reshape(len(angles), n_bins)
+    return angles[int(np.argmax((hist ** 2).sum(axis=1)))]
+
+
+def segment_text_lines_opencv(image, min_height=10, min_width=20, dilation_kernel_size=(3, 3), max_skew=3.0):
+    """
+    Splits a page into text lines using connected-component statistics and a projection
+    profile, without any per-contour Python loop.
+
+    Components are found on the binarized page; their vertical "cores" (middle half of each
+    component's height, so ascenders and descenders of neighbouring lines do not touch) are
+    accumulated into a profile along the estimated line slope (up to `max_skew` degrees).
+    Runs of the profile are lines; every component, including dots and punctuation, joins
+    the line its centre falls in (or the nearest one).
+
+    Args:
+        image (str | np.ndarray): Page path or image, ideally already preprocessed/deskewed.
+
+    Returns:
+        list[tuple[np.ndarray, int]]: (grayscale crop, y_start) per line, top to bottom. Crops
+        are views into the page's grayscale array, so they must not be modified in place.
+    """
+    image_path = image if isinstance(image, str) else "<in-memory image>"
     try:
-        image_np = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-        if image_np is None:
-            print(f"[ERROR] Could not read image for segmentation at {image_path}. Returning empty list.")
-            return []
+        if isinstance(image, str):
+            image_np = cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+            if image_np is None:
+                print(f"[ERROR] Could not read image for segmentation at {image}. Returning empty list.")
+                return []
+        else:
+            image_np = to_grayscale(image)
+        page_h, page_w = image_np.shape[:2]
 
-        # Apply OTSU thresholding. Assume input is already preprocessed (deskewed, etc.)
         _, binary_img = cv2.threshold(image_np, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
-        # Note: Used THRESH_BINARY_INV to make text white and background black, which is often better for contour finding
-
-        # Optional: Apply dilation to connect broken characters.
-        # This can help in grouping parts of the same word/character into a single contour.
-        kernel = np.ones(dilation_kernel_size, np.uint8)
-        dilated_img = cv2.dilate(binary_img, kernel, iterations=1)
-        
-        contours, _ = cv2.findContours(dilated_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-        line_boxes = []
-        for contour in contours:
-            x, y, w, h = cv2.boundingRect(contour)
-            if w > min_width and h > min_height:
-                line_boxes.append({'x': x, 'y': y, 'w': w, 'h': h, 'y_center': y + h/2})
-
-        line_boxes.sort(key=lambda b: b['y_center']) # Sort by center y-coordinate
-
-        merged_lines = []
-        if not line_boxes:
-            print(f"[WARN] No significant contours found for segmentation in {os.path.basename(image_path)}. Returning empty list.")
+        # Component labelling dominates the cost, so pages above ~200 DPI are labelled at half
+        # size. Area-averaging then keeping any ink also joins broken strokes, like the dilation.
+        scale = 2 if page_w >= 1600 else 1
+        if scale > 1:
+            binary_img = cv2.resize(binary_img, (page_w // scale, page_h // scale), interpolation=cv2.INTER_AREA)
+            binary_img = cv2.threshold(binary_img, 0, 255, cv2.THRESH_BINARY)[1]
+        else:
+            binary_img = cv2.dilate(binary_img, np.ones(dilation_kernel_size, np.uint8), iterations=1)
+        _, _, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(binary_img, 8, cv2.CV_32S, cv2.CCL_GRANA)
+        stats, centroids = stats[1:] * scale, centroids[1:] * scale  # Label 0 is the background
+
+        x, y = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+        w, h = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT]
+        # Drop specks and anything taller than a third of the page (borders, rules, pictures)
+        ink = (stats[:, cv2.CC_STAT_AREA] >= 4 * scale * scale) & (h <= page_h / 3)
+        if not ink.any():
+            print(f"[WARN] No significant components found for segmentation in {os.path.basename(image_path)}. Returning empty list.")
             return []
-
-        current_line_group = [line_boxes[0]]
-        for i in range(1, len(line_boxes)):
-            # Check if current box is close enough to the previous box in the group vertically
-            # The 'line_threshold_y' can be adjusted. For handwritten, a larger value might be needed.
-            # Using intersection over union (IOU) along Y-axis for more robust merging
-            prev_box_y1 = current_line_group[-1]['y']
-            prev_box_y2 = current_line_group[-1]['y'] + current_line_group[-1]['h']
-            curr_box_y1 = line_boxes[i]['y']
-            curr_box_y2 = line_boxes[i]['y'] + line_boxes[i]['h']
-
-            # Calculate intersection
-            intersection_y1 = max(prev_box_y1, curr_box_y1)
-            intersection_y2 = min(prev_box_y2, curr_box_y2)
-            intersection_height = max(0, intersection_y2 - intersection_y1)
-
-            # Calculate union
-            union_height = (prev_box_y2 - prev_box_y1) + (curr_box_y2 - curr_box_y1) - intersection_height
-
-            iou_y = intersection_height / union_height if union_height > 0 else 0
-
-            # Also consider distance between bounding box tops (or centers)
-            # The previous logic used center distance. Let's refine for a more common line grouping.
-            # Consider if the current box's top is within the vertical range of the last box of the current line group
-            # OR if their y_centers are close
-            is_same_line = (abs(line_boxes[i]['y_center'] - current_line_group[-1]['y_center']) < line_threshold_y) or \
-                           (iou_y > 0.5) # If there's significant vertical overlap
-
-            if is_same_line:
-                current_line_group.append(line_boxes[i])
-            else:
-                # Merge current_line_group into a single bounding box
-                x_min_group = min(b['x'] for b in current_line_group)
-                y_min_group = min(b['y'] for b in current_line_group)
-                x_max_group = max(b['x'] + b['w'] for b in current_line_group)
-                y_max_group = max(b['y'] + b['h'] for b in current_line_group)
-                merged_lines.append((x_min_group, y_min_group, x_max_group - x_min_group, y_max_group - y_min_group))
-                current_line_group = [line_boxes[i]]
-
-        # Add the last group
-        if current_line_group:
-            x_min_group = min(b['x'] for b in current_line_group)
-            y_min_group = min(b['y'] for b in current_line_group)
-            x_max_group = max(b['x'] + b['w'] for b in current_line_group)
-            y_max_group = max(b['y'] + b['h'] for b in current_line_group)
-            merged_lines.append((x_min_group, y_min_group, x_max_group - x_min_group, y_max_group - y_min_group))
-
-        # Sort final merged lines by Y-coordinate
-        merged_lines.sort(key=lambda b: b[1])
-
-        cropped_line_images = []
-        for x, y, w, h in merged_lines:
-            # Add padding to ensure no text is cut off and provide context for OCR
-            padding_x = 10 # More horizontal padding
-            padding_y = 5  # Vertical padding
-            x_start = max(0, x - padding_x)
-            y_start = max(0, y - padding_y)
-            x_end = min(image_np.shape[1], x + w + padding_x)
-            y_end = min(image_np.shape[0], y + h + padding_y)
-
-            cropped_img_np = image_np[y_start:y_end, x_start:x_end]
-            
-            # --- NEW CHECK HERE ---
-            if cropped_img_np is None or cropped_img_np.size == 0:
-                print(f"[WARN] Cropped image NumPy array is empty or None for line: {x,y,w,h}. Skipping.")
-                continue # Skip this iteration if the cropped array is invalid
-            # --- END NEW CHECK ---
-
-            if cropped_img_np.shape[0] > 0 and cropped_img_np.shape[1] > 0:
-                # Convert to RGB before creating PIL Image, as TrOCR expects RGB
-                cropped_img_rgb = cv2.cvtColor(cropped_img_np, cv2.COLOR_GRAY2RGB)
-                cropped_line_images.append((Image.fromarray(cropped_img_rgb), y_start))
-            else:
-                print(f"[WARN] Skipped empty cropped image for line: {x,y,w,h} (after padding adjust).")
-
-        return cropped_line_images
+        # Letter-sized components define the lines; dots, accents and punctuation only join them
+        body = ink & (h >= max(3, min_height // 2, 0.4 * np.median(h[ink])))
+
+        cx, cy = centroids[:, 0], centroids[:, 1]
+        angle = _line_skew(cx[body], cy[body], w[body].astype(np.float64), max_skew) if max_skew > 0 else 0.0
+        # Vertical position measured along the line slope, shifted to start at 0
+        pos = cy * np.cos(angle) - cx * np.sin(angle)
+        pos -= pos[ink].min()
+
+        # Profile of component cores; a line is a run of non-zero profile
+        size = int(np.ceil(pos[ink].max() + h.max())) + 2
+        core_top = np.clip(np.round(pos[body] - h[body] / 4), 0, size - 1).astype(np.int64)
+        core_bottom = np.clip(np.round(pos[body] + h[body] / 4) + 1, 0, size - 1).astype(np.int64)
+        diff = np.bincount(core_top, weights=w[body], minlength=size) - np.bincount(core_bottom, weights=w[body], minlength=size)
+        covered = np.concatenate(([False], np.cumsum(diff) > 0, [False]))
+        edges = np.flatnonzero(covered[1:] != covered[:-1])
+        run_starts, run_ends = edges[0::2], edges[1::2]  # Half-open [start, end) per line
+
+        # Each component joins the run containing its centre, or the closest run
+        index = np.clip(np.searchsorted(run_starts, pos, side="right") - 1, 0, len(run_starts) - 1)
+        next_index = np.minimum(index + 1, len(run_starts) - 1)
+        gap_after = np.maximum(pos - (run_ends[index] - 1), 0)
+        gap_before = np.maximum(run_starts[next_index] - pos, 0)
+        line_of = np.where(gap_before < gap_after, next_index, index)[ink]
+
+        n_lines = len(run_starts)
+        x0 = np.full(n_lines, page_w, dtype=np.int64)
+        y0 = np.full(n_lines, page_h, dtype=np.int64)
+        x1 = np.zeros(n_lines, dtype=np.int64)
+        y1 = np.zeros(n_lines, dtype=np.int64)
+        np.minimum.at(x0, line_of, x[ink])
+        np.minimum.at(y0, line_of, y[ink])
+        np.maximum.at(x1, line_of, (x + w)[ink])
+        np.maximum.at(y1, line_of, (y + h)[ink])
+
+        keep = (y1 - y0 > min_height) & (x1 - x0 > min_width)
+        # Padding so no text is cut off and TrOCR gets some context
+        padding_x, padding_y = 10, 5
+        x0 = np.maximum(x0[keep] - padding_x, 0)
+        y0 = np.maximum(y0[keep] - padding_y, 0)
+        x1 = np.minimum(x1[keep] + padding_x, page_w)
+        y1 = np.minimum(y1[keep] + padding_y, page_h)
+
+        if not len(x0):
+            print(f"[WARN] No text lines found for segmentation in {os.path.basename(image_path)}. Returning empty list.")
+        return [(image_np[top:bottom, left:right], int(top)) for left, top, right, bottom in zip(x0, y0, x1, y1)]
 
     except Exception as e:
         print(f"[ERROR] Error during text line segmentation for {os.path.basename(image_path)}: {e}")
@@ -217,17 +266,96 @@ def get_doc_stats(text, file_path, chars_per_line=80):
         "page_count": num_pages
     }
 
-def highlight_low_confidence_words(text, low_conf_words):
-    sorted_low_conf = sorted(list(set(low_conf_words)), key=len, reverse=True)
-    for word in sorted_low_conf:
-        if word.strip():
-            pattern = r'\b' + re.escape(word) + r'\b'
-            text = re.sub(pattern, f"<mark>{word}</mark>", text)
-    return text
+def shift_spans(spans, offset):
+    """Moves (word, start, end) spans by `offset` characters, e.g. when their text is appended after a prefix."""
+    if not offset:
+        return list(spans)
+    return [(word, start + offset, end + offset) for word, start, end in spans]
+
+
+def append_with_spans(text, spans, prefix, part, part_spans):
+    """Appends `prefix + part` to `text` and returns the new text with `part_spans` shifted into it."""
+    offset = len(text) + len(prefix)
+    return text + prefix + part, spans + shift_spans(part_spans, offset)
+
+
+def strip_with_spans(text, spans):
+    """str.strip() that keeps (word, start, end) spans pointing at the same characters."""
+    stripped = text.strip()
+    if not stripped:
+        return stripped, []
+    return stripped, shift_spans(spans, -(len(text) - len(text.lstrip())))
+
+
+def _align_tokens(old_words, new_words):
+    """Maps old token indexes to new ones: index for index when the counts match, else via difflib."""
+    if len(old_words) == len(new_words):
+        return list(range(len(old_words)))
+    mapping = [None] * len(old_words)
+    matcher = difflib.SequenceMatcher(None, old_words, new_words, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("equal", "replace") and j2 > j1:
+            for i in range(i1, i2):
+                mapping[i] = j1 + min(i - i1, j2 - j1 - 1)
+    return mapping
+
+
+def remap_spans(old_text, new_text, spans):
+    """
+    Moves word spans of `old_text` onto `new_text` after it was rewritten (e.g. by spell
+    correction). Both texts are split into whitespace-separated tokens and aligned, line by
+    line when the line count is unchanged, so a span follows its word even when the word
+    itself was corrected. Spans of deleted words are dropped.
+    """
+    if old_text == new_text or not spans:
+        return list(spans)
+    old_tokens = list(re.finditer(r"\S+", old_text))
+    new_tokens = list(re.finditer(r"\S+", new_text))
+
+    # Aligning short per-line token lists keeps difflib's cost down on long documents
+    old_lines, new_lines = old_text.split("\n"), new_text.split("\n")
+    if len(old_lines) == len(new_lines):
+        mapping, old_base, new_base = [], 0, 0
+        for old_line, new_line in zip(old_lines, new_lines):
+            old_words, new_words = old_line.split(), new_line.split()
+            mapping.extend(None if j is None else new_base + j for j in _align_tokens(old_words, new_words))
+            old_base += len(old_words)
+            new_base += len(new_words)
+    else:
+        mapping = _align_tokens([m.group() for m in old_tokens], [m.group() for m in new_tokens])
+
+    old_starts = [m.start() for m in old_tokens]
+    remapped = []
+    for _, start, _ in spans:
+        i = bisect.bisect_right(old_starts, start) - 1
+        j = mapping[i] if i >= 0 else None
+        if j is not None:
+            token = new_tokens[j]
+            remapped.append((token.group(), token.start(), token.end()))
+    return remapped
+
+
+def highlight_low_confidence_words(text, low_conf_spans):
+    """
+    Wraps each low-confidence word in <mark> tags, given (word, start, end) spans into `text`
+    as emitted by the OCR engines. Only the flagged occurrences are marked; the text is
+    assembled in one pass. Spans that overlap an earlier one or fall outside the text are skipped.
+    """
+    parts, position = [], 0
+    for _, start, end in sorted(low_conf_spans, key=lambda span: span[1]):
+        if start < position or end > len(text) or start >= end:
+            continue
+        parts.append(text[position:start])
+        parts.append(f"<mark>{text[start:end]}</mark>")
+        position = end
+    parts.append(text[position:])
+    return "".join(parts)
 
 
 def _load_spello_model(lang_code):
     if lang_code not in _spello_models:
+        with timed("module", "spello"):
+            from spello.model import SpellCorrectionModel
         model = SpellCorrectionModel(language=lang_code)
         model_loaded = False
         try:
@@ -242,7 +370,8 @@ def _load_spello_model(lang_code):
 
             if os.path.exists(model_path):
                 print(f"[INFO] Loading Spello model from: {model_path}")
-                model.load(model_path)
+                with timed("model", f"spello-{lang_code}"):
+                    model.load(model_path)
                 model_loaded = True
             else:
                 print(f"[WARN] Spello model not found at {model_path}. Skipping.")
@@ -255,6 +384,7 @@ def _load_spello_model(lang_code):
     return _spello_models.get(lang_code)
 
 
+@metrics.timed_stage("spell", engine="spello", lang_param="lang_code")
 def correct_spelling(text, lang_code='en'):
     try:
         if lang_code.lower() not in ['en', 'hi']:
@@ -275,55 +405,70 @@ def correct_spelling(text, lang_code='en'):
         return text
 
 
+def _split_into_chunks(text, max_chars):
+    """Groups consecutive lines into chunks of at most ~max_chars, splitting only at newlines."""
+    chunks, current, size = [], [], 0
+    for line in text.split("\n"):
+        if current and size + len(line) > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    chunks.append("\n".join(current))
+    return chunks
+
+
+def _check_grammar_chunk(pool, chunk):
+    if not chunk.strip():
+        return chunk
+    with pool.acquire() as tool:
+        matches = tool.check(chunk)
+    import language_tool_python
+    return language_tool_python.utils.correct(chunk, matches)
+
+
+@metrics.timed_stage("grammar", engine="languagetool", lang_param="lang_code")
 def grammar_correction(text, lang_code='en'):
     try:
         if lang_code.lower() != 'en':
             print(f"[INFO] Skipping grammar correction for language: {lang_code}.")
             return text
         print(f"[INFO] Attempting grammar correction for language: {lang_code}")
-        tool = language_tool_python.LanguageTool(lang_code)
-        matches = tool.check(text)
-        corrected = language_tool_python.utils.correct(text, matches)
-        tool.close()
-        return corrected
+        pool = get_languagetool_pool(lang_code)
+        chunks = _split_into_chunks(text, GRAMMAR_CHUNK_CHARS)
+        if len(chunks) == 1:
+            return _check_grammar_chunk(pool, chunks[0])
+
+        # Paragraph chunks are independent, so check them in parallel on the pooled servers
+        with ThreadPoolExecutor(max_workers=min(pool.size, len(chunks))) as executor:
+            corrected = list(executor.map(lambda chunk: _check_grammar_chunk(pool, chunk), chunks))
+        return "\n".join(corrected)
     except Exception as e:
         print(f"[ERROR] Grammar correction failed for language {lang_code}: {e}")
         traceback.print_exc()
         return text
 
 
-def detect_handwritten_or_printed(image_path):
+@metrics.timed_stage("detect_handwriting")
+def detect_handwritten_or_printed(image, features=None):
+    """
+    Classifies a page as handwritten (low Laplacian variance) or printed. Accepts a path or an
+    ndarray; pass precomputed `features` from compute_image_features to skip recomputation.
+    """
+    image_path = image if isinstance(image, str) else "<in-memory image>"
     try:
-        gray = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-        if gray is None:
-            print(f"[WARN] Unable to read image at {image_path} for handwriting detection.")
-            return False
-        blurred_gray = cv2.GaussianBlur(gray, (5, 5), 0)
-        variance = cv2.Laplacian(blurred_gray, cv2.CV_64F).var()
-        is_handwritten = variance < 180
-        print(f"[INFO] Image {image_path} variance: {variance}. Detected as {'Handwritten' if is_handwritten else 'Printed'}.")
+        if features is None:
+            if isinstance(image, str):
+                gray = cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+                if gray is None:
+                    print(f"[WARN] Unable to read image at {image} for handwriting detection.")
+                    return False
+                image = gray
+            features = compute_image_features(image)
+        is_handwritten = features["is_handwritten"]
+        print(f"[INFO] Image {image_path} variance: {features['laplacian_var']}. Detected as {'Handwritten' if is_handwritten else 'Printed'}.")
         return is_handwritten
     except Exception as e:
         print(f"[ERROR] Handwriting detection failed for {image_path}: {e}")
         traceback.print_exc()
         return False
-
-
-def extract_images_from_docx(docx_path):
-    image_paths = []
-    with tempfile.TemporaryDirectory() as temp_dir:
-        try:
-            with ZipFile(docx_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-            media_folder = os.path.join(temp_dir, "word", "media")
-            if os.path.exists(media_folder):
-                for file_name in os.listdir(media_folder):
-                    if file_name.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff')):
-                        src_path = os.path.join(media_folder, file_name)
-                        dst_path = os.path.join(temp_dir, file_name)
-                        shutil.copyfile(src_path, dst_path)
-                        image_paths.append(dst_path)
-        except Exception as e:
-            print(f"[ERROR] Failed to extract images from DOCX '{docx_path}': {e}")
-            traceback.print_exc()
-    return image_paths
@@ -0,0 +1,169 @@
+"""
+Benchmark line segmentation: the vectorized segment_text_lines_opencv versus the previous
+contour-based implementation (kept below as legacy_segment_text_lines).
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_line_segmentation
+    python -m benchmarks.bench_line_segmentation --font-sizes 14 20 28 --skews 0 1.5 -2.5 --scale 2
+    python -m benchmarks.bench_line_segmentation --image path/to/handwritten_page.png
+
+Synthetic pages are rendered with known line counts (benchmarks/corpus.py fonts and
+sentences), rotated by each --skew and scaled by --scale (2 = 300 DPI). Small font sizes
+give dense pages with thousands of components. For each page both segmenters report the
+fastest of --repeats runs and how many lines they found against the number rendered.
+"""
+import argparse
+import os
+import random
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.utils import segment_text_lines_opencv, to_grayscale
+from benchmarks.corpus import MARGIN, PAGE_SIZE, _font, _wrap, sample_paragraphs
+
+
+def legacy_segment_text_lines(image, min_height=10, min_width=20, line_threshold_y=15, dilation_kernel_size=(3,3)):
+    """The contour-based segmenter segment_text_lines_opencv replaced, unchanged apart from logging."""
+    image_np = to_grayscale(image)
+    _, binary_img = cv2.threshold(image_np, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    kernel = np.ones(dilation_kernel_size, np.uint8)
+    dilated_img = cv2.dilate(binary_img, kernel, iterations=1)
+
+    contours, _ = cv2.findContours(dilated_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    line_boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if w > min_width and h > min_height:
+            line_boxes.append({'x': x, 'y': y, 'w': w, 'h': h, 'y_center': y + h/2})
+
+    line_boxes.sort(key=lambda b: b['y_center'])
+
+    merged_lines = []
+    if not line_boxes:
+        return []
+
+    current_line_group = [line_boxes[0]]
+    for i in range(1, len(line_boxes)):
+        prev_box_y1 = current_line_group[-1]['y']
+        prev_box_y2 = current_line_group[-1]['y'] + current_line_group[-1]['h']
+        curr_box_y1 = line_boxes[i]['y']
+        curr_box_y2 = line_boxes[i]['y'] + line_boxes[i]['h']
+
+        intersection_y1 = max(prev_box_y1, curr_box_y1)
+        intersection_y2 = min(prev_box_y2, curr_box_y2)
+        intersection_height = max(0, intersection_y2 - intersection_y1)
+        union_height = (prev_box_y2 - prev_box_y1) + (curr_box_y2 - curr_box_y1) - intersection_height
+        iou_y = intersection_height / union_height if union_height > 0 else 0
+
+        is_same_line = (abs(line_boxes[i]['y_center'] - current_line_group[-1]['y_center']) < line_threshold_y) or \
+                       (iou_y > 0.5)
+
+        if is_same_line:
+            current_line_group.append(line_boxes[i])
+        else:
+            x_min_group = min(b['x'] for b in current_line_group)
+            y_min_group = min(b['y'] for b in current_line_group)
+            x_max_group = max(b['x'] + b['w'] for b in current_line_group)
+            y_max_group = max(b['y'] + b['h'] for b in current_line_group)
+            merged_lines.append((x_min_group, y_min_group, x_max_group - x_min_group, y_max_group - y_min_group))
+            current_line_group = [line_boxes[i]]
+
+    if current_line_group:
+        x_min_group = min(b['x'] for b in current_line_group)
+        y_min_group = min(b['y'] for b in current_line_group)
+        x_max_group = max(b['x'] + b['w'] for b in current_line_group)
+        y_max_group = max(b['y'] + b['h'] for b in current_line_group)
+        merged_lines.append((x_min_group, y_min_group, x_max_group - x_min_group, y_max_group - y_min_group))
+
+    merged_lines.sort(key=lambda b: b[1])
+
+    cropped_line_images = []
+    for x, y, w, h in merged_lines:
+        padding_x = 10
+        padding_y = 5
+        x_start = max(0, x - padding_x)
+        y_start = max(0, y - padding_y)
+        x_end = min(image_np.shape[1], x + w + padding_x)
+        y_end = min(image_np.shape[0], y + h + padding_y)
+
+        cropped_img_np = image_np[y_start:y_end, x_start:x_end]
+        if cropped_img_np is None or cropped_img_np.size == 0:
+            continue
+        if cropped_img_np.shape[0] > 0 and cropped_img_np.shape[1] > 0:
+            cropped_img_rgb = cv2.cvtColor(cropped_img_np, cv2.COLOR_GRAY2RGB)
+            cropped_line_images.append((Image.fromarray(cropped_img_rgb), y_start))
+
+    return cropped_line_images
+
+
+def render_lines_page(lang, rng, font_size):
+    """Renders a page of wrapped paragraphs and returns it (grayscale) with its line count."""
+    page = Image.new("L", PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(page)
+    font = _font(lang, font_size)
+    line_height = int(font_size * 1.5)
+    y, count = MARGIN, 0
+    while True:
+        for line in _wrap(draw, " ".join(sample_paragraphs(lang, rng, 1)), font, PAGE_SIZE[0] - 2 * MARGIN):
+            if y + line_height > PAGE_SIZE[1] - MARGIN:
+                return page, count
+            draw.text((MARGIN, y), line, font=font, fill=0)
+            y += line_height
+            count += 1
+        y += line_height // 2
+
+
+def best_time(fn, page, repeats):
+    best, result = None, None
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        result = fn(page)
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def compare(name, page, expected, repeats):
+    legacy, legacy_seconds = best_time(legacy_segment_text_lines, page, repeats)
+    lines, seconds = best_time(segment_text_lines_opencv, page, repeats)
+    components = cv2.connectedComponents(cv2.threshold(page, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)[1])[0] - 1
+    expected_text = f"{expected:>4}" if expected is not None else "   ?"
+    print(f"{name:<28} {components:>7} {expected_text}  "
+          f"legacy {len(legacy):>4} lines {legacy_seconds * 1000:8.1f} ms   "
+          f"vectorized {len(lines):>4} lines {seconds * 1000:8.1f} ms   x{legacy_seconds / seconds:5.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="Page to segment instead of synthetic pages")
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--font-sizes", type=int, nargs="+", default=[14, 20, 28])
+    parser.add_argument("--skews", type=float, nargs="+", default=[0.0, 1.5, -2.5], help="Page rotation in degrees")
+    parser.add_argument("--scale", type=float, default=2.0, help="Upscaling of the 150 DPI pages (2 = 300 DPI)")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per segmenter; the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'page':<28} {'comps':>7} {'want':>4}")
+    if args.image:
+        page = cv2.imread(args.image, cv2.IMREAD_GRAYSCALE)
+        if page is None:
+            raise SystemExit(f"Could not read {args.image}")
+        compare(os.path.basename(args.image), page, None, args.repeats)
+        return
+
+    rng = random.Random(0)
+    for font_size in args.font_sizes:
+        base, expected = render_lines_page(args.lang, rng, font_size)
+        for skew in args.skews:
+            page = base.rotate(skew, resample=Image.BICUBIC, fillcolor=255)
+            page = np.asarray(page.resize((round(page.width * args.scale), round(page.height * args.scale)), Image.BICUBIC))
+            compare(f"{args.lang} {font_size}px skew {skew:+.1f}", page, expected, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark PDF export: the app.pdf_layout renderer behind save_to_pdf versus the previous
+implementation (kept below as legacy_save_to_pdf).
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_pdf_layout
+    python -m benchmarks.bench_pdf_layout --langs en hi ta --pages 100 --repeats 3
+
+For each language a text long enough to fill about --pages pages is built from the corpus
+sentences (benchmarks/corpus.py) and rendered by both implementations. Reports the fastest
+run, the page count and the file size of each, and fails if the page counts differ.
+Font registration is done before timing, so only layout and PDF writing are measured.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import inch
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from app.pdf_layout import register_fonts, render_text_pdf
+from app.utils import LANG_FONT_MAP
+from benchmarks.corpus import LANGUAGES, sample_paragraphs
+
+# Paragraphs of 2-4 sentences at 11pt fill roughly this many per A4 page
+PARAGRAPHS_PER_PAGE = 18
+
+
+def legacy_save_to_pdf(text, path, lang_code='en'):
+    """The save_to_pdf layout loop before app.pdf_layout, unchanged apart from logging."""
+    font_name = "Helvetica"
+    font_size = 11
+
+    font_path = LANG_FONT_MAP.get(lang_code, LANG_FONT_MAP.get("en"))
+    if font_path and os.path.exists(font_path):
+        custom_font_name = f"Noto_{lang_code}"
+        if custom_font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(custom_font_name, font_path))
+        font_name = custom_font_name
+
+    c = canvas.Canvas(path, pagesize=A4)
+    w, h = A4
+    x_margin, y_margin = inch * 0.75, inch * 0.75
+    y = h - y_margin
+
+    if font_name in pdfmetrics.getRegisteredFontNames() or font_name in ["Helvetica", "Times-Roman", "Courier"]:
+        c.setFont(font_name, font_size)
+    else:
+        c.setFont("Helvetica", font_size)
+
+    for para in text.split("\n"):
+        words = para.split(" ")
+        line = ""
+        for word in words:
+            if c.stringWidth(line + word + " ", font_name, font_size) < w - 2 * x_margin:
+                line += word + " "
+            else:
+                c.drawString(x_margin, y, line.strip())
+                y -= font_size + 3
+                line = word + " "
+
+                if y < y_margin:
+                    c.showPage()
+                    y = h - y_margin
+                    if font_name in pdfmetrics.getRegisteredFontNames() or font_name in ["Helvetica", "Times-Roman", "Courier"]:
+                        c.setFont(font_name, font_size)
+                    else:
+                        c.setFont("Helvetica", font_size)
+
+        if line:
+            c.drawString(x_margin, y, line.strip())
+            y -= font_size + 3
+
+        y -= 5
+
+        if y < y_margin:
+            c.showPage()
+            y = h - y_margin
+            if font_name in pdfmetrics.getRegisteredFontNames() or font_name in ["Helvetica", "Times-Roman", "Courier"]:
+                c.setFont(font_name, font_size)
+            else:
+                c.setFont("Helvetica", font_size)
+
+    c.save()
+
+
+def page_count(path):
+    import fitz  # PyMuPDF
+    with fitz.open(path) as doc:
+        return doc.page_count
+
+
+def best_time(fn, text, path, lang, repeats):
+    best = None
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        fn(text, path, lang_code=lang)
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--langs", nargs="+", default=["en", "hi", "ta"], choices=LANGUAGES)
+    parser.add_argument("--pages", type=int, default=100, help="Approximate length of each output")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per renderer; the fastest is reported")
+    args = parser.parse_args()
+
+    register_fonts()
+    out_dir = tempfile.mkdtemp(prefix="pdf_layout_bench_")
+    rng = random.Random(0)
+    mismatched = []
+    for lang in args.langs:
+        text = "\n".join(sample_paragraphs(lang, rng, args.pages * PARAGRAPHS_PER_PAGE))
+        results = {}
+        for name, fn in (("legacy", legacy_save_to_pdf), ("layout", render_text_pdf)):
+            path = os.path.join(out_dir, f"{lang}_{name}.pdf")
+            seconds = best_time(fn, text, path, lang, args.repeats)
+            results[name] = (seconds, page_count(path), os.path.getsize(path))
+        (legacy_s, legacy_pages, legacy_size), (layout_s, layout_pages, layout_size) = results["legacy"], results["layout"]
+        print(f"{lang}: {len(text):>8} chars  legacy {legacy_s:7.3f}s {legacy_pages:>4} pages {legacy_size / 1024:8.1f} KB   "
+              f"layout {layout_s:7.3f}s {layout_pages:>4} pages {layout_size / 1024:8.1f} KB   x{legacy_s / layout_s:5.1f}")
+        if legacy_pages != layout_pages:
+            mismatched.append(lang)
+    print(f"[INFO] PDFs written to {out_dir}")
+    if mismatched:
+        raise SystemExit(f"Page counts differ for: {', '.join(mismatched)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+End-to-end and per-stage throughput benchmark on the synthetic corpus (benchmarks/corpus.py).
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_pipeline --report bench_report.json
+    python -m benchmarks.bench_pipeline --langs en hi --pdf-pages 8 --repeats 3
+    python -m benchmarks.bench_pipeline --corpus /tmp/ocr_corpus --no-end-to-end
+
+Two passes, both optional:
+
+* stages: every stage is timed on its own (load, features, preprocess, ocr, rasterize,
+  spell, translate, grammar, export_pdf, export_docx), using the single-page images and
+  PDFs of the corpus;
+* end_to_end: process_document on every corpus file, with the per-stage breakdown taken
+  from its progress callbacks.
+
+The JSON report holds pages/sec, p50/p95/mean latency per stage, per-document latency and
+peak RSS of this process and of its PDF worker processes. The OCR result cache and the
+translation memory are disabled unless --with-caches is given, so repeated runs measure
+real work.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from config import Config
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its reaped children, in MB."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return {"self": psutil.Process().memory_info().peak_wset / 2 ** 20, "children": None}
+        except (ImportError, AttributeError):
+            return {"self": None, "children": None}
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale / 2 ** 20,
+    }
+
+
+def summarize(samples):
+    values = np.asarray(samples, dtype=np.float64)
+    if not len(values):
+        return {"count": 0}
+    return {
+        "count": int(len(values)),
+        "total": round(float(values.sum()), 4),
+        "mean": round(float(values.mean()), 4),
+        "p50": round(float(np.percentile(values, 50)), 4),
+        "p95": round(float(np.percentile(values, 95)), 4),
+        "max": round(float(values.max()), 4),
+    }
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def time(self, stage, fn, *args, **kwargs):
+        started_at = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples[stage].append(time.perf_counter() - started_at)
+        return result
+
+    def report(self):
+        return {stage: summarize(samples) for stage, samples in self.samples.items()}
+
+
+def target_for(lang, target_lang):
+    # Translating a document into its own language is a no-op; pick English or Hindi instead
+    if target_lang != lang:
+        return target_lang
+    return "hi" if lang == "en" else "en"
+
+
+def bench_stages(manifest, repeats, target_lang, out_dir):
+    from app.ocr_engine import preprocess_array, save_to_pdf, save_to_docx
+    from app.ocr_router import extract_text_with_best_model
+    from app.rasterizer import rasterize_page
+    from app.translator import translate_text
+    from app.utils import compute_image_features, correct_spelling, grammar_correction, load_image
+
+    timer = StageTimer()
+    for doc in manifest:
+        lang, target = doc["lang"], target_for(doc["lang"], target_lang)
+        for _ in range(repeats):
+            if doc["kind"] == "pdf":
+                for page_no in range(1, doc["pages"] + 1):
+                    timer.time("rasterize", rasterize_page, doc["path"], page_no)
+                continue
+            if doc["kind"] not in ("printed", "scanned"):
+                continue
+
+            image = timer.time("load", load_image, doc["path"])
+            features = timer.time("features", compute_image_features, image)
+            processed = timer.time("preprocess", preprocess_array, image, features)
+            text, _, _ = timer.time("ocr", extract_text_with_best_model, processed, source_lang=lang,
+                                    is_handwritten=features["is_handwritten"])
+            text = timer.time("spell", correct_spelling, text, lang_code=lang)
+            translated = timer.time("translate", translate_text, text, lang, target)
+            translated = timer.time("grammar", grammar_correction, translated, lang_code=target)
+            timer.time("export_pdf", save_to_pdf, translated, os.path.join(out_dir, "stage.pdf"), lang_code=target)
+            timer.time("export_docx", save_to_docx, translated, os.path.join(out_dir, "stage.docx"))
+    return timer.report()
+
+
+def bench_end_to_end(manifest, repeats, target_lang):
+    from app.ocr_engine import process_document
+
+    stage_samples = defaultdict(list)
+    documents = []
+    for doc in manifest:
+        for _ in range(repeats):
+            events = []
+
+            def progress(stage, **info):
+                events.append((stage, time.perf_counter()))
+
+            started_at = time.perf_counter()
+            result = process_document(doc["path"], doc["lang"], target_for(doc["lang"], target_lang),
+                                      enhance=True, progress=progress)
+            finished_at = time.perf_counter()
+
+            # A stage lasts from its first event until the next stage starts
+            spans = {}
+            for i, (stage, at) in enumerate(events):
+                if stage in spans:
+                    continue
+                end = next((t for s, t in events[i + 1:] if s != stage), finished_at)
+                spans[stage] = end - at
+            for stage, seconds in spans.items():
+                stage_samples[stage].append(seconds)
+
+            documents.append({"kind": doc["kind"], "lang": doc["lang"], "pages": doc["pages"],
+                              "seconds": finished_at - started_at, "error": result.get("error")})
+
+    def throughput(docs):
+        seconds = sum(d["seconds"] for d in docs)
+        pages = sum(d["pages"] for d in docs)
+        return {"documents": len(docs), "pages": pages, "seconds": round(seconds, 3),
+                "pages_per_sec": round(pages / seconds, 4) if seconds else None,
+                "document_latency": summarize([d["seconds"] for d in docs]),
+                "errors": sum(1 for d in docs if d["error"])}
+
+    by_kind = defaultdict(list)
+    by_lang = defaultdict(list)
+    for d in documents:
+        by_kind[d["kind"]].append(d)
+        by_lang[d["lang"]].append(d)
+    return {
+        "overall": throughput(documents),
+        "by_kind": {kind: throughput(docs) for kind, docs in by_kind.items()},
+        "by_lang": {lang: throughput(docs) for lang, docs in by_lang.items()},
+        "stages": {stage: summarize(samples) for stage, samples in stage_samples.items()},
+    }
+
+
+def environment():
+    env = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {key: getattr(Config, key) for key in (
+            "PDF_OCR_WORKERS", "TROCR_BATCH_SIZE", "TROCR_BACKEND", "QUANTIZE_MODELS",
+            "TRANSLATION_BATCH_SIZE", "TRANSLATION_NUM_BEAMS", "OCR_CACHE_ENABLED", "TRANSLATION_MEMORY_ENABLED",
+        )},
+    }
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        env["torch"] = {"version": torch.__version__, "threads": torch.get_num_threads()}
+    return env
+
+
+def main():
+    from benchmarks.corpus import LANGUAGES, build_corpus
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Existing corpus directory (with manifest.json); generated if omitted")
+    parser.add_argument("--langs", nargs="+", default=LANGUAGES, choices=LANGUAGES)
+    parser.add_argument("--kinds", nargs="+", default=["printed", "scanned", "pdf", "docx"])
+    parser.add_argument("--pdf-pages", type=int, default=4)
+    parser.add_argument("--target-lang", default="en", help="Translation target (documents already in it use hi/en)")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--no-stages", action="store_true", help="Skip the per-stage pass")
+    parser.add_argument("--no-end-to-end", action="store_true", help="Skip the process_document pass")
+    parser.add_argument("--with-caches", action="store_true", help="Keep the OCR cache and translation memory enabled")
+    parser.add_argument("--report", default="bench_report.json", help="Where to write the JSON report")
+    args = parser.parse_args()
+
+    if not args.with_caches:
+        Config.OCR_CACHE_ENABLED = False
+        Config.TRANSLATION_MEMORY_ENABLED = False
+
+    work_dir = tempfile.mkdtemp(prefix="ocr_bench_")
+    if args.corpus:
+        with open(os.path.join(args.corpus, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    else:
+        manifest = build_corpus(os.path.join(work_dir, "corpus"), args.langs, pdf_pages=args.pdf_pages)
+    manifest = [doc for doc in manifest if doc["lang"] in args.langs and doc["kind"] in args.kinds]
+    print(f"[INFO] Benchmarking {len(manifest)} documents ({sum(d['pages'] for d in manifest)} pages), "
+          f"{args.repeats} repeat(s).")
+
+    report = {"corpus": {"documents": len(manifest), "pages": sum(d["pages"] for d in manifest),
+                         "langs": args.langs, "kinds": args.kinds}}
+    started_at = time.perf_counter()
+    if not args.no_stages:
+        report["stages"] = bench_stages(manifest, args.repeats, args.target_lang, work_dir)
+    if not args.no_end_to_end:
+        report["end_to_end"] = bench_end_to_end(manifest, args.repeats, args.target_lang)
+    report["wall_seconds"] = round(time.perf_counter() - started_at, 3)
+    report["peak_rss_mb"] = peak_rss_mb()
+    report["environment"] = environment()
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for section in ("stages", "end_to_end"):
+        stages = report.get(section, {})
+        stages = stages.get("stages", stages) if section == "end_to_end" else stages
+        for stage, stats in stages.items():
+            if stats.get("count"):
+                print(f"{section:<11} {stage:<12} n={stats['count']:<4} p50 {stats['p50']:8.3f}s  p95 {stats['p95']:8.3f}s")
+    if "end_to_end" in report:
+        overall = report["end_to_end"]["overall"]
+        print(f"[INFO] {overall['pages']} pages in {overall['seconds']:.1f}s: {overall['pages_per_sec']} pages/s")
+    print(f"[INFO] Peak RSS: {report['peak_rss_mb']}. Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
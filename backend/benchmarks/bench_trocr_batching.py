@@ -0,0 +1,81 @@
+"""
+Benchmark TrOCR line recognition: one generate() call per line versus mini-batches.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_trocr_batching --lines 40 --batch-sizes 1 4 8 16
+    python -m benchmarks.bench_trocr_batching --image path/to/handwritten_page.png
+
+Batch size 1 is the old per-line behaviour. Reports lines/second for each batch size and
+checks that every batch size produces the same text as the first one listed.
+"""
+import argparse
+import os
+import random
+import time
+
+import torch
+from PIL import Image, ImageDraw, ImageFont
+
+from app.utils import LANG_FONT_MAP, segment_text_lines_opencv
+from app.ocr_router import recognize_lines_trocr, get_device
+
+SAMPLE_WORDS = (
+    "the quick brown fox jumps over lazy dog invoice total amount date received "
+    "payment customer address meeting notes please call back tomorrow morning"
+).split()
+
+
+def synthetic_lines(count, seed=0):
+    """Renders `count` single-line images of varying length with the bundled Noto font."""
+    rng = random.Random(seed)
+    font = ImageFont.truetype(LANG_FONT_MAP["en"], 32)
+    lines = []
+    for _ in range(count):
+        text = " ".join(rng.choice(SAMPLE_WORDS) for _ in range(rng.randint(2, 9)))
+        width = int(font.getlength(text)) + 20
+        img = Image.new("RGB", (width, 48), "white")
+        ImageDraw.Draw(img).text((10, 6), text, font=font, fill="black")
+        lines.append(img)
+    return lines
+
+
+def run(lines, batch_size, repeats):
+    best = None
+    texts = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        texts = recognize_lines_trocr(lines, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return texts, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="Handwritten page to segment instead of synthetic lines")
+    parser.add_argument("--lines", type=int, default=40, help="Number of synthetic lines")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per batch size; the fastest is reported")
+    args = parser.parse_args()
+
+    if args.image:
+        lines = [img for img, _ in segment_text_lines_opencv(args.image)]
+        source = os.path.basename(args.image)
+    else:
+        lines = synthetic_lines(args.lines)
+        source = "synthetic"
+
+    print(f"[INFO] {len(lines)} lines from {source} on {get_device()} (torch threads: {torch.get_num_threads()})")
+    baseline = None
+    for batch_size in args.batch_sizes:
+        texts, elapsed = run(lines, batch_size, args.repeats)
+        if baseline is None:
+            baseline = (texts, elapsed)
+        matches = sum(a == b for a, b in zip(texts, baseline[0]))
+        print(f"batch_size={batch_size:<3} {elapsed:8.2f}s  {len(lines) / elapsed:7.2f} lines/s  "
+              f"speedup x{baseline[1] / elapsed:.2f}  identical lines {matches}/{len(lines)}")
+
+
+if __name__ == "__main__":
+    main()
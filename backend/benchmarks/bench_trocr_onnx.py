@@ -0,0 +1,78 @@
+"""
+Compare the onnxruntime TrOCR backend with eager torch generate() before setting
+TROCR_BACKEND=onnx.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_trocr_onnx --lines 40
+    python -m benchmarks.bench_trocr_onnx --image path/to/handwritten_page.png --threads 4
+
+Exports the model on first use; the export runs its own parity check on a few rendered
+lines (app/trocr_onnx.py), which is printed first. Both backends then recognize the same
+lines through recognize_lines_trocr. Reports lines/second for each, the speedup and how
+many lines decode to identical text; exits non-zero if any line differs.
+"""
+import argparse
+import json
+import os
+import time
+
+import torch
+
+from config import Config
+from app.ocr_router import TROCR_MODEL_NAME, _load_trocr, get_trocr_onnx, recognize_lines_trocr
+from app.trocr_onnx import ensure_export, session_threads, set_process_threads
+from app.utils import segment_text_lines_opencv
+from benchmarks.bench_trocr_batching import synthetic_lines
+
+
+def best_time(fn, repeats):
+    best, texts = None, None
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        texts = fn()
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+    return texts, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image", help="Handwritten page to segment instead of synthetic lines")
+    parser.add_argument("--lines", type=int, default=40, help="Number of synthetic lines")
+    parser.add_argument("--threads", type=int, help="Threads for both backends (default: all cores)")
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per backend; the fastest is reported")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+        set_process_threads(args.threads)
+    lines = [img for img, _ in segment_text_lines_opencv(args.image)] if args.image else synthetic_lines(args.lines)
+
+    with open(os.path.join(ensure_export(TROCR_MODEL_NAME), "meta.json")) as f:
+        parity = json.load(f)["parity"]
+    print(f"[INFO] Export parity: {parity['identical']}/{parity['lines']} lines identical to generate()")
+
+    trocr = _load_trocr(quantize=False)
+    get_trocr_onnx()  # Raises instead of silently falling back to torch
+    print(f"[INFO] {len(lines)} lines, torch threads {torch.get_num_threads()}, onnx threads {session_threads()}")
+
+    recognize_lines_trocr(lines[:2], trocr=trocr)  # Warm-up
+    torch_texts, torch_seconds = best_time(lambda: recognize_lines_trocr(lines, trocr=trocr), args.repeats)
+    Config.TROCR_BACKEND = "onnx"
+    recognize_lines_trocr(lines[:2])
+    onnx_texts, onnx_seconds = best_time(lambda: recognize_lines_trocr(lines), args.repeats)
+
+    identical = sum(a == b for a, b in zip(torch_texts, onnx_texts))
+    for name, seconds in (("torch", torch_seconds), ("onnx", onnx_seconds)):
+        print(f"{name:<6} {seconds:8.2f}s  {len(lines) / seconds:7.2f} lines/s")
+    print(f"onnx vs torch: speedup x{torch_seconds / onnx_seconds:.2f}  identical lines {identical}/{len(lines)}")
+    for a, b in zip(torch_texts, onnx_texts):
+        if a != b:
+            print(f"  torch: {a!r}\n  onnx:  {b!r}")
+    if identical < len(lines):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
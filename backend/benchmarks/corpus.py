@@ -0,0 +1,203 @@
+"""
+Synthetic multilingual document corpus for benchmarks.
+
+Renders pages with the bundled Noto fonts (LANG_FONT_MAP) and writes them out as the kinds
+of uploads the app sees: clean printed pages, noisy/rotated "scans", multi-page image-only
+PDFs and DOCX files mixing paragraphs with embedded page images. Generation is seeded, so
+the same arguments always produce the same corpus.
+
+    python -m benchmarks.corpus --out /tmp/ocr_corpus --langs en ta hi --pdf-pages 4
+
+Indic scripts are shaped correctly only when Pillow is built with libraqm; without it the
+glyphs are still rendered (and exercise OCR) but may not form valid conjuncts.
+"""
+import argparse
+import io
+import json
+import os
+import random
+
+import numpy as np
+from docx import Document
+from docx.shared import Inches
+from PIL import Image, ImageDraw, ImageFilter, ImageFont, features
+
+from app.utils import LANG_FONT_MAP
+
+LANGUAGES = ["en", "ta", "hi", "ml", "te", "kn"]
+
+SAMPLE_SENTENCES = {
+    "en": [
+        "Please fill in the application form and sign at the bottom of the page.",
+        "The office will remain closed on Saturday for maintenance work.",
+        "Payment must be made within thirty days of the invoice date.",
+        "All students are requested to bring their identity cards.",
+        "The meeting has been postponed to next Monday at ten in the morning.",
+        "Heavy rain is expected in the coastal districts over the next two days.",
+    ],
+    "ta": [
+        "இந்த ஆவணம் ஒரு மாதிரி பக்கம் ஆகும்.",
+        "தயவுசெய்து விண்ணப்பப் படிவத்தை பூர்த்தி செய்து கையொப்பமிடவும்.",
+        "அலுவலகம் சனிக்கிழமை மூடப்பட்டிருக்கும்.",
+        "கட்டணம் முப்பது நாட்களுக்குள் செலுத்தப்பட வேண்டும்.",
+        "அனைத்து மாணவர்களும் அடையாள அட்டையை கொண்டு வர வேண்டும்.",
+    ],
+    "hi": [
+        "यह दस्तावेज़ एक नमूना पृष्ठ है।",
+        "कृपया आवेदन पत्र भरकर पृष्ठ के नीचे हस्ताक्षर करें।",
+        "रखरखाव कार्य के कारण कार्यालय शनिवार को बंद रहेगा।",
+        "भुगतान चालान की तारीख से तीस दिनों के भीतर किया जाना चाहिए।",
+        "सभी छात्रों से अनुरोध है कि वे अपना पहचान पत्र साथ लाएं।",
+    ],
+    "ml": [
+        "ഇത് ഒരു മാതൃകാ പേജ് ആണ്.",
+        "ദയവായി അപേക്ഷാ ഫോം പൂരിപ്പിച്ച് ഒപ്പിടുക.",
+        "ശനിയാഴ്ച ഓഫീസ് അടച്ചിരിക്കും.",
+        "മുപ്പത് ദിവസത്തിനുള്ളിൽ പണം അടയ്ക്കണം.",
+        "എല്ലാ വിദ്യാർത്ഥികളും തിരിച്ചറിയൽ കാർഡ് കൊണ്ടുവരണം.",
+    ],
+    "te": [
+        "ఇది ఒక నమూనా పేజీ.",
+        "దయచేసి దరఖాస్తు ఫారమ్ నింపి సంతకం చేయండి.",
+        "శనివారం కార్యాలయం మూసివేయబడుతుంది.",
+        "ముప్పై రోజుల్లోగా చెల్లింపు చేయాలి.",
+        "విద్యార్థులందరూ గుర్తింపు కార్డులు తీసుకురావాలి.",
+    ],
+    "kn": [
+        "ಇದು ಒಂದು ಮಾದರಿ ಪುಟ.",
+        "ದಯವಿಟ್ಟು ಅರ್ಜಿ ನಮೂನೆಯನ್ನು ಭರ್ತಿ ಮಾಡಿ ಸಹಿ ಮಾಡಿ.",
+        "ಶನಿವಾರ ಕಚೇರಿ ಮುಚ್ಚಿರುತ್ತದೆ.",
+        "ಮೂವತ್ತು ದಿನಗಳೊಳಗೆ ಪಾವತಿ ಮಾಡಬೇಕು.",
+        "ಎಲ್ಲಾ ವಿದ್ಯಾರ್ಥಿಗಳು ಗುರುತಿನ ಚೀಟಿ ತರಬೇಕು.",
+    ],
+}
+
+# A4 at 150 DPI
+PAGE_SIZE = (1240, 1754)
+MARGIN = 100
+
+
+def _font(lang, size):
+    layout = ImageFont.Layout.RAQM if features.check("raqm") else ImageFont.Layout.BASIC
+    return ImageFont.truetype(LANG_FONT_MAP[lang], size, layout_engine=layout)
+
+
+def sample_paragraphs(lang, rng, count):
+    sentences = SAMPLE_SENTENCES[lang]
+    return [" ".join(rng.choice(sentences) for _ in range(rng.randint(2, 4))) for _ in range(count)]
+
+
+def _wrap(draw, text, font, max_width):
+    lines, line = [], ""
+    for word in text.split():
+        candidate = f"{line} {word}".strip()
+        if line and draw.textlength(candidate, font=font) > max_width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    return lines
+
+
+def render_page(lang, rng, font_size=28, paragraphs=None):
+    """Renders one printed page of `lang` text as an RGB image."""
+    page = Image.new("RGB", PAGE_SIZE, "white")
+    draw = ImageDraw.Draw(page)
+    font = _font(lang, font_size)
+    line_height = int(font_size * 1.6)
+    y = MARGIN
+    for paragraph in paragraphs or sample_paragraphs(lang, rng, rng.randint(5, 8)):
+        for line in _wrap(draw, paragraph, font, PAGE_SIZE[0] - 2 * MARGIN):
+            if y + line_height > PAGE_SIZE[1] - MARGIN:
+                return page
+            draw.text((MARGIN, y), line, font=font, fill="black")
+            y += line_height
+        y += line_height // 2
+    return page
+
+
+def degrade(page, rng, max_angle=3.0, noise=12.0):
+    """Makes a page look scanned: small rotation, blur, uneven lighting and sensor noise."""
+    angle = rng.uniform(-max_angle, max_angle)
+    page = page.rotate(angle, resample=Image.BICUBIC, expand=False, fillcolor="white")
+    page = page.filter(ImageFilter.GaussianBlur(radius=rng.uniform(0.3, 1.0)))
+    pixels = np.asarray(page, dtype=np.float32)
+    np_rng = np.random.default_rng(rng.randint(0, 2 ** 31))
+    gradient = np.linspace(rng.uniform(-25, 0), rng.uniform(0, 25), pixels.shape[1], dtype=np.float32)
+    pixels = pixels + gradient[None, :, None] + np_rng.normal(0, noise, pixels.shape).astype(np.float32)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def write_pdf(pages, path):
+    """Writes pages as an image-only PDF, like the output of a scanner."""
+    pages[0].save(path, save_all=True, append_images=pages[1:], resolution=150)
+
+
+def write_docx(lang, rng, images, path):
+    """Writes a DOCX with text paragraphs and the given images embedded between them."""
+    doc = Document()
+    for image in images:
+        for paragraph in sample_paragraphs(lang, rng, 2):
+            doc.add_paragraph(paragraph)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        buffer.seek(0)
+        doc.add_picture(buffer, width=Inches(5.5))
+    doc.save(path)
+
+
+def build_corpus(out_dir, langs=None, pdf_pages=4, docx_images=2, seed=0):
+    """
+    Generates the corpus into `out_dir` and returns its manifest: one entry per file with
+    path, kind (printed, scanned, pdf, docx), lang and page count. The manifest is also
+    written to manifest.json.
+    """
+    langs = langs or LANGUAGES
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    manifest = []
+
+    def add(kind, lang, path, pages):
+        manifest.append({"kind": kind, "lang": lang, "path": path, "pages": pages})
+
+    for lang in langs:
+        printed = render_page(lang, rng)
+        path = os.path.join(out_dir, f"{lang}_printed.png")
+        printed.save(path)
+        add("printed", lang, path, 1)
+
+        path = os.path.join(out_dir, f"{lang}_scanned.jpg")
+        degrade(render_page(lang, rng), rng).save(path, quality=85)
+        add("scanned", lang, path, 1)
+
+        pages = [degrade(render_page(lang, rng), rng) if i % 2 else render_page(lang, rng) for i in range(pdf_pages)]
+        path = os.path.join(out_dir, f"{lang}_{pdf_pages}pages.pdf")
+        write_pdf(pages, path)
+        add("pdf", lang, path, pdf_pages)
+
+        images = [render_page(lang, rng, font_size=36, paragraphs=sample_paragraphs(lang, rng, 2)) for _ in range(docx_images)]
+        path = os.path.join(out_dir, f"{lang}_images.docx")
+        write_docx(lang, rng, images, path)
+        add("docx", lang, path, docx_images)
+
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="Directory to write the corpus to")
+    parser.add_argument("--langs", nargs="+", default=LANGUAGES, choices=LANGUAGES)
+    parser.add_argument("--pdf-pages", type=int, default=4)
+    parser.add_argument("--docx-images", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    manifest = build_corpus(args.out, args.langs, args.pdf_pages, args.docx_images, args.seed)
+    print(f"[INFO] Wrote {len(manifest)} documents ({sum(d['pages'] for d in manifest)} pages) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Evaluate int8 dynamic quantization for one model before enabling it in QUANTIZE_MODELS.
+
+Run from the backend directory:
+
+    python -m benchmarks.eval_quantization trocr --lines 40
+    python -m benchmarks.eval_quantization trocr --image path/to/handwritten_page.png
+    python -m benchmarks.eval_quantization translation:en-indic --src en --tgt hi
+    python -m benchmarks.eval_quantization translation:indic-en --src ta --tgt en --sentences samples_ta.txt
+
+The fp32 and int8 variants are loaded one after the other and run on the same samples.
+Reports load time, model size (state_dict bytes), RSS growth, inference latency and the
+drift of the int8 outputs from the fp32 outputs as BLEU and character error rate (CER).
+Translation runs bypass the translation memory.
+"""
+import argparse
+import gc
+import time
+
+import sacrebleu
+from rapidfuzz.distance import Levenshtein
+
+from config import Config
+
+Config.TRANSLATION_MEMORY_ENABLED = False  # Every run must hit the model
+
+from app.model_registry import _rss_bytes, _torch_bytes  # noqa: E402
+from app.utils import segment_text_lines_opencv  # noqa: E402
+
+SAMPLE_SENTENCES = [
+    "Please submit the signed application form along with a copy of your identity card.",
+    "The meeting has been postponed to next Monday at ten in the morning.",
+    "Payment must be received within thirty days of the invoice date.",
+    "The patient was advised to take the medicine twice a day after meals.",
+    "Students who miss the examination will not be allowed to appear again this year.",
+    "Heavy rain is expected in the coastal districts over the next two days.",
+    "All visitors are requested to carry a valid photo identity proof.",
+    "The certificate is issued on the basis of the records available in this office.",
+]
+
+
+def trocr_runner(args):
+    from app.ocr_router import _load_trocr, recognize_lines_trocr
+
+    if args.image:
+        lines = [img for img, _ in segment_text_lines_opencv(args.image)]
+    else:
+        from benchmarks.bench_trocr_batching import synthetic_lines
+        lines = synthetic_lines(args.lines)
+
+    def run(trocr):
+        return recognize_lines_trocr(lines, trocr=trocr)
+
+    return _load_trocr, run, len(lines), "lines"
+
+
+def translation_runner(args):
+    from app.translator import LANG_TAGS, _load_translation_model, _translate_sentences
+
+    model_type = args.model.split(":", 1)[1]
+    if args.sentences:
+        with open(args.sentences, encoding="utf-8") as f:
+            sentences = [line.strip() for line in f if line.strip()]
+    elif args.src == "en":
+        sentences = SAMPLE_SENTENCES
+    else:
+        raise SystemExit("--sentences is required when the source language is not English")
+
+    def load(quantize):
+        return _load_translation_model(model_type, quantize=quantize)
+
+    def run(loaded):
+        model, tokenizer = loaded
+        return _translate_sentences(sentences, model, tokenizer, LANG_TAGS[args.src], LANG_TAGS[args.tgt])
+
+    return load, run, len(sentences), "sentences"
+
+
+def measure(load, run, quantize, repeats):
+    gc.collect()
+    rss_before = _rss_bytes()
+    started_at = time.perf_counter()
+    loaded = load(quantize)
+    load_seconds = time.perf_counter() - started_at
+    rss_after = _rss_bytes()
+
+    outputs = run(loaded)  # Warm-up; also the outputs compared below
+    best = None
+    for _ in range(repeats):
+        started_at = time.perf_counter()
+        run(loaded)
+        elapsed = time.perf_counter() - started_at
+        best = elapsed if best is None else min(best, elapsed)
+
+    result = {
+        "load_seconds": load_seconds,
+        "model_mb": _torch_bytes(loaded) / 2 ** 20,
+        "rss_growth_mb": (rss_after - rss_before) / 2 ** 20 if rss_before is not None else None,
+        "seconds": best,
+        "outputs": outputs,
+    }
+    del loaded
+    gc.collect()
+    return result
+
+
+def drift(outputs, references):
+    bleu = sacrebleu.corpus_bleu(outputs, [references]).score
+    distance = sum(Levenshtein.distance(out, ref) for out, ref in zip(outputs, references))
+    cer = distance / max(1, sum(len(ref) for ref in references))
+    identical = sum(out == ref for out, ref in zip(outputs, references))
+    return bleu, cer, identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model", help='"trocr" or "translation:<en-indic|indic-en|indic-indic>"')
+    parser.add_argument("--image", help="TrOCR: handwritten page to segment instead of synthetic lines")
+    parser.add_argument("--lines", type=int, default=40, help="TrOCR: number of synthetic lines")
+    parser.add_argument("--sentences", help="Translation: text file with one source sentence per line")
+    parser.add_argument("--src", default="en", help="Translation: source language code")
+    parser.add_argument("--tgt", default="hi", help="Translation: target language code")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per variant; the fastest is reported")
+    args = parser.parse_args()
+
+    if args.model == "trocr":
+        load, run, count, unit = trocr_runner(args)
+    elif args.model.startswith("translation:"):
+        load, run, count, unit = translation_runner(args)
+    else:
+        raise SystemExit(f"Unknown model: {args.model}")
+
+    import torch
+    print(f"[INFO] {args.model}: {count} {unit}, torch threads: {torch.get_num_threads()}")
+    fp32 = measure(load, run, False, args.repeats)
+    int8 = measure(load, run, True, args.repeats)
+
+    for name, result in (("fp32", fp32), ("int8", int8)):
+        rss = f"{result['rss_growth_mb']:8.0f} MB" if result["rss_growth_mb"] is not None else "     n/a"
+        print(f"{name}  load {result['load_seconds']:6.1f}s  model {result['model_mb']:8.0f} MB  rss +{rss}  "
+              f"{result['seconds']:7.2f}s  {count / result['seconds']:7.2f} {unit}/s")
+
+    bleu, cer, identical = drift(int8["outputs"], fp32["outputs"])
+    print(f"int8 vs fp32: speedup x{fp32['seconds'] / int8['seconds']:.2f}  "
+          f"size x{fp32['model_mb'] / max(int8['model_mb'], 1e-9):.2f} smaller  "
+          f"BLEU {bleu:.1f}  CER {cer:.2%}  identical {identical}/{count}")
+
+
+if __name__ == "__main__":
+    main()
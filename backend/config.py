@@ -29,5 +29,86 @@ class Config:
         'kn': 'Kannada'
     }
 
+    # OCR Job Queue
+    OCR_WORKERS = int(os.environ.get('OCR_WORKERS', 2))  # Jobs processed concurrently
+    OCR_QUEUE_SIZE = int(os.environ.get('OCR_QUEUE_SIZE', 20))  # Pending jobs before /upload returns 429
+    OCR_RETRY_AFTER = int(os.environ.get('OCR_RETRY_AFTER', 30))  # Default Retry-After (seconds) when full
+
+    # Job Store ('memory' for a single process, 'sqlite' to share jobs across worker processes)
+    JOB_STORE_BACKEND = os.environ.get('JOB_STORE_BACKEND', 'memory')
+    JOB_STORE_PATH = os.environ.get('JOB_STORE_PATH', os.path.join(BASE_DIR, 'database', 'jobs.db'))
+    JOB_TTL_SECONDS = int(os.environ.get('JOB_TTL_SECONDS', 3600))  # How long finished jobs are kept
+    JOB_STORE_MAX_JOBS = int(os.environ.get('JOB_STORE_MAX_JOBS', 500))
+
+    # Progress Streaming (/status/<job_id>/stream)
+    SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
+    SSE_MAX_DURATION = int(os.environ.get('SSE_MAX_DURATION', 3600))  # Clients reconnect after this
+
+    # OCR Engines
+    TROCR_BATCH_SIZE = int(os.environ.get('TROCR_BATCH_SIZE', 8))  # Handwritten lines per TrOCR generate() call
+    TROCR_BACKEND = os.environ.get('TROCR_BACKEND', 'torch').lower()  # 'torch' or 'onnx' (onnxruntime CPU sessions)
+    TROCR_ONNX_DIR = os.environ.get('TROCR_ONNX_DIR', os.path.join(BASE_DIR, 'models', 'trocr_onnx'))  # One-time ONNX export cache
+    TROCR_ONNX_THREADS = int(os.environ.get('TROCR_ONNX_THREADS', 0))  # intra-op threads per session (0 = the process's share: all cores, or cpu_count // PDF_OCR_WORKERS in a PDF worker)
+
+    # Translation (IndicTrans2)
+    TRANSLATION_BATCH_SIZE = int(os.environ.get('TRANSLATION_BATCH_SIZE', 16))  # Sentences per generate() call
+    TRANSLATION_NUM_BEAMS = int(os.environ.get('TRANSLATION_NUM_BEAMS', 5))
+    TRANSLATION_MAX_LENGTH = int(os.environ.get('TRANSLATION_MAX_LENGTH', 256))  # Tokens per sentence
+    TRANSLATION_MAX_SENTENCE_WORDS = int(os.environ.get('TRANSLATION_MAX_SENTENCE_WORDS', 80))  # Longer runs are split
+    PAGE_TRANSLATION_WORKERS = int(os.environ.get('PAGE_TRANSLATION_WORKERS', 1))  # Threads translating partial page results (translate_pages=true) while OCR continues
+
+    # Translation Memory (sentence-level cache of IndicTrans2 outputs)
+    TRANSLATION_MEMORY_ENABLED = os.environ.get('TRANSLATION_MEMORY_ENABLED', 'true').lower() == 'true'
+    TRANSLATION_MEMORY_PATH = os.environ.get('TRANSLATION_MEMORY_PATH', os.path.join(BASE_DIR, 'database', 'translation_memory.db'))
+    TRANSLATION_MEMORY_MEMORY_MB = int(os.environ.get('TRANSLATION_MEMORY_MEMORY_MB', 32))
+    TRANSLATION_MEMORY_DISK_MB = int(os.environ.get('TRANSLATION_MEMORY_DISK_MB', 512))
+
+    # Grammar Correction (each pooled LanguageTool instance runs its own JVM server)
+    LANGUAGETOOL_POOL_SIZE = int(os.environ.get('LANGUAGETOOL_POOL_SIZE', 2))
+    LANGUAGETOOL_HEALTH_CHECK_INTERVAL = int(os.environ.get('LANGUAGETOOL_HEALTH_CHECK_INTERVAL', 300))  # Seconds idle before re-checking
+
+    # OCR Result Cache (keyed by page pixels + source language + enhance flag + engine version)
+    OCR_CACHE_ENABLED = os.environ.get('OCR_CACHE_ENABLED', 'true').lower() == 'true'
+    OCR_CACHE_PATH = os.environ.get('OCR_CACHE_PATH', os.path.join(BASE_DIR, 'database', 'ocr_cache.db'))
+    OCR_CACHE_MEMORY_MB = int(os.environ.get('OCR_CACHE_MEMORY_MB', 64))
+    OCR_CACHE_DISK_MB = int(os.environ.get('OCR_CACHE_DISK_MB', 1024))
+
+    # Deskewing (angle search on a downscaled page, see app/skew.py)
+    DESKEW_MAX_ANGLE = float(os.environ.get('DESKEW_MAX_ANGLE', 10))  # Largest skew searched for, in degrees either way
+    DESKEW_MIN_ANGLE = float(os.environ.get('DESKEW_MIN_ANGLE', 0.2))  # Smaller angles are left alone
+    DESKEW_MIN_CONFIDENCE = float(os.environ.get('DESKEW_MIN_CONFIDENCE', 0.1))  # Below this the estimate is ignored (noise, photos, pages without text lines)
+    DESKEW_WORK_WIDTH = int(os.environ.get('DESKEW_WORK_WIDTH', 800))  # Width in pixels the page is downscaled to for the search
+
+    # Exports (PDF/DOCX rendered on first download, then kept in RESULT_FOLDER; see app/exports.py)
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))  # Threads rendering exports in the background
+    EXPORT_RENDER_TIMEOUT = int(os.environ.get('EXPORT_RENDER_TIMEOUT', 120))  # Seconds a /download waits for its render
+
+    # PDF Processing
+    PDF_OCR_WORKERS = int(os.environ.get('PDF_OCR_WORKERS', max(1, (os.cpu_count() or 2) // 2)))  # Processes OCR'ing PDF pages and DOCX images in parallel (1 = in-process)
+    PDF_PAGE_WINDOW = int(os.environ.get('PDF_PAGE_WINDOW', 2 * PDF_OCR_WORKERS))  # Max pages in flight at once
+    PDF_TEXT_LAYER = os.environ.get('PDF_TEXT_LAYER', 'true').lower() == 'true'  # Use plausible embedded text instead of OCR'ing digital pages
+    PDF_TEXT_MIN_CHARS = int(os.environ.get('PDF_TEXT_MIN_CHARS', 20))  # Pages with less embedded text are OCR'd
+    PDF_IMAGE_REGION_MIN_AREA = float(os.environ.get('PDF_IMAGE_REGION_MIN_AREA', 0.05))  # Images on text pages smaller than this page fraction are not OCR'd
+    PDF_REGION_DPI = int(os.environ.get('PDF_REGION_DPI', 200))  # Rendering resolution for OCR'd image regions
+    PDF_DPI = int(os.environ.get('PDF_DPI', 200))  # Rasterization DPI for pages with neither text nor a full-page scan to size from
+    PDF_MIN_DPI = int(os.environ.get('PDF_MIN_DPI', 150))  # Lower bound of the per-page DPI
+    PDF_MAX_DPI = int(os.environ.get('PDF_MAX_DPI', 400))  # Upper bound of the per-page DPI
+    PDF_TARGET_TEXT_PX = int(os.environ.get('PDF_TARGET_TEXT_PX', 32))  # Rendered height (font size) aimed for body text
+    PDF_MAX_PIXELS = int(os.environ.get('PDF_MAX_PIXELS', 25_000_000))  # Large pages get a lower DPI so a render stays under this
+    PDF_MP_START_METHOD = os.environ.get('PDF_MP_START_METHOD', 'spawn')  # 'spawn' avoids forking torch/paddle thread state
+
+    # DOCX Processing (images are OCR'd on the PDF worker pool)
+    DOCX_MIN_IMAGE_SIDE = int(os.environ.get('DOCX_MIN_IMAGE_SIDE', 24))  # Embedded DOCX images with a shorter side (px) are not OCR'd
+
+    # Model Loading
+    MODEL_PRELOAD = os.environ.get('MODEL_PRELOAD', 'lazy').lower()  # 'eager' warms models up at boot (see /ready), 'lazy' loads on first use
+    PRELOAD_OCR_LANGUAGES = os.environ.get('PRELOAD_OCR_LANGUAGES', 'en')  # Comma-separated PaddleOCR languages warmed up eagerly
+    PRELOAD_TRANSLATION_MODELS = os.environ.get('PRELOAD_TRANSLATION_MODELS', 'en-indic,indic-en')  # Any of en-indic, indic-en, indic-indic
+    PRELOAD_TROCR = os.environ.get('PRELOAD_TROCR', 'true').lower() == 'true'
+    MODEL_RAM_BUDGET_MB = int(os.environ.get('MODEL_RAM_BUDGET_MB', 6144))  # Approximate RAM for loaded models across the app process and its PDF workers, split between them (each process has its own registry); LRU models are unloaded beyond a process's share (0 = no limit)
+    MODEL_WORKER_RAM_BUDGET_MB = int(os.environ.get('MODEL_WORKER_RAM_BUDGET_MB', 0))  # Share of each PDF worker process (0 = MODEL_RAM_BUDGET_MB // (PDF_OCR_WORKERS + 1)); the app process keeps the rest
+    MODEL_PINNED = os.environ.get('MODEL_PINNED', '')  # Comma-separated registry keys never unloaded, e.g. "trocr,paddleocr:en"
+    QUANTIZE_MODELS = os.environ.get('QUANTIZE_MODELS', '')  # Int8 CPU inference for e.g. "trocr,translation:en-indic" ("translation" = all); see benchmarks/eval_quantization.py
+
     # Optional
     DEBUG = True
@@ -2,6 +2,16 @@ import React, { useEffect, useState, useRef } from 'react';
 import { Loader, AlertTriangle } from 'lucide-react';
 import api from '../utils/api';
 
+const STAGE_LABELS = {
+  rasterize: 'Rendering pages',
+  preprocess: 'Enhancing image',
+  ocr: 'Recognizing text',
+  spell: 'Correcting spelling',
+  translate: 'Translating',
+  grammar: 'Checking grammar',
+  export: 'Preparing downloads',
+};
+
 const ProcessingScreen = ({ jobId, onSuccess, onCancelSuccess }) => {
   const [status, setStatus] = useState('processing');
   const [isCancelling, setIsCancelling] = useState(false);
@@ -10,45 +20,87 @@ const ProcessingScreen = ({ jobId, onSuccess, onCancelSuccess }) => {
     pages: 'Estimating...',
     eta: '240s',
   });
+  const [stage, setStage] = useState(null);
 
   const intervalRef = useRef(null);
+  const sourceRef = useRef(null);
 
   useEffect(() => {
     if (!jobId) return;
 
-    // Start polling job status every 2 seconds
-    intervalRef.current = setInterval(async () => {
-      try {
-        const res = await api.get(`/status/${jobId}`);
-
-        if (res.data.status === 'done') {
-          clearInterval(intervalRef.current);
-          setStatus('done');
-          onSuccess(res.data.result);
-        } else if (res.data.status === 'cancelled') {
-          clearInterval(intervalRef.current);
-          setStatus('cancelled');
-          onCancelSuccess();
-        } else {
-          // Optionally update metrics if backend provides partial info during processing
-          if (res.data.metrics) {
-            setMetrics({
-              accuracy: res.data.metrics.accuracy || metrics.accuracy,
-              pages: res.data.metrics.pages || metrics.pages,
-              eta: res.data.metrics.eta || metrics.eta,
-            });
+    const stopUpdates = () => {
+      clearInterval(intervalRef.current);
+      if (sourceRef.current) sourceRef.current.close();
+    };
+
+    const applyProgress = (progress) => {
+      if (!progress) return;
+      setStage(STAGE_LABELS[progress.stage] || progress.stage);
+      if (progress.total) {
+        setMetrics((prev) => ({ ...prev, pages: `${progress.done ?? 0}/${progress.total}` }));
+      }
+    };
+
+    // Fallback: poll job status every 2 seconds
+    const startPolling = () => {
+      intervalRef.current = setInterval(async () => {
+        try {
+          const res = await api.get(`/status/${jobId}`);
+
+          if (res.data.status === 'done') {
+            stopUpdates();
+            setStatus('done');
+            onSuccess(res.data.result);
+          } else if (res.data.status === 'cancelled') {
+            stopUpdates();
+            setStatus('cancelled');
+            onCancelSuccess();
+          } else {
+            applyProgress(res.data.progress);
           }
+        } catch (err) {
+          console.error('Polling error:', err);
+          stopUpdates();
+          setStatus('error');
+          // Consider calling onCancelSuccess or show error UI here if needed
         }
-      } catch (err) {
-        console.error('Polling error:', err);
-        clearInterval(intervalRef.current);
+      }, 2000);
+    };
+
+    if (window.EventSource) {
+      // Server pushes stage transitions as they happen, so no polling is needed
+      const source = new EventSource(`${api.defaults.baseURL}/status/${jobId}/stream`);
+      sourceRef.current = source;
+
+      source.addEventListener('progress', (e) => applyProgress(JSON.parse(e.data).progress));
+      source.addEventListener('done', (e) => {
+        stopUpdates();
+        setStatus('done');
+        onSuccess(JSON.parse(e.data).result);
+      });
+      source.addEventListener('cancelled', () => {
+        stopUpdates();
+        setStatus('cancelled');
+        onCancelSuccess();
+      });
+      source.addEventListener('failed', () => {
+        stopUpdates();
         setStatus('error');
-        // Consider calling onCancelSuccess or show error UI here if needed
-      }
-    }, 2000);
+      });
+      source.onerror = () => {
+        // Stream unavailable or dropped: fall back to polling
+        source.close();
+        if (!intervalRef.current) startPolling();
+      };
+    } else {
+      startPolling();
+    }
 
     // Cleanup on unmount or jobId change
-    return () => clearInterval(intervalRef.current);
+    return () => {
+      stopUpdates();
+      intervalRef.current = null;
+    };
   }, [jobId, onSuccess, onCancelSuccess]);
 
   const handleCancel = async () => {
@@ -56,6 +108,7 @@ const ProcessingScreen = ({ jobId, onSuccess, onCancelSuccess }) => {
     try {
       await api.post(`/cancel/${jobId}`);
       clearInterval(intervalRef.current);
+      if (sourceRef.current) sourceRef.current.close();
       setStatus('cancelled');
       onCancelSuccess();
     } catch (err) {
@@ -80,6 +133,7 @@ const ProcessingScreen = ({ jobId, onSuccess, onCancelSuccess }) => {
         <p className="text-sm text-gray-500 mt-1">
           Our AI is analyzing handwriting, detecting layout, and recognizing text accurately…
         </p>
+        {stage && <p className="text-sm font-medium text-indigo-600 mt-2">{stage}…</p>}
       </div>
 
       {/* Metrics */}